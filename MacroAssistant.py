@@ -6,19 +6,26 @@
 #       (新增) 增加悬浮图片预览功能 (鼠标悬停在步骤上自动显示)。
 #       (依赖) 需要 Pillow 库 (PIL) 支持图片显示。
 
+import sys
+import lazy_loader
+# 启动耗时诊断: 必须在其他导入之前安装计时钩子
+STARTUP_REPORT = '--startup-report' in sys.argv
+if STARTUP_REPORT: lazy_loader.install_import_timer()
+
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import json
-import pyautogui
 import time
 import threading
 import ttkbootstrap as tb
-from pynput import keyboard
 import os
-import sys
-import queue
-from PIL import Image, ImageGrab, ImageTk
 import functools
+from lazy_loader import LazyModule, when_imported
+
+# 重型依赖延迟到首次使用时导入，窗口先显示
+pyautogui = LazyModule('pyautogui')
+keyboard = LazyModule('pynput.keyboard')
+ImageGrab = LazyModule('PIL.ImageGrab')
 
 # 强制启用 DPI 感知，解决 125%/150% 缩放下的坐标偏移问题
 try:
@@ -57,9 +64,6 @@ DEFAULT_HOTKEY_RUN = "Ctrl+F10"
 DEFAULT_HOTKEY_STOP = "Ctrl+F11"
 # =================================================================
 # 性能优化常量
-STATUS_QUEUE_CHECK_INTERVAL_IDLE = 500  # 空闲时状态队列检查间隔（毫秒）
-STATUS_QUEUE_CHECK_INTERVAL_RUNNING = 50  # 运行时状态队列检查间隔（毫秒）
-STATUS_QUEUE_MAX_BATCH = 50  # 状态队列单次最大处理数
 OCR_PRELOAD_DELAY = 100  # OCR引擎预热延迟（毫秒）
 
 
@@ -73,7 +77,10 @@ def resource_path(relative_path):
 try:
     import core_engine as macro_engine
     import ocr_engine
+    import template_optimizer
+    import pixel_probe
     from core_engine import HotkeyUtils, MacroSchema
+    from input_backend import DEFAULT_TIMING_PROFILE, TIMING_PROFILES
     # [变更] 导入重构后的 gui_utils 组件
     import gui_utils
     from gui_utils import (
@@ -82,6 +89,8 @@ try:
         HotkeySettingsDialog, 
         ImageTooltipManager, 
         MouseTracker, 
+        VirtualStepList, 
+        StatusChannel, 
         AutoWrapLabel, 
         parse_region_string
     )
@@ -89,6 +98,8 @@ except ImportError as e:
     messagebox.showerror("导入错误", f"缺少必要的模块文件或导入失败: {e}\n请确保 core_engine.py, ocr_engine.py, gui_utils.py 都在同一目录。")
     exit()
 
+lazy_loader.mark("模块导入完成")
+
 # -----------------------------------------------------------------
 # 快捷键录制与冲突检测
 # -----------------------------------------------------------------
@@ -144,8 +155,13 @@ class MacroApp:
         self.current_theme = tb.StringVar(value=self.root.style.theme_use())
         self.skip_confirm_var = tb.BooleanVar(value=False)
         self.dont_minimize_var = tb.BooleanVar(value=False)
+        self.timing_profile_var = tb.StringVar(value=DEFAULT_TIMING_PROFILE)
+        self.optimize_steps_var = tb.BooleanVar(value=False)
+        self.prefetch_var = tb.BooleanVar(value=False)
+        self.measure_waits_var = tb.BooleanVar(value=False)
+        self.continuous_capture_var = tb.BooleanVar(value=False)
+        self.frame_bus_var = tb.BooleanVar(value=False)
         self.recent_files = []
-        self.status_queue = queue.Queue()
         
         # [变更] 使用 MouseTracker 类替代原有的 job 和 func
         self.mouse_pos_var = tb.StringVar()
@@ -169,17 +185,23 @@ class MacroApp:
         self._init_menu()
         self._init_ui()
         
+        # 引擎推送的循环状态: 单槽最新值 + 事件唤醒，渲染时才格式化
+        self.status_channel = StatusChannel(self.root, self._render_loop_status)
+        
         # [变更] 初始化悬浮预览管理器 (使用 lambda 动态获取 steps)
-        self.tooltip_manager = ImageTooltipManager(self.steps_tree, lambda: self.steps)
+        self.tooltip_manager = ImageTooltipManager(
+            self.steps_tree, lambda: self.steps,
+            index_getter=self.step_view.get_selected_index,
+            select_event=VirtualStepList.SELECT_EVENT)
         
         self.load_app_settings()
         self.update_recent_files_menu()
         self.update_status_bar_hotkeys() 
         self.root.after(500, self.check_hotkey_conflicts)
-        self.start_hotkey_listener() 
+        # 监听器 (pynput) 在窗口显示后再启动
+        self.root.after_idle(self.start_hotkey_listener)
         # [补丁优化] 提前预热OCR引擎，改善首次使用体验
         self.root.after(OCR_PRELOAD_DELAY, lambda: threading.Thread(target=ocr_engine.preload_engines, daemon=True).start())
-        self._check_status_queue()
 
     def _init_menu(self):
         self.menu_bar = tk.Menu(self.root)
@@ -203,6 +225,11 @@ class MacroApp:
         settings_menu = tk.Menu(self.menu_bar, tearoff=0, font=self.font_ui)
         self.menu_bar.add_cascade(label="  设置  ", menu=settings_menu)
         settings_menu.add_command(label="⌨️ 快捷键设置...", command=self.open_hotkey_settings)
+        settings_menu.add_command(label="🩺 启动耗时诊断", command=self.show_startup_report)
+        settings_menu.add_separator()
+        # 执行节奏: 键鼠动作后的停顿与移动动画时长 (见 input_backend.TIMING_PROFILES)
+        for key, label in (('standard', "🐢 标准速度 (兼容)"), ('fast', "🐇 快速"), ('turbo', "⚡ 极速 (无停顿)")):
+            settings_menu.add_radiobutton(label=label, variable=self.timing_profile_var, value=key, command=self.save_app_settings)
 
         theme_menu = tk.Menu(self.menu_bar, tearoff=0, font=self.font_ui)
         self.menu_bar.add_cascade(label="  主题  ", menu=theme_menu)
@@ -239,30 +266,28 @@ class MacroApp:
         title_frame.pack(fill=tk.X, pady=(0, 5))
         ttk.Label(title_frame, text="宏步骤序列:", font=("Microsoft YaHei UI", 11, "bold")).pack(side=tk.LEFT)
         
-        # --- Treeview 替换 Listbox ---
+        # --- 虚拟化 Treeview: 只渲染可见窗口内的行 ---
         tree_frame = ttk.Frame(list_frame)
         tree_frame.pack(fill=tk.BOTH, expand=True)
         
-        columns = ("id", "action", "params")
-        self.steps_tree = ttk.Treeview(tree_frame, columns=columns, show="headings", selectmode="browse")
+        self.step_view = VirtualStepList(tree_frame, lambda: self.steps, self._format_step_row,
+                                         editing_getter=lambda: self.editing_index)
+        self.steps_tree = self.step_view.tree
         
         self.steps_tree.heading("id", text="#")
         self.steps_tree.heading("action", text="动作")
         self.steps_tree.heading("params", text="参数详情 / 备注")
         
         # 优化列宽：缩小序号列，适当缩小动作列，扩大参数列
-        self.steps_tree.column("id", width=40, minwidth=35, stretch=False, anchor="center")
+        self.steps_tree.column("id", width=70, minwidth=50, stretch=False, anchor="center")
         self.steps_tree.column("action", width=300, minwidth=120, stretch=False)
         self.steps_tree.column("params", width=280, minwidth=250, stretch=True)
         
-        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.steps_tree.yview)
-        self.steps_tree.configure(yscrollcommand=scrollbar.set)
-        
         self.steps_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.step_view.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
-        # 绑定事件
-        self.steps_tree.bind("<Double-1>", lambda e: self.load_step_for_edit())
+        # 绑定事件 (双击 # 列用于折叠/展开，不进入编辑)
+        self.steps_tree.bind("<Double-1>", lambda e: None if self.step_view.is_marker_click(e) else self.load_step_for_edit())
         
         # 配置编辑行的样式
         self.steps_tree.tag_configure('editing', background='#FFF3CD')
@@ -292,6 +317,16 @@ class MacroApp:
         skip_check.grid(row=0, column=0, sticky="w", padx=2) 
         minimize_check = ttk.Checkbutton(check_frame, text="运行时主界面不最小化", variable=self.dont_minimize_var, bootstyle="primary-round-toggle")
         minimize_check.grid(row=0, column=1, sticky="w", padx=2)
+        optimize_check = ttk.Checkbutton(check_frame, text="执行前融合相邻步骤 (加速)", variable=self.optimize_steps_var, bootstyle="primary-round-toggle")
+        optimize_check.grid(row=1, column=0, sticky="w", padx=2, pady=(5, 0))
+        prefetch_check = ttk.Checkbutton(check_frame, text="等待期间预取下一步查找", variable=self.prefetch_var, bootstyle="primary-round-toggle")
+        prefetch_check.grid(row=1, column=1, sticky="w", padx=2, pady=(5, 0))
+        measure_check = ttk.Checkbutton(check_frame, text="测量固定等待 (日志报告画面实际稳定时间)", variable=self.measure_waits_var, bootstyle="primary-round-toggle")
+        measure_check.grid(row=2, column=0, columnspan=2, sticky="w", padx=2, pady=(5, 0))
+        continuous_check = ttk.Checkbutton(check_frame, text="后台连续截图 (查找步骤无需等待截图)", variable=self.continuous_capture_var, bootstyle="primary-round-toggle")
+        continuous_check.grid(row=3, column=0, columnspan=2, sticky="w", padx=2, pady=(5, 0))
+        frame_bus_check = ttk.Checkbutton(check_frame, text="多进程查找 (帧总线，OCR 崩溃不影响主界面)", variable=self.frame_bus_var, bootstyle="primary-round-toggle")
+        frame_bus_check.grid(row=4, column=0, columnspan=2, sticky="w", padx=2, pady=(5, 0))
         
         # =====================================================================
         # 右侧面板
@@ -344,6 +379,9 @@ class MacroApp:
         mappings = {
             'lang': MacroSchema.LANG_OPTIONS,
             'button': MacroSchema.CLICK_OPTIONS,
+            'input_method': MacroSchema.TEXT_METHOD_OPTIONS,
+            'match_mode': MacroSchema.MATCH_MODE_OPTIONS,
+            'match': MacroSchema.PIXEL_MATCH_OPTIONS,
             'engine': self.FULL_OCR_KEY_MAP
         }
         
@@ -373,6 +411,9 @@ class MacroApp:
         reverse_mappings = {
             'lang': MacroSchema.LANG_VALUES_TO_NAME,
             'button': MacroSchema.CLICK_VALUES_TO_NAME,
+            'input_method': MacroSchema.TEXT_METHOD_VALUES_TO_NAME,
+            'match_mode': MacroSchema.MATCH_MODE_VALUES_TO_NAME,
+            'match': MacroSchema.PIXEL_MATCH_VALUES_TO_NAME,
             'engine': self.FULL_OCR_NAME_MAP
         }
         
@@ -390,9 +431,7 @@ class MacroApp:
 
     def _get_selected_index(self):
         """获取当前选中项的索引"""
-        selected_items = self.steps_tree.selection()
-        if not selected_items: return None
-        return self.steps_tree.index(selected_items[0])
+        return self.step_view.get_selected_index()
 
     def update_status_bar_hotkeys(self):
         """更新状态栏和运行按钮上的快捷键提示"""
@@ -427,6 +466,10 @@ class MacroApp:
                 parent=self.root
             )
             
+    def show_startup_report(self):
+        """显示启动耗时明细 (阶段耗时 + 模块导入耗时)"""
+        messagebox.showinfo("启动耗时诊断", lazy_loader.format_startup_report(), parent=self.root)
+
     def on_save_hotkeys(self):
         """保存并重启监听器"""
         self.save_app_settings()
@@ -452,6 +495,10 @@ class MacroApp:
             except Exception as e:
                 print(f"[警告] 停止监听器时出错: {e}")
                 
+        try:
+            macro_engine.frame_bus.close()
+        except Exception as e:
+            print(f"[警告] 关闭帧总线时出错: {e}")
         try:
             self.root.quit()
             self.root.destroy()
@@ -487,6 +534,11 @@ class MacroApp:
             self.create_param_entry("confidence", "置信度(0.1-1.0):", "0.8")
             self._create_hint_label(self.param_frame, "* 提示：如果识别失败，请调低置信度")
             self.create_browse_button()
+            self.create_optimize_template_button()
+            self.create_param_combobox("match_mode", "匹配方式:", list(MacroSchema.MATCH_MODE_OPTIONS.keys()))
+            self._create_hint_label(self.param_frame, "* 特征点匹配不受 DPI/界面缩放影响，适合纹理丰富的目标；纯色或细小图标请用模板匹配")
+            self.create_param_checkbox("track", "循环中跟踪移动目标 (按运动预测搜索窗口)", default=False)
+            self.create_anchor_fields()
             self.create_test_button("🧪 测试查找图像", self.on_test_find_image_click)
             
         elif action_key == 'FIND_TEXT':
@@ -501,6 +553,7 @@ class MacroApp:
             self._create_hint_label(self.param_frame, 
                 "* 提示: 勾选后，识别到的文本将保存到剪贴板"
                 "* 提取模式: 用正则表达式过滤，如 \\d+ 提取数字")
+            self.create_anchor_fields()
             
             self.create_test_button("🧪 测试查找文本 (OCR)", self.on_test_find_text_click)
             
@@ -518,10 +571,20 @@ class MacroApp:
 
         elif action_key == 'WAIT':
             self.create_param_entry("ms", "等待 (毫秒):", "500")
+        elif action_key == 'WAIT_UNTIL_STABLE':
+            self.create_region_selector()
+            self.create_param_entry("stable_count", "连续无变化次数:", "3")
+            self.create_param_entry("interval_ms", "采样间隔 (毫秒):", "50")
+            self.create_param_entry("timeout_ms", "超时 (毫秒):", "5000")
+            self.create_param_entry("threshold", "变化阈值 (平均像素差):", "1.0")
+            self._create_hint_label(self.param_frame,
+                "* 画面连续多次采样无变化即继续，适合替代点击后等待界面刷新的固定等待。\n"
+                "* 超时后不中断宏，直接执行下一步。搜索范围留空=全屏。")
         elif action_key == 'TYPE_TEXT':
             self.create_param_entry("text", "输入文本:", "你好")
+            self.create_param_combobox("input_method", "输入方式:", list(MacroSchema.TEXT_METHOD_OPTIONS.keys()))
             self._create_hint_label(self.param_frame, 
-                "* 此功能使用剪贴板 (Ctrl+V)，以支持中文及复杂文本输入。\n"
+                "* 默认直接发送 Unicode 按键 (支持中文)，不占用剪贴板；个别程序不接受时可改用剪贴板粘贴 (会自动恢复原剪贴板内容)。\n"
                 "* 支持占位符: {CLIPBOARD} 将替换为剪贴板内容\n"
                 "* 示例: '订单号: {CLIPBOARD}' → '订单号: 12345'")
         elif action_key == 'PRESS_KEY':
@@ -530,6 +593,8 @@ class MacroApp:
         elif action_key == 'ACTIVATE_WINDOW':
             self.create_param_entry("title", "窗口标题 (支持部分匹配):", "记事本")
             self._create_hint_label(self.param_frame, "* 提示: 宏将查找标题中包含此文本的窗口，并将其激活到最前端。")
+            self.create_param_entry("anchor_name", "登记为锚点 (可选):", "")
+            self._create_hint_label(self.param_frame, f"* 激活的窗口总会登记为锚点 '{macro_engine.WINDOW_ANCHOR}' (原点为窗口左上角)，后续步骤可在窗口内的相对区域查找，窗口移动后仍然有效。")
 
         elif action_key == 'MOVE_TO':
             self.create_param_entry("x", "X 坐标:", "100")
@@ -546,6 +611,10 @@ class MacroApp:
             self.create_region_selector() 
             self.create_param_entry("confidence", "置信度:", "0.8")
             self.create_browse_button()
+            self.create_optimize_template_button()
+            self.create_param_combobox("match_mode", "匹配方式:", list(MacroSchema.MATCH_MODE_OPTIONS.keys()))
+            self.create_param_checkbox("track", "循环中跟踪移动目标 (按运动预测搜索窗口)", default=False)
+            self.create_anchor_fields()
             self.create_test_button("🧪 测试 IF 图像", self.on_test_find_image_click)
             
         elif action_key == 'IF_TEXT_FOUND':
@@ -557,6 +626,7 @@ class MacroApp:
             # === 新增：保存到剪贴板选项 ===
             self.create_param_checkbox("save_to_clipboard", "✓ 保存识别结果到剪贴板", default=False)
             self.create_param_entry("extract_pattern", "提取模式 (正则，可选):", r"\d+")
+            self.create_anchor_fields()
             
             self.create_test_button("🧪 测试 IF 文本", self.on_test_find_text_click)
             
@@ -564,6 +634,7 @@ class MacroApp:
             # 循环模式选择
             mode_options = {
                 '固定次数': 'fixed',
+                '固定频率 (定时执行)': 'fixed_rate',
                 '直到找到图像': 'until_image',
                 '直到找到文本': 'until_text'
             }
@@ -572,6 +643,7 @@ class MacroApp:
             # 根据模式动态显示参数
             # 这里先创建所有可能的控件，后续通过 update_loop_params 动态显示/隐藏
             self.create_param_entry("times", "循环次数:", "10")
+            self.create_param_entry("period_ms", "执行周期 (毫秒):", "1000")
             self.create_param_entry("max_iterations", "最大迭代次数 (安全阀):", "1000")
             
             # 条件：图像
@@ -585,6 +657,7 @@ class MacroApp:
             self._create_hint_label(self.param_frame, 
                 "* 提示:"
                 "- 固定次数: 传统循环，执行指定次数"
+                "- 固定频率: 每隔固定周期执行一次循环体，耗时波动不累积，超时会在日志中报告"
                 "- 直到找到图像: 找到图像即停止"
                 "- 直到找到文本: 找到文本即停止"
                 "- 最大迭代: 防止无限循环的安全机制")
@@ -595,6 +668,24 @@ class MacroApp:
             
             # 初始化显示
             self.update_loop_params(None)
+        elif action_key in ('IF_PIXEL_COLOR', 'GET_PIXELS'):
+            if action_key == 'IF_PIXEL_COLOR':
+                self.create_param_entry("pixels", "探测点 (x,y,#RRGGBB; ...):", "100,200,#FF0000")
+                self.create_param_entry("tolerance", "颜色容差 (每通道 0-255):", str(pixel_probe.PIXEL_DEFAULT_TOLERANCE))
+                self.create_param_combobox("match", "判断条件:", list(MacroSchema.PIXEL_MATCH_OPTIONS.keys()))
+                self._create_hint_label(self.param_frame,
+                    "* 多个点用分号分隔，所有点只截一次图 (或复用刚截的画面)，比找图快得多。\n"
+                    "* 适合判断按钮是否点亮、血条颜色等固定位置的状态。")
+            else:
+                self.create_param_entry("pixels", "读取坐标 (x,y; ...):", "100,200")
+                self.create_param_checkbox("save_to_clipboard", "✓ 保存颜色到剪贴板 (#RRGGBB，分号分隔)", default=False)
+            self.create_param_entry("anchor", "相对锚点 (可选，坐标相对锚点原点):", "")
+            
+            ttk.Separator(self.param_frame, orient='horizontal').pack(fill='x', pady=(15, 5))
+            ttk.Label(self.param_frame, text="当前鼠标位置 (参考):", font=self.font_ui, foreground='gray').pack(anchor="w", pady=(5,0))
+            ttk.Label(self.param_frame, textvariable=self.mouse_pos_var, font=self.font_code, bootstyle="info").pack(anchor="w")
+            self.mouse_tracker.start()
+            self.create_test_button("🧪 读取当前颜色", self.on_test_pixels_click)
         elif action_key == 'ELSE':
             self._create_hint_label(self.param_frame, "* 提示: 'ELSE' 必须与 'IF' 配合使用。它将执行 'IF' 条件不满足时的逻辑。")
         elif action_key == 'END_IF':
@@ -611,6 +702,7 @@ class MacroApp:
         
         mode_map = {
             '固定次数': 'fixed',
+            '固定频率 (定时执行)': 'fixed_rate',
             '直到找到图像': 'until_image',
             '直到找到文本': 'until_text'
         }
@@ -625,7 +717,7 @@ class MacroApp:
                 hint_labels.append(widget)
         
         # 隐藏所有条件参数
-        for key in ['times', 'condition_image', 'confidence', 'condition_text', 'lang', 'max_iterations']:
+        for key in ['times', 'period_ms', 'condition_image', 'confidence', 'condition_text', 'lang', 'max_iterations']:
             if key in self.param_widgets:
                 widget = self.param_widgets[key]
                 # 获取父 frame
@@ -637,6 +729,8 @@ class MacroApp:
         params_to_show = []
         if mode == 'fixed':
             params_to_show = ['times']
+        elif mode == 'fixed_rate':
+            params_to_show = ['times', 'period_ms']
         elif mode == 'until_image':
             params_to_show = ['condition_image', 'confidence', 'max_iterations']
         elif mode == 'until_text':
@@ -736,6 +830,21 @@ class MacroApp:
         btn = ttk.Button(self.param_frame, text="浏览...", command=self.browse_image, bootstyle="info-outline", padding=(10, 6))
         btn.pack(anchor="w", fill=tk.X, pady=2)
 
+    def create_optimize_template_button(self):
+        btn = ttk.Button(self.param_frame, text="✂ 自动裁剪模板", command=self.on_optimize_template_click,
+                         bootstyle="secondary-outline", padding=(10, 6))
+        btn.pack(anchor="w", fill=tk.X, pady=2)
+
+    def create_anchor_fields(self):
+        """查找步骤的锚点参数: 本步骤找到的位置登记为锚点，或在某个锚点的相对区域内查找"""
+        ttk.Separator(self.param_frame, orient='horizontal').pack(fill='x', pady=(15, 5))
+        self.create_param_entry("anchor_name", "找到后登记为锚点 (可选):", "")
+        self.create_param_entry("anchor", "相对锚点 (可选):", "")
+        self.create_param_entry("anchor_region", "相对锚点的搜索区域 (x1,y1,x2,y2):", "")
+        self._create_hint_label(self.param_frame,
+            f"* 锚点原点: 图像/文本为找到的中心，'{macro_engine.WINDOW_ANCHOR}' 为最近激活窗口的左上角。\n"
+            "* 填写相对锚点后，只在锚点偏移出的小区域内查找，目标窗口移动后也不会退回全屏搜索。")
+
     def create_test_button(self, text, command):
         ttk.Separator(self.param_frame, orient='horizontal').pack(fill='x', pady=(15, 5))
         ttk.Button(self.param_frame, text=text, command=command, bootstyle="info", padding=(10, 6)).pack(anchor="w", fill=tk.X, pady=2)
@@ -753,6 +862,8 @@ class MacroApp:
             path = self.param_widgets['path'].get()
             conf = float(self.param_widgets['confidence'].get())
             if not os.path.exists(path): raise FileNotFoundError
+            mode = self._param_display_to_internal('match_mode', self.param_widgets['match_mode'].get()) \
+                if 'match_mode' in self.param_widgets else 'template'
             
             # <--- 读取搜索范围
             region_box = None
@@ -764,7 +875,7 @@ class MacroApp:
             self.status_var.set("测试中...")
             self.root.iconify()
             # 将 region_box 传给线程
-            self.root.after(2000, lambda: self._run_test_thread(self._test_find_image, (path, conf, region_box)))
+            self.root.after(2000, lambda: self._run_test_thread(self._test_find_image, (path, conf, region_box, mode)))
         except: messagebox.showerror("错误", "参数无效")
 
     def on_test_find_text_click(self):
@@ -799,10 +910,77 @@ class MacroApp:
             self.root.after(2000, lambda: self._run_test_thread(self._test_find_text, (text, lang, engine, region_box)))
         except: messagebox.showerror("错误", "参数无效")
 
+    def on_test_pixels_click(self):
+        try:
+            points = pixel_probe.parse_pixel_spec(self.param_widgets['pixels'].get(), need_color=False)
+            tol = int(self.param_widgets['tolerance'].get()) if 'tolerance' in self.param_widgets else 0
+            mode = self._param_display_to_internal('match', self.param_widgets['match'].get()) \
+                if 'match' in self.param_widgets else 'all'
+        except ValueError as e:
+            messagebox.showerror("错误", str(e))
+            return
+        self.status_var.set("测试中...")
+        self.root.iconify()
+        self.root.after(2000, lambda: self._run_test_thread(self._test_pixels, (points, tol, mode)))
+
+    def _test_pixels(self, points, tol, mode):
+        try:
+            colors, _source = macro_engine.read_pixels(points)
+            self.root.after(0, lambda: self._on_test_pixels_complete(points, colors, tol, mode))
+        except Exception as e:
+            self.root.after(0, lambda err=e: self._on_test_error(err))
+
+    def _on_test_pixels_complete(self, points, colors, tol, mode):
+        self.root.deiconify()
+        lines = []
+        for (x, y, expected), c in zip(points, colors):
+            line = f"({x}, {y})  {pixel_probe.format_color(c)}"
+            if expected is not None:
+                hit = pixel_probe.color_matches(c, expected, tol)
+                line += f"  {'✓' if hit else '✗'} 期望 {pixel_probe.format_color(expected)}"
+            lines.append(line)
+        if all(e is not None for _x, _y, e in points) and 'match' in self.param_widgets:
+            ok, matched = pixel_probe.evaluate(points, colors, tol, mode)
+            lines.append(f"\n{matched}/{len(points)} 匹配 → 条件{'满足' if ok else '不满足'}")
+        messagebox.showinfo("像素颜色", "\n".join(lines))
+        self.update_status_bar_hotkeys()
+
+    def on_optimize_template_click(self):
+        path = self.param_widgets['path'].get()
+        if not os.path.exists(path):
+            messagebox.showerror("错误", "图像路径无效")
+            return
+        frames = template_optimizer.OPT_CAPTURE_FRAMES
+        self.status_var.set(f"模板优化: 将截取 {frames} 张屏幕截图...")
+        self.root.iconify()
+        self.root.after(2000, lambda: self._run_test_thread(self._optimize_template, (path,)))
+
+    def _optimize_template(self, path):
+        try:
+            shots = template_optimizer.capture_screens()
+            result = template_optimizer.optimize_template(path, shots)
+            macro_engine.clear_template_caches()
+            self.root.after(0, lambda: self._on_optimize_complete(path, result))
+        except Exception as e:
+            self.root.after(0, lambda err=e: self._on_test_error(err))
+
+    def _on_optimize_complete(self, path, result):
+        self.root.deiconify()
+        if result:
+            x0, y0, x1, y1 = result['box']
+            W, H = result['template_size']
+            messagebox.showinfo("模板优化",
+                f"已裁剪为 {x1 - x0}x{y1 - y0} (原 {W}x{H}，面积 {result['area_ratio']*100:.0f}%)\n"
+                f"真实位置得分 {result['score']:.3f} / 其他位置最高 {result['rival']:.3f}\n\n"
+                f"查找时仍返回原模板中心。删除 {os.path.basename(path)}.crop.json 即可恢复完整模板。")
+        else:
+            messagebox.showwarning("模板优化", "没有找到更小的唯一子块 (或屏幕上找不到该模板)，继续使用完整模板。")
+        self.update_status_bar_hotkeys()
+
     def _run_test_thread(self, func, args):
         threading.Thread(target=func, args=args, daemon=True).start()
 
-    def _test_find_image(self, path, conf, region_box=None):
+    def _test_find_image(self, path, conf, region_box=None, mode='template'):
         try:
             # <--- 根据区域截图
             if region_box:
@@ -812,7 +990,7 @@ class MacroApp:
                 screenshot = ImageGrab.grab()
                 offset = (0, 0)
                 
-            res_val = macro_engine.find_image_cv2(path, conf, screenshot_pil=screenshot, offset=offset)
+            res_val = macro_engine.find_image(path, conf, screenshot_pil=screenshot, offset=offset, mode=mode)
             loc = res_val[0] if res_val else None
             self.root.after(0, lambda: self._on_test_complete(loc))
         except Exception as e: 
@@ -872,7 +1050,7 @@ class MacroApp:
                 val = w.get()
                 
                 # 数字校验
-                if k in ['x', 'y', 'ms', 'times', 'x_offset', 'y_offset', 'amount', 'max_iterations']:
+                if k in ['x', 'y', 'ms', 'times', 'x_offset', 'y_offset', 'amount', 'max_iterations', 'period_ms', 'stable_count', 'interval_ms', 'timeout_ms', 'tolerance']:
                     if val and not val.strip().lstrip('-').isdigit():
                         messagebox.showwarning("输入错误", f"参数 '{k}' 必须是整数")
                         return
@@ -883,6 +1061,7 @@ class MacroApp:
                 if not val:
                     if k == 'region': pass # region 允许为空
                     elif k == 'extract_pattern': pass # 正则允许为空
+                    elif k in ('anchor_name', 'anchor', 'anchor_region'): continue # 锚点参数可选
                     elif action in ['ELSE', 'END_IF', 'END_LOOP']: continue
                     elif action == 'SCROLL' and k in ['x', 'y']: continue
                     else: return
@@ -891,12 +1070,13 @@ class MacroApp:
                 elif k == 'mode':
                     mode_map = {
                         '固定次数': 'fixed',
+                        '固定频率 (定时执行)': 'fixed_rate',
                         '直到找到图像': 'until_image',
                         '直到找到文本': 'until_text'
                     }
                     params[k] = mode_map.get(val, 'fixed')
                 # [重构] 使用统一的参数映射函数
-                elif k in ('lang', 'button', 'engine'):
+                elif k in ('lang', 'button', 'engine', 'input_method', 'match_mode', 'match'):
                     params[k] = self._param_display_to_internal(k, val)
                 
                 # [变更] 使用通用函数解析 region
@@ -906,6 +1086,14 @@ class MacroApp:
                         if coords: params['cache_box'] = coords
                     continue
                 
+                elif k == 'anchor_region':
+                    coords = parse_region_string(val)
+                    if not coords or coords[2] <= coords[0] or coords[3] <= coords[1]:
+                        messagebox.showwarning("输入错误", "相对锚点的搜索区域格式应为 x1,y1,x2,y2 (x2>x1, y2>y1)")
+                        return
+                    params[k] = coords
+                    continue
+                
                 # === 新增：处理 extract_pattern，为空时不保存 ===
                 elif k == 'extract_pattern':
                     if val and val.strip():
@@ -937,6 +1125,14 @@ class MacroApp:
                     )
                     return
         
+        # 验证像素探测点格式
+        if action in ('IF_PIXEL_COLOR', 'GET_PIXELS'):
+            try:
+                pixel_probe.parse_pixel_spec(params.get('pixels', ''), need_color=(action == 'IF_PIXEL_COLOR'))
+            except ValueError as e:
+                messagebox.showwarning("输入错误", str(e), parent=self.root)
+                return
+        
         # [补丁优化] 验证循环条件图片
         if action == 'LOOP_START':
             mode = params.get('mode', 'fixed')
@@ -996,11 +1192,8 @@ class MacroApp:
         # ============================================================
         # [UI优化] 自动滚动并选中新添加/修改的行
         # ============================================================
-        children = self.steps_tree.get_children()
-        if 0 <= target_index < len(children):
-            item_id = children[target_index]
-            self.steps_tree.see(item_id)           # 滚动到可见
-            self.steps_tree.selection_set(item_id) # 自动选中
+        if 0 <= target_index < len(self.steps):
+            self.step_view.select_index(target_index)  # 滚动到可见并选中
             
         self.last_test_location = None
 
@@ -1025,6 +1218,7 @@ class MacroApp:
             # 翻译模式为中文
             mode_map_rev = {
                 'fixed': '固定次数',
+                'fixed_rate': '固定频率 (定时执行)',
                 'until_image': '直到找到图像',
                 'until_text': '直到找到文本'
             }
@@ -1049,16 +1243,20 @@ class MacroApp:
                 self.param_widgets['region'].delete(0, tk.END)
                 self.param_widgets['region'].insert(0, f"{cb[0]}, {cb[1]}, {cb[2]}, {cb[3]}")
         
+        if isinstance(step['params'].get('anchor_region'), list) and 'anchor_region' in self.param_widgets:
+            self.param_widgets['anchor_region'].delete(0, tk.END)
+            self.param_widgets['anchor_region'].insert(0, ", ".join(str(c) for c in step['params']['anchor_region']))
+        
         # 遍历并填充所有参数
         for k, v in step['params'].items():
             # 跳过 mode (前面处理了) 和 cache_box (前面处理了)
-            if k in ('mode', 'cache_box', 'region'): continue
+            if k in ('mode', 'cache_box', 'region', 'anchor_region'): continue
             
             if k in self.param_widgets:
                 w = self.param_widgets[k]
                 
                 # [重构] 使用统一的参数映射函数
-                if k in ('lang', 'button', 'engine'):
+                if k in ('lang', 'button', 'engine', 'input_method', 'match_mode', 'match'):
                     display_val = self._param_internal_to_display(k, v)
                 else:
                     display_val = v
@@ -1084,55 +1282,36 @@ class MacroApp:
         self.add_step_btn.grid_configure(columnspan=2)
         self.update_listbox_display()
 
-    def update_listbox_display(self):
-        """更新 Treeview 显示"""
-        for item in self.steps_tree.get_children():
-            self.steps_tree.delete(item)
-            
-        block_stack = []
-        for i, step in enumerate(self.steps):
-            act = step['action']
-            
-            # 缩进逻辑
-            current_indent_level = max(0, len(block_stack) - (1 if act in ['ELSE', 'END_IF', 'END_LOOP'] else 0))
-            indent_str = "    " * current_indent_level
-            
-            # 参数预览文本
-            display_params = step['params'].copy()
-            
-            cache_str = ""
-            if 'cache_box' in display_params:
-                box = display_params.pop('cache_box')
-                cache_str = f"[区域: {box[0]},{box[1]},{box[2]},{box[3]}] "
-
-            if 'engine' in display_params:
-                # <--- 列表显示时也使用完整映射
-                display_params['engine'] = self.FULL_OCR_NAME_MAP.get(display_params['engine'], display_params['engine'])
-                
-            # 格式化参数列字符串
-            param_text = f"{cache_str}{display_params}" if display_params else ""
-            
-            action_label = MacroSchema.ACTION_TRANSLATIONS.get(act, act)
-            
-            # 插入行 (Values对应: id, action, params)
-            item_id = self.steps_tree.insert("", "end", values=(
-                i + 1,
-                f"{indent_str}{action_label}",
-                param_text
-            ))
+    def _format_step_row(self, i, step, depth):
+        """格式化单行显示文本 (仅对可见行调用)，返回 (动作列, 参数列)"""
+        act = step['action']
+        indent_str = "    " * depth
+        
+        # 参数预览文本
+        display_params = step['params'].copy()
+        
+        cache_str = ""
+        if 'cache_box' in display_params:
+            box = display_params.pop('cache_box')
+            cache_str = f"[区域: {box[0]},{box[1]},{box[2]},{box[3]}] "
+
+        if 'engine' in display_params:
+            # <--- 列表显示时也使用完整映射
+            display_params['engine'] = self.FULL_OCR_NAME_MAP.get(display_params['engine'], display_params['engine'])
             
-            # 如果是编辑行，高亮显示 (Tag: editing)
-            if i == self.editing_index:
-                self.steps_tree.item(item_id, tags=('editing',))
-                # 确保滚动可见
-                self.steps_tree.see(item_id)
-                # 保持选中状态 (可选)
-                self.steps_tree.selection_set(item_id)
-
-            if act.startswith('IF_') or act == 'LOOP_START':
-                block_stack.append(act)
-            elif act in ['END_IF', 'END_LOOP'] and block_stack:
-                block_stack.pop()
+        # 格式化参数列字符串
+        param_text = f"{cache_str}{display_params}" if display_params else ""
+        
+        action_label = MacroSchema.ACTION_TRANSLATIONS.get(act, act)
+        return f"{indent_str}{action_label}", param_text
+
+    def update_listbox_display(self):
+        """更新 Treeview 显示 (虚拟化: 只重算结构并渲染可见窗口)"""
+        self.step_view.refresh()
+        
+        # 如果是编辑行，确保滚动可见并保持选中状态
+        if self.editing_index is not None:
+            self.step_view.select_index(self.editing_index)
 
     def remove_step(self):
         # --- 升级: 适配 Treeview ---
@@ -1150,12 +1329,8 @@ class MacroApp:
         del self.steps[idx]
         self.update_listbox_display()
         
-        # 尝试选中下一行
-        children = self.steps_tree.get_children()
-        if idx < len(children):
-             self.steps_tree.selection_set(children[idx])
-        elif children:
-             self.steps_tree.selection_set(children[-1])
+        # 尝试选中下一行 (越界时自动落到最后一行)
+        self.step_view.select_index(idx if self.steps else None)
 
     def move_step(self, d):
         # --- 升级: 适配 Treeview ---
@@ -1174,10 +1349,7 @@ class MacroApp:
             self.update_listbox_display()
             
             # 保持选中移动后的项
-            children = self.steps_tree.get_children()
-            if 0 <= new_i < len(children):
-                self.steps_tree.selection_set(children[new_i])
-                self.steps_tree.see(children[new_i])
+            self.step_view.select_index(new_i)
 
     def start_hotkey_listener(self):
         """切换回 Listener 模式"""
@@ -1280,7 +1452,8 @@ class MacroApp:
         if self.is_macro_running:
             self.root.after(0, self.status_var.set, "正在停止...")
             if self.current_run_context: 
-                self.current_run_context['stop_requested'] = True
+                # 同时唤醒引擎中正在进行的等待 (WAIT / 循环节拍)
+                macro_engine.request_stop(self.current_run_context)
         
     def run_macro(self, hotkey=False):
         if self.is_macro_running or not self.steps: return
@@ -1291,10 +1464,8 @@ class MacroApp:
             
         self.loop_status_var.set("") 
         
-        # [核心修复] 暴力清空之前的状态队列，防止积压
-        while not self.status_queue.empty():
-            try: self.status_queue.get_nowait()
-            except queue.Empty: break
+        # 丢弃上一次运行残留的状态
+        self.status_channel.clear()
             
         self.run_btn.config(state="disabled")
         self.status_var.set(f"宏正在运行... [{stop_display}] 停止")
@@ -1306,7 +1477,13 @@ class MacroApp:
         self.is_macro_running = True
         self.current_run_context = {
             'stop_requested': False,
-            'stop_key_str': self.hotkey_stop_str.get()
+            'stop_key_str': self.hotkey_stop_str.get(),
+            'timing_profile': self.timing_profile_var.get(),
+            'optimize': self.optimize_steps_var.get(),
+            'prefetch': self.prefetch_var.get(),
+            'measure_waits': self.measure_waits_var.get(),
+            'continuous_capture': self.continuous_capture_var.get(),
+            'frame_bus': self.frame_bus_var.get()
         }
         threading.Thread(target=self._run, args=(self.steps.copy(),), daemon=True).start()
         
@@ -1324,38 +1501,33 @@ class MacroApp:
         self.run_btn.config(state="normal")
         self.update_status_bar_hotkeys() 
 
-    def update_loop_status(self, text):
-        self.status_queue.put(text)
+    def update_loop_status(self, status):
+        """引擎线程回调：只发布最新状态，不做格式化"""
+        self.status_channel.publish(status)
 
-    def _check_status_queue(self):
-        """
-        [补丁优化] 动态调整状态队列检查频率
-        
-        优化:
-        - 运行时: 50ms (快速响应)
-        - 空闲时: 500ms (节省CPU)
-        """
+    def _render_loop_status(self, status):
         if not self.is_app_running: return
-        
-        # [补丁优化] 根据运行状态动态调整检查频率
-        interval = STATUS_QUEUE_CHECK_INTERVAL_RUNNING if self.is_macro_running else STATUS_QUEUE_CHECK_INTERVAL_IDLE
-        
-        try:
-            text = None
-            count = 0
-            while not self.status_queue.empty() and count < STATUS_QUEUE_MAX_BATCH:
-                text = self.status_queue.get_nowait()
-                count += 1
-            
-            if text: self.loop_status_var.set(text)
-        except queue.Empty:
-            pass
-        except Exception as e:
-            print(f"[StatusQueue] 错误: {e}")
-            import traceback
-            traceback.print_exc()  # [补丁优化] 记录完整堆栈
-            
-        self.root.after(interval, self._check_status_queue)
+        self.loop_status_var.set(self._format_loop_status(status))
+
+    @staticmethod
+    def _format_loop_status(status):
+        """将引擎发布的结构化状态格式化为状态栏文本"""
+        if isinstance(status, str): return status
+        kind = status.get('kind')
+        if kind == 'fixed_start':
+            return f"循环剩余: {status['remain']}"
+        if kind == 'fixed_iteration':
+            overrun = f" ⚠️超时 {status['overruns']} 次" if status.get('overruns') else ""
+            return f"循环第 {status['iteration']} 次 (剩余: {status['remain']}次){overrun}"
+        if kind == 'until_start':
+            return f"🔄 条件循环第 1 次 (最多 {status['max']} 次)"
+        if kind == 'until_iteration':
+            return f"🔄 循环第 {status['iteration']} 次 (最多 {status['max']} 次)"
+        if kind == 'max_reached':
+            return f"⚠️ 达到最大迭代 {status['max']} 次,强制退出"
+        if kind == 'condition_met':
+            return f"✓ 条件满足,循环结束 (共 {status['iteration']} 次)"
+        return str(status)
 
     def new_macro(self):
         if self.steps:
@@ -1363,6 +1535,7 @@ class MacroApp:
         self.steps = []
         self.editing_index = None
         self.last_test_location = None
+        self.step_view.reset_view()
         self.cancel_edit_mode()
         self.update_listbox_display()
         self.status_var.set("已新建空白宏。")
@@ -1403,6 +1576,7 @@ class MacroApp:
                 return
             
             self.steps = data
+            self.step_view.reset_view()
             self.update_listbox_display()
             self.status_var.set(f"已加载: {os.path.basename(f)}")
             self.add_to_recent_files(f)
@@ -1478,6 +1652,8 @@ class MacroApp:
                     self.current_theme.set(d.get('theme', 'litera'))
                     self.hotkey_run_str.set(d.get('hotkey_run', DEFAULT_HOTKEY_RUN))
                     self.hotkey_stop_str.set(d.get('hotkey_stop', DEFAULT_HOTKEY_STOP))
+                    profile = d.get('timing_profile', DEFAULT_TIMING_PROFILE)
+                    self.timing_profile_var.set(profile if profile in TIMING_PROFILES else DEFAULT_TIMING_PROFILE)
         except:
             pass
         self.root.style.theme_use(self.current_theme.get())
@@ -1490,7 +1666,8 @@ class MacroApp:
                     'recent_files': self.recent_files,
                     'theme': self.current_theme.get(),
                     'hotkey_run': self.hotkey_run_str.get(),
-                    'hotkey_stop': self.hotkey_stop_str.get()
+                    'hotkey_stop': self.hotkey_stop_str.get(),
+                    'timing_profile': self.timing_profile_var.get()
                 }, f, indent=2)
         except:
             pass
@@ -1554,13 +1731,27 @@ class MacroApp:
             return True
 
 
+def _on_first_frame():
+    lazy_loader.mark("窗口首次显示")
+    if STARTUP_REPORT:
+        lazy_loader.uninstall_import_timer()
+        print(lazy_loader.format_startup_report())
+
+
 if __name__ == "__main__":
-    pyautogui.FAILSAFE = False
+    # 帧总线以 spawn 方式启动子进程，打包为 exe 时需要
+    import multiprocessing
+    multiprocessing.freeze_support()
+    # pyautogui 延迟导入，加载时再关闭其 FAILSAFE
+    when_imported('pyautogui', lambda m: setattr(m, 'FAILSAFE', False))
     try:
         theme = "litera"
         if os.path.exists(CONFIG_FILE):
             with open(CONFIG_FILE, 'r', encoding='utf-8') as f: theme = json.load(f).get('theme', 'litera')
     except: pass
     main_window = tb.Window(themename=theme)
+    lazy_loader.mark("主窗口创建")
     app = MacroApp(main_window)
+    lazy_loader.mark("界面初始化")
+    main_window.after_idle(_on_first_frame)
     main_window.mainloop()
@@ -0,0 +1,684 @@
+# -*- coding: utf-8 -*-
+# capture_engine.py
+# 描述: 屏幕截图层：按调用方声明的格式 (灰度/RGB/BGR、降采样、区域) 一次转换到位，复用中间缓冲区
+# 版本: 1.0.0
+
+import ctypes
+import ctypes.util
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from lazy_loader import LazyModule, is_available
+
+cv2 = LazyModule('cv2')
+np = LazyModule('numpy')
+Image = LazyModule('PIL.Image')
+ImageGrab = LazyModule('PIL.ImageGrab')
+
+NUMPY_CV2_AVAILABLE = is_available('numpy') and is_available('cv2')
+
+# ======================================================================
+# 全局配置
+# ======================================================================
+CAPTURE_BACKEND = 'auto'         # 截图后端: 'auto' (Linux/X11 优先 MIT-SHM) / 'xshm' / 'pil'
+CAPTURE_FORMATS = ('pil', 'rgb', 'bgr', 'gray')
+CAPTURE_BUFFER_SLOTS = 6         # 每个线程保留的中间缓冲区个数 (按形状区分，最久未用的先释放)
+XSHM_MAX_SEGMENTS = 4            # MIT-SHM 每个线程保留的共享内存段个数 (按截图尺寸区分)
+CONTINUOUS_FPS = 30              # 后台连续截图的目标帧率
+CONTINUOUS_RING_SIZE = 3         # 连续截图环形缓冲的帧数 (预分配，正在被读取的帧不会被覆盖)
+CONTINUOUS_WAIT_FRAMES = 1.5     # 最新帧不够新时最多等待的帧间隔数，超时由调用方同步截图
+
+# (源通道顺序, 目标格式) -> cv2 颜色转换码名；None 表示无需转换
+_CVT_CODES = {
+    ('RGB', 'rgb'): None,           ('RGB', 'bgr'): 'COLOR_RGB2BGR',   ('RGB', 'gray'): 'COLOR_RGB2GRAY',
+    ('BGRA', 'rgb'): 'COLOR_BGRA2RGB', ('BGRA', 'bgr'): 'COLOR_BGRA2BGR', ('BGRA', 'gray'): 'COLOR_BGRA2GRAY',
+}
+
+# ======================================================================
+# 截图后端
+# ======================================================================
+class CaptureBackend:
+    """
+    截图后端接口。grab 返回 (像素数组, 通道顺序 'RGB' / 'BGRA')。
+    owns_buffer=True 的后端 (如共享内存) 每次 grab 都写回同一块内存，返回的数组只在下一次 grab 前有效。
+    """
+    name = 'base'
+    owns_buffer = False
+
+    def grab(self, bbox): raise NotImplementedError   # bbox: (left, top, right, bottom)，None 为全屏
+
+    def grab_pil(self, bbox):
+        arr, order = self.grab(bbox)
+        if order == 'RGB': return Image.fromarray(arr if not self.owns_buffer else arr.copy())
+        return Image.fromarray(cv2.cvtColor(arr, getattr(cv2, _CVT_CODES[(order, 'rgb')])))
+
+    def close(self): pass
+
+class PILGrabBackend(CaptureBackend):
+    """PIL.ImageGrab (各平台通用，Linux 下每次截图都要与 X 服务器往返一次)"""
+    name = 'pil'
+
+    def grab_pil(self, bbox):
+        return ImageGrab.grab(bbox=bbox)
+
+    def grab(self, bbox):
+        # PIL 图像转数组会复制一次，图像本身随即释放
+        return np.asarray(self.grab_pil(bbox)), 'RGB'
+
+class FakeCaptureBackend(CaptureBackend):
+    """
+    内存中的假屏幕，用于在无桌面环境 (如 Linux CI) 下驱动截图相关的测试与基准。
+    screen 为 RGB 数组；grab_calls 统计截图次数。
+    """
+    name = 'fake'
+
+    def __init__(self, width=1920, height=1080, screen=None, seed=0):
+        if screen is None:
+            rng = np.random.default_rng(seed)
+            screen = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+        self.screen = screen
+        self.grab_calls = 0
+
+    def grab(self, bbox):
+        self.grab_calls += 1
+        if bbox is None: return self.screen.copy(), 'RGB'
+        l, t, r, b = bbox
+        return self.screen[max(0, t):b, max(0, l):r].copy(), 'RGB'
+
+# ======================================================================
+# X11 MIT-SHM 后端 (Linux)
+# ======================================================================
+_ZPIXMAP = 2
+_ALL_PLANES = 0xFFFFFFFFFFFFFFFF if ctypes.sizeof(ctypes.c_ulong) == 8 else 0xFFFFFFFF
+_IPC_PRIVATE, _IPC_CREAT, _IPC_RMID = 0, 0o1000, 0
+_SHMAT_FAILED = ctypes.c_void_p(-1).value
+
+class _XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [('shmseg', ctypes.c_ulong), ('shmid', ctypes.c_int),
+                ('shmaddr', ctypes.c_void_p), ('readOnly', ctypes.c_int)]
+
+class _XImage(ctypes.Structure):
+    # 只声明用到的前缀字段 (之后是 funcs 函数表)，布局与 Xlib.h 一致
+    _fields_ = [('width', ctypes.c_int), ('height', ctypes.c_int), ('xoffset', ctypes.c_int),
+                ('format', ctypes.c_int), ('data', ctypes.c_void_p), ('byte_order', ctypes.c_int),
+                ('bitmap_unit', ctypes.c_int), ('bitmap_bit_order', ctypes.c_int), ('bitmap_pad', ctypes.c_int),
+                ('depth', ctypes.c_int), ('bytes_per_line', ctypes.c_int), ('bits_per_pixel', ctypes.c_int),
+                ('red_mask', ctypes.c_ulong), ('green_mask', ctypes.c_ulong), ('blue_mask', ctypes.c_ulong),
+                ('obdata', ctypes.c_void_p)]
+
+class _XErrorEvent(ctypes.Structure):
+    _fields_ = [('type', ctypes.c_int), ('display', ctypes.c_void_p), ('resourceid', ctypes.c_ulong),
+                ('serial', ctypes.c_ulong), ('error_code', ctypes.c_ubyte),
+                ('request_code', ctypes.c_ubyte), ('minor_code', ctypes.c_ubyte)]
+
+_XErrorHandler = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.POINTER(_XErrorEvent))
+
+class _ShmSegment:
+    """一块与 X 服务器共享的截图内存及其 XImage 描述"""
+    __slots__ = ('image', 'info', 'buf', 'width', 'height', 'stride', '_array')
+
+    def __init__(self, image, info, buf, width, height, stride):
+        self.image, self.info, self.buf = image, info, buf
+        self.width, self.height, self.stride = width, height, stride
+        self._array = None
+
+    def array(self):
+        """共享内存上的 (高, 宽, 4) BGRA 视图，不复制"""
+        if self._array is None:
+            self._array = np.ndarray((self.height, self.width, 4), np.uint8, buffer=self.buf,
+                                     strides=(self.stride, 4, 1))
+        return self._array
+
+def _load_x11_lib(name):
+    path = ctypes.util.find_library(name)
+    if not path: raise OSError(f"未找到 lib{name}")
+    return ctypes.CDLL(path)
+
+class XShmBackend(CaptureBackend):
+    """
+    Linux/X11 共享内存截图 (MIT-SHM 扩展，ctypes 直接调用 libX11/libXext，无额外依赖)。
+    X 服务器把像素直接写入本进程映射的共享内存段，省去 ImageGrab 每帧经 socket 传输整帧并解码；
+    每个线程按截图尺寸缓存共享内存段 (XShmGetImage 总是填满整段)，数组视图原地复用。
+    单次请求失败 (如 X 错误) 时该帧回退到 ImageGrab，并计入 failures。
+    """
+    name = 'xshm'
+    owns_buffer = True
+
+    def __init__(self, display=None):
+        self._x11 = _load_x11_lib('X11')
+        self._xext = _load_x11_lib('Xext')
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self._declare()
+        self._lock = threading.Lock()     # 本连接上的 X 请求必须串行 (未调用 XInitThreads)
+        self._local = threading.local()   # 每个线程自己的共享内存段，转换期间不会被其他线程覆盖
+        self._segments = []
+        self._errors = []
+        self._handler = _XErrorHandler(self._on_error)
+        self._fallback = None
+        self.failures = 0
+        self._dpy = self._x11.XOpenDisplay(display.encode() if display else None)
+        if not self._dpy: raise OSError("无法连接 X 服务器 (DISPLAY 未设置?)")
+        try:
+            if not self._xext.XShmQueryExtension(self._dpy): raise OSError("X 服务器不支持 MIT-SHM 扩展")
+            scr = self._x11.XDefaultScreen(self._dpy)
+            self._root = self._x11.XRootWindow(self._dpy, scr)
+            self._visual = self._x11.XDefaultVisual(self._dpy, scr)
+            self._depth = self._x11.XDefaultDepth(self._dpy, scr)
+            self.width = self._x11.XDisplayWidth(self._dpy, scr)
+            self.height = self._x11.XDisplayHeight(self._dpy, scr)
+            # 只支持 32 位小端 BGRX (24/32 位色深的本地 X 服务器与 Xvfb 均是如此)
+            img = self._segment(1, 1).image.contents
+            if img.bits_per_pixel != 32 or img.byte_order != 0 or img.red_mask != 0xFF0000 or img.blue_mask != 0xFF:
+                raise OSError(f"不支持的像素格式 ({img.depth} 位色深 / {img.bits_per_pixel} bpp)")
+            if self._grab_segment((0, 0, 1, 1)) is None: raise OSError("XShmGetImage 失败")
+        except Exception:
+            self.close()
+            raise
+
+    def _declare(self):
+        x, e, c = self._x11, self._xext, self._libc
+        P, I, UL = ctypes.c_void_p, ctypes.c_int, ctypes.c_ulong
+        PImg, PInfo = ctypes.POINTER(_XImage), ctypes.POINTER(_XShmSegmentInfo)
+        for fn, args, res in (
+            (x.XOpenDisplay, [ctypes.c_char_p], P), (x.XCloseDisplay, [P], I),
+            (x.XDefaultScreen, [P], I), (x.XRootWindow, [P, I], UL),
+            (x.XDefaultVisual, [P, I], P), (x.XDefaultDepth, [P, I], I),
+            (x.XDisplayWidth, [P, I], I), (x.XDisplayHeight, [P, I], I),
+            (x.XSync, [P, I], I), (x.XDestroyImage, [PImg], I), (x.XSetErrorHandler, [P], P),
+            (e.XShmQueryExtension, [P], I),
+            (e.XShmCreateImage, [P, P, ctypes.c_uint, I, P, PInfo, ctypes.c_uint, ctypes.c_uint], PImg),
+            (e.XShmAttach, [P, PInfo], I), (e.XShmDetach, [P, PInfo], I),
+            (e.XShmGetImage, [P, UL, PImg, I, I, UL], I),
+            (c.shmget, [I, ctypes.c_size_t, I], I), (c.shmat, [I, P, I], P),
+            (c.shmdt, [P], I), (c.shmctl, [I, I, P], I)):
+            fn.argtypes, fn.restype = args, res
+
+    def _on_error(self, _dpy, event):
+        self._errors.append(event.contents.error_code)
+        return 0
+
+    def _x_call(self, func, *args, sync=False):
+        """
+        执行一次 X 请求 (调用方持有 self._lock)。期间临时接管 Xlib 错误处理，
+        默认处理器遇到错误会直接结束进程；返回请求成功且没有收到 X 错误。
+        """
+        self._errors.clear()
+        prev = self._x11.XSetErrorHandler(ctypes.cast(self._handler, ctypes.c_void_p))
+        try:
+            ok = func(*args)
+            if sync: self._x11.XSync(self._dpy, 0)
+        finally:
+            self._x11.XSetErrorHandler(prev)
+        return bool(ok) and not self._errors
+
+    def _segment(self, w, h):
+        segs = getattr(self._local, 'segs', None)
+        if segs is None: segs = self._local.segs = OrderedDict()
+        seg = segs.get((w, h))
+        if seg is not None:
+            segs.move_to_end((w, h))
+            return seg
+        seg = segs[(w, h)] = self._create(w, h)
+        while len(segs) > XSHM_MAX_SEGMENTS:
+            old = segs.popitem(last=False)[1]
+            with self._lock: self._destroy(old)
+        return seg
+
+    def _create(self, w, h):
+        info = _XShmSegmentInfo()   # XImage.obdata 指向它，必须与段同生命周期
+        with self._lock:
+            img = self._xext.XShmCreateImage(self._dpy, self._visual, self._depth, _ZPIXMAP, None,
+                                             ctypes.byref(info), w, h)
+        if not img: raise OSError("XShmCreateImage 失败")
+        stride = img.contents.bytes_per_line
+        size = stride * h
+        info.shmid = self._libc.shmget(_IPC_PRIVATE, size, _IPC_CREAT | 0o600)
+        addr = self._libc.shmat(info.shmid, None, 0) if info.shmid >= 0 else None
+        if addr in (None, _SHMAT_FAILED):
+            err = ctypes.get_errno()
+            if info.shmid >= 0: self._libc.shmctl(info.shmid, _IPC_RMID, None)
+            img.contents.obdata = None
+            self._x11.XDestroyImage(img)
+            raise OSError(f"共享内存分配失败 ({size} 字节): {os.strerror(err)}")
+        info.shmaddr = addr
+        info.readOnly = 0
+        img.contents.data = addr
+        with self._lock:
+            ok = self._x_call(self._xext.XShmAttach, self._dpy, ctypes.byref(info), sync=True)
+        # 立即标记删除: 双方都 detach 后内核自动回收，进程崩溃也不会遗留共享内存段
+        self._libc.shmctl(info.shmid, _IPC_RMID, None)
+        seg = _ShmSegment(img, info, (ctypes.c_uint8 * size).from_address(addr), w, h, stride)
+        if not ok:
+            with self._lock: self._destroy(seg, attached=False)
+            raise OSError("XShmAttach 失败 (远程 X 服务器无法使用本机共享内存)")
+        self._segments.append(seg)
+        return seg
+
+    def _destroy(self, seg, attached=True):
+        """释放共享内存段 (调用方持有 self._lock)"""
+        if attached and self._dpy: self._x_call(self._xext.XShmDetach, self._dpy, ctypes.byref(seg.info), sync=True)
+        img = seg.image.contents
+        # data/obdata 不属于 Xlib 分配的内存，清空后 XDestroyImage 只释放 XImage 结构本身
+        img.data = None
+        img.obdata = None
+        self._x11.XDestroyImage(seg.image)
+        self._libc.shmdt(seg.info.shmaddr)
+        if seg in self._segments: self._segments.remove(seg)
+
+    def _grab_segment(self, bbox):
+        """截取到当前线程对应尺寸的共享内存段；X 请求失败返回 None"""
+        l, t, r, b = (0, 0, self.width, self.height) if bbox is None else bbox
+        l, t, r, b = max(0, l), max(0, t), min(self.width, r), min(self.height, b)
+        if r <= l or b <= t: raise ValueError(f"截图区域超出屏幕: {bbox}")
+        seg = self._segment(r - l, b - t)
+        with self._lock:
+            ok = self._x_call(self._xext.XShmGetImage, self._dpy, self._root, seg.image, l, t, _ALL_PLANES)
+        if ok: return seg
+        self.failures += 1
+        if self._fallback is None: self._fallback = PILGrabBackend()
+        return None
+
+    def grab(self, bbox):
+        seg = self._grab_segment(bbox)
+        if seg is None: return self._fallback.grab(bbox)
+        return seg.array(), 'BGRA'
+
+    def grab_pil(self, bbox):
+        # PIL 直接按 BGRX 解码共享内存 (复制一次)，不依赖 numpy/OpenCV
+        seg = self._grab_segment(bbox)
+        if seg is None: return self._fallback.grab_pil(bbox)
+        return Image.frombuffer('RGB', (seg.width, seg.height), seg.buf, 'raw', 'BGRX', seg.stride, 1)
+
+    def close(self):
+        with self._lock:
+            for seg in list(self._segments): self._destroy(seg)
+            if self._dpy:
+                self._x11.XCloseDisplay(self._dpy)
+                self._dpy = None
+        self._local = threading.local()
+
+_BACKENDS = {'pil': PILGrabBackend, 'xshm': XShmBackend}
+_backend = None
+_backend_lock = threading.Lock()
+
+def _auto_backends():
+    """'auto' 时依次尝试的后端"""
+    if sys.platform.startswith('linux') and os.environ.get('DISPLAY'): return ('xshm', 'pil')
+    return ('pil',)
+
+def get_backend():
+    """返回当前截图后端 (首次调用时按 CAPTURE_BACKEND 选择，不可用时依次回退)"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                names = _auto_backends() if CAPTURE_BACKEND == 'auto' else (CAPTURE_BACKEND, 'pil')
+                for name in names:
+                    try:
+                        _backend = _BACKENDS[name]()
+                        break
+                    except Exception as e:
+                        print(f"[截图] {name} 后端不可用: {e}")
+                print(f"[截图] 后端: {_backend.name}")
+    return _backend
+
+def set_backend(backend):
+    """替换截图后端 (测试时注入 FakeCaptureBackend)；返回原后端，不关闭"""
+    global _backend
+    with _backend_lock:
+        old, _backend = _backend, backend
+    return old
+
+# ======================================================================
+# 中间缓冲区
+# ======================================================================
+class BufferPool:
+    """
+    按 (用途, 形状) 复用的中间缓冲区，每个线程独立 (预取线程与宏线程互不覆盖)。
+    只用于转换过程中的临时数据；交给调用方的结果总是新数组，
+    因为匹配缓存会跨帧持有上一帧 (如增量匹配的 state.frame)。
+    """
+    def __init__(self, slots=CAPTURE_BUFFER_SLOTS):
+        self.slots = slots
+        self._local = threading.local()
+        self.stats = {'alloc': 0, 'reused': 0}
+
+    def get(self, name, shape, dtype='uint8'):
+        bufs = getattr(self._local, 'bufs', None)
+        if bufs is None: bufs = self._local.bufs = OrderedDict()
+        key = (name, tuple(shape), dtype)
+        buf = bufs.get(key)
+        if buf is None:
+            buf = bufs[key] = np.empty(shape, dtype)
+            while len(bufs) > self.slots: bufs.popitem(last=False)
+            self.stats['alloc'] += 1
+        else:
+            bufs.move_to_end(key)
+            self.stats['reused'] += 1
+        return buf
+
+    def clear(self):
+        self._local = threading.local()
+
+buffer_pool = BufferPool()
+
+# ======================================================================
+# 按需截图
+# ======================================================================
+class CaptureStats:
+    def __init__(self): self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.time = 0.0
+        self.bytes = 0
+        self.formats = {}
+
+    def record(self, fmt, elapsed, nbytes):
+        self.count += 1
+        self.time += elapsed
+        self.bytes += nbytes
+        self.formats[fmt] = self.formats.get(fmt, 0) + 1
+
+    def get_stats(self):
+        if not self.count: return "(无记录)"
+        fmts = ' '.join(f"{k}{v}" for k, v in self.formats.items())
+        p = buffer_pool.stats
+        return (f"({self.count}次 {fmts} | 平均{self.time / self.count * 1000:.1f}ms | "
+                f"平均输出{self.bytes / self.count / 1048576:.1f}MB | 缓冲复用{p['reused']}/分配{p['alloc']})")
+
+capture_stats = CaptureStats()
+
+def _scaled_size(shape, scale):
+    h, w = shape[:2]
+    return max(1, int(round(w * scale))), max(1, int(round(h * scale)))
+
+def convert(raw, order, fmt='rgb', scale=1.0, owned=False):
+    """
+    把后端原始像素一次转换为 fmt ('rgb' / 'bgr' / 'gray')，scale < 1 时同时降采样 (INTER_AREA)。
+    owned=True 表示 raw 属于后端 (下一次截图会被覆盖)，无需转换时也要复制一份。
+    返回的数组总是调用方独占。
+    """
+    name = _CVT_CODES[(order, fmt)]
+    code = getattr(cv2, name) if name else None
+    if scale < 1.0:
+        if code is not None:
+            # 先在复用缓冲区里转换通道 (灰度只剩 1/3 或 1/4 数据)，再缩放到新数组
+            h, w = raw.shape[:2]
+            tmp = buffer_pool.get(fmt, (h, w) if fmt == 'gray' else (h, w, 3))
+            raw = cv2.cvtColor(raw, code, dst=tmp)
+        return cv2.resize(raw, _scaled_size(raw.shape, scale), interpolation=cv2.INTER_AREA)
+    if code is not None: return cv2.cvtColor(raw, code)
+    return raw.copy() if owned else raw
+
+def capture(bbox=None, fmt='pil', scale=1.0, max_width=None, backend=None):
+    """
+    截取 bbox=(left, top, right, bottom) (None 为全屏)，直接产出调用方需要的格式:
+      'pil'  PIL RGB 图像 (WinOCR、像素探测等需要 PIL 的场合)
+      'rgb'  RGB 数组 (找图: 灰度匹配 + 颜色预过滤)
+      'bgr'  BGR 数组 (OpenCV / RapidOCR 约定)
+      'gray' 灰度数组 (不需要颜色的匹配、Tesseract、画面稳定检测)
+    scale < 1 时按比例降采样；max_width 限制输出宽度 (按截到的实际尺寸换算比例)。
+    降采样后的坐标需由调用方换算。数组格式需要 numpy + OpenCV。
+    """
+    if fmt not in CAPTURE_FORMATS: raise ValueError(f"未知截图格式: {fmt}")
+    be = backend or get_backend()
+    t0 = time.perf_counter()
+    if fmt == 'pil':
+        out = be.grab_pil(bbox)
+        if max_width and out.width > max_width: scale = min(scale, max_width / out.width)
+        if scale < 1.0: out = out.resize(_scaled_size((out.height, out.width), scale), Image.BOX)
+        nbytes = out.width * out.height * len(out.getbands())
+    else:
+        raw, order = be.grab(bbox)
+        if max_width and raw.shape[1] > max_width: scale = min(scale, max_width / raw.shape[1])
+        out = convert(raw, order, fmt, scale, be.owns_buffer)
+        nbytes = out.nbytes
+    capture_stats.record(fmt, time.perf_counter() - t0, nbytes)
+    return out
+
+def frame_size(frame):
+    """截图的 (宽, 高)，PIL 图像与数组通用"""
+    return (frame.shape[1], frame.shape[0]) if hasattr(frame, 'shape') else frame.size
+
+# ======================================================================
+# 后台连续截图
+# ======================================================================
+class Frame:
+    """环形缓冲中的一帧: 全屏 RGB 数组 + 序号 + 截取开始/完成时间 (monotonic)"""
+    __slots__ = ('array', 'seq', 'started', 'captured', 'readers')
+
+    def __init__(self, shape):
+        self.array = np.empty(shape, np.uint8)
+        self.seq, self.started, self.captured, self.readers = 0, 0.0, 0.0, 0
+
+class ContinuousCapture:
+    """
+    后台连续截图: 生产者线程按 fps 截取全屏，转换为 RGB 写入预分配的环形缓冲；
+    查找步骤用 capture(..., not_before) 取最新的足够新的帧，省去同步截图的等待。
+    读取中的帧被占用，生产者只覆盖最旧的空闲帧。
+    没有使用者 (宏未运行) 时线程阻塞等待，并释放环形缓冲。
+    """
+    def __init__(self, fps=CONTINUOUS_FPS, ring_size=CONTINUOUS_RING_SIZE, backend=None):
+        self.fps = fps
+        self.ring_size = max(3, ring_size)   # 最新帧 + 读取中的帧 + 至少一个可写帧
+        self.backend = backend
+        self._cond = threading.Condition()
+        self._users = 0
+        self._ring = []
+        self._latest = None
+        self._seq = 0
+        self._thread = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {'frames': 0, 'dropped': 0, 'latency': 0.0, 'max_latency': 0.0,
+                      'served': 0, 'waited': 0, 'stale': 0, 'age': 0.0}
+
+    @property
+    def active(self):
+        return self._users > 0
+
+    def start(self):
+        """登记一个使用者 (宏开始运行)；可嵌套，与 stop 成对调用"""
+        with self._cond:
+            self._users += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='continuous-capture', daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def stop(self):
+        """注销一个使用者；全部注销后生产者在当前帧完成后进入空闲"""
+        with self._cond:
+            self._users = max(0, self._users - 1)
+            self._cond.notify_all()
+
+    def _run(self):
+        next_at = time.monotonic()
+        while True:
+            with self._cond:
+                if not self._users:
+                    self._ring, self._latest = [], None
+                    while not self._users: self._cond.wait()
+                    next_at = time.monotonic()
+            try:
+                self._produce()
+            except Exception as e:
+                print(f"[截图] 连续截图失败: {e}")
+                with self._cond: self._cond.wait(1.0)
+                next_at = time.monotonic()
+                continue
+            period = 1.0 / self.fps
+            next_at += period
+            now = time.monotonic()
+            if now > next_at:
+                # 截图耗时超过帧间隔: 错过的帧计为丢帧，按当前时间重新对齐
+                missed = int((now - next_at) / period) + 1
+                self.stats['dropped'] += missed
+                next_at += missed * period
+            time.sleep(max(0.0, next_at - time.monotonic()))
+
+    def _writable(self, shape):
+        """返回可覆盖的帧 (调用方持有锁)；分辨率变化时重新分配环形缓冲"""
+        if not self._ring or self._ring[0].array.shape != shape:
+            self._ring = [Frame(shape) for _ in range(self.ring_size)]
+            self._latest = None
+        while True:
+            free = [f for f in self._ring if f is not self._latest and not f.readers]
+            if free: return min(free, key=lambda f: f.seq)
+            self._cond.wait(0.1)
+
+    def _produce(self):
+        be = self.backend or get_backend()
+        t0 = time.monotonic()
+        raw, order = be.grab(None)
+        with self._cond:
+            frame = self._writable(raw.shape[:2] + (3,))
+        if order == 'RGB': np.copyto(frame.array, raw)
+        else: cv2.cvtColor(raw, getattr(cv2, _CVT_CODES[(order, 'rgb')]), dst=frame.array)
+        t1 = time.monotonic()
+        with self._cond:
+            self._seq += 1
+            frame.seq, frame.started, frame.captured = self._seq, t0, t1
+            self._latest = frame
+            self._cond.notify_all()
+        s = self.stats
+        s['frames'] += 1
+        s['latency'] += t1 - t0
+        s['max_latency'] = max(s['max_latency'], t1 - t0)
+
+    def capture(self, bbox, fmt='pil', scale=1.0, max_width=None, not_before=0.0, timeout=None):
+        """
+        从最新帧裁剪 bbox 并转换为 fmt (参数同 capture_engine.capture)，返回 (截图, 帧截取开始时间)。
+        只采用截取开始时间不早于 not_before 的帧，最新帧不够新时最多等待 timeout 秒
+        (默认 CONTINUOUS_WAIT_FRAMES 个帧间隔)；服务未运行或超时返回 None，由调用方同步截图。
+        """
+        if timeout is None: timeout = CONTINUOUS_WAIT_FRAMES / self.fps
+        with self._cond:
+            if not self._users: return None
+            fresh = lambda: self._latest is not None and self._latest.started >= not_before
+            if not fresh():
+                self.stats['waited'] += 1
+                if not self._cond.wait_for(fresh, timeout):
+                    self.stats['stale'] += 1
+                    return None
+            frame = self._latest
+            frame.readers += 1
+        try:
+            h, w = frame.array.shape[:2]
+            l, t, r, b = (0, 0, w, h) if bbox is None else bbox
+            crop = frame.array[max(0, t):min(h, b), max(0, l):min(w, r)]
+            if max_width and crop.shape[1] > max_width: scale = min(scale, max_width / crop.shape[1])
+            # 帧会被生产者覆盖，convert(owned=True) 保证输出是独立的新数组
+            out = convert(crop, 'RGB', 'rgb' if fmt == 'pil' else fmt, scale, True)
+            if fmt == 'pil': out = Image.fromarray(out)
+        finally:
+            with self._cond:
+                frame.readers -= 1
+                self._cond.notify_all()
+        self.stats['served'] += 1
+        self.stats['age'] += time.monotonic() - frame.captured
+        return out, frame.started
+
+    def get_stats(self):
+        s = self.stats
+        if not s['frames']: return "(无记录)"
+        served = max(1, s['served'])
+        return (f"(产出{s['frames']}帧 丢帧{s['dropped']} | 截图延迟 平均{s['latency'] / s['frames'] * 1000:.1f}ms"
+                f"/最大{s['max_latency'] * 1000:.1f}ms | 取帧{s['served']}次 (等待新帧{s['waited']}) "
+                f"平均帧龄{s['age'] / served * 1000:.1f}ms | 过期回退{s['stale']})")
+
+continuous_capture = ContinuousCapture()
+
+# ======================================================================
+# 基准测试
+# ======================================================================
+def peak_rss_mb():
+    """进程峰值常驻内存 (MB)"""
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+        pmc = PROCESS_MEMORY_COUNTERS()
+        pmc.cb = ctypes.sizeof(pmc)
+        ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(pmc), pmc.cb)
+        return pmc.PeakWorkingSetSize / 1048576
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1048576 if sys.platform == 'darwin' else rss / 1024   # macOS 单位为字节，Linux 为 KB
+
+def benchmark_capture_memory(mode='hinted', iterations=200, width=3840, height=2160, fake=True):
+    """
+    模拟长循环中的找图截图，统计 Python 侧分配峰值 (tracemalloc，含 numpy 数组) 与进程峰值 RSS。
+      legacy: 全彩 PIL 截图一直持有，灰度匹配与颜色预过滤各自 np.array 转换一次
+      hinted: 截图直接产出 RGB 数组 (找图默认格式)，灰度由数组一次转换
+      gray:   截图直接产出灰度数组 (关闭颜色预过滤时的格式)
+    进程峰值 RSS 只增不减，需要在独立进程中分别运行各模式 (见 __main__)。
+    """
+    import tracemalloc
+    backend = FakeCaptureBackend(width, height) if fake else get_backend()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    t0 = time.perf_counter()
+    keep = None
+    for _ in range(iterations):
+        if mode == 'legacy':
+            ss = backend.grab_pil(None)
+            gray = cv2.cvtColor(np.array(ss), cv2.COLOR_RGB2GRAY)
+            rgb = np.asarray(ss)
+            keep = (ss, gray, rgb)
+        elif mode == 'hinted':
+            rgb = capture(None, 'rgb', backend=backend)
+            keep = (rgb, cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY))
+        else:
+            keep = capture(None, 'gray', backend=backend)
+    elapsed = (time.perf_counter() - t0) / iterations
+    _cur, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del keep
+    peak_mb = (peak - base) / 1048576
+    rss = peak_rss_mb()
+    print(f"[基准] 截图内存 {mode:>6} ({width}x{height} x{iterations}): 分配峰值 {peak_mb:.0f}MB | "
+          f"进程峰值RSS {rss:.0f}MB | 单帧 {elapsed*1000:.1f}ms")
+    return peak_mb, rss
+
+def benchmark_xshm(frames=30, region=(100, 100, 300, 300)):
+    """
+    对比 ImageGrab 与 MIT-SHM 的截图耗时 (全屏与区域)，并逐像素核对两者结果一致。
+    没有桌面的机器可在 Xvfb 中运行: xvfb-run -s "-screen 0 1920x1080x24" python capture_engine.py --xshm
+    """
+    shm, pil = XShmBackend(), PILGrabBackend()
+    try:
+        for bbox in (None, region):
+            same = np.array_equal(cv2.cvtColor(shm.grab(bbox)[0], cv2.COLOR_BGRA2RGB), np.asarray(pil.grab_pil(bbox)))
+            timing = []
+            for backend in (pil, shm):
+                t0 = time.perf_counter()
+                for _ in range(frames): capture(bbox, 'rgb', backend=backend)
+                timing.append((time.perf_counter() - t0) / frames * 1000)
+            label = f"{shm.width}x{shm.height}" if bbox is None else f"区域 {bbox}"
+            print(f"[基准] {label}: ImageGrab {timing[0]:.1f}ms | MIT-SHM {timing[1]:.1f}ms | "
+                  f"像素一致 {'是' if same else '否'}")
+            if not same: return False
+        return True
+    finally:
+        shm.close()
+
+if __name__ == "__main__":
+    # 每个模式在独立进程中运行，进程峰值 RSS 才可比较
+    import subprocess
+    if '--xshm' in sys.argv:
+        sys.exit(0 if benchmark_xshm() else 1)
+    if len(sys.argv) > 2 and sys.argv[1] == '--memory':
+        benchmark_capture_memory(sys.argv[2], fake='--screen' not in sys.argv)
+    else:
+        for mode in ('legacy', 'hinted', 'gray'):
+            subprocess.run([sys.executable, __file__, '--memory', mode] + sys.argv[1:])
@@ -4,21 +4,35 @@
 # 版本:1.56.0
 # 变更:(修复) 条件循环迭代计数混乱问题、UI快速恢复问题
 
-import pyautogui
 import time
-from PIL import Image, ImageGrab, ImageStat
 import re
-import pyperclip
 import os
 import sys
-from collections import defaultdict
+from collections import defaultdict, deque
 import functools 
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from lazy_loader import LazyModule, is_available
 
-try:
-    import pygetwindow as gw
-    PYGETWINDOW_AVAILABLE = True
-except ImportError:
-    PYGETWINDOW_AVAILABLE = False
+from input_backend import get_input_backend, resolve_timing_profile, inject_text
+from scheduler import (ensure_stop_event, request_stop, is_stopped, wait_for, wait_until,
+                       HighResolutionTimer, FixedRateTimer, OVERRUN_REPORT_LIMIT)
+
+# 重型依赖全部延迟到首次使用时导入 (见 lazy_loader)
+pyperclip = LazyModule('pyperclip')
+ImageGrab = LazyModule('PIL.ImageGrab')
+ImageChops = LazyModule('PIL.ImageChops')
+ImageStat = LazyModule('PIL.ImageStat')
+
+import match_engine
+from match_engine import (incremental_matcher, color_prefilter, exact_matcher, fft_matcher, feature_matcher,
+                          match_in_boxes, read_template, template_crop)
+from capture_engine import capture, capture_stats, continuous_capture, frame_size
+from frame_bus import frame_bus
+from pixel_probe import (parse_pixel_spec, bounding_box, covers, sample, evaluate, format_color,
+                         PIXEL_DEFAULT_TOLERANCE, PIXEL_FRAME_MAX_AGE)
+from window_manager import PYGETWINDOW_AVAILABLE, WINDOW_ACTIVATE_TIMEOUT, window_registry
+if not PYGETWINDOW_AVAILABLE:
     print("[配置] ✗ 未找到 pygetwindow 库 (pip install pygetwindow)。'激活窗口' 功能将不可用。")
 
 # ======================================================================
@@ -31,8 +45,31 @@ LOOP_CHECK_INTERVAL = 0.2  # 优化: 从 0.5s 降低到 0.2s (平衡流畅度与
 # 性能与缓存相关常量
 LOOP_PHYSICAL_COOLDOWN = 0.05  # 循环物理冷却时间（秒），防止队列瞬间爆炸
 CACHE_BOX_PADDING = 50  # 缓存区域扩展边距（像素）
+ANCHOR_REGION_PADDING = 10  # 相对锚点的搜索区域扩展边距（像素），锚点每次重新定位，余量可以很小
+WINDOW_ANCHOR = 'window'    # ACTIVATE_WINDOW 总是把激活窗口的左上角登记为此锚点
 TEMPLATE_CACHE_SIZE = 500  # 模板缓存大小（优化：从100增加到500）
 QUICK_CHECK_SCALES = [1.0, 0.9, 1.1]  # 快速检查尝试的缩放比例
+# 循环内移动目标跟踪 (步骤参数 track=True 时启用)
+TRACK_HISTORY = 5            # 每个目标保留的最近位置数
+TRACK_BASE_RADIUS = 15       # 预测窗口基础半径 (像素)，与 quick_check 的容差一致
+TRACK_VELOCITY_FACTOR = 0.5  # 预测不确定度随 速度×间隔 增长的比例
+TRACK_MISS_GROWTH = 2        # 每次未命中后窗口半径放大的倍数
+TRACK_MAX_RADIUS = 400
+TRACK_MAX_MISSES = 3         # 连续未命中 K 次后才回退到全局搜索
+INCREMENTAL_MATCH = True  # 跨帧增量匹配：只重算画面变化区域的得分 (见 match_engine)
+COLOR_PREFILTER = True    # 颜色签名预过滤：颜色明显不符时跳过 matchTemplate (见 match_engine)
+EXACT_MATCH = True        # 曾以 100% 缩放逐像素命中的模板优先走精确匹配 (见 match_engine)
+MATCH_BACKEND = 'auto'    # 全图匹配后端: 'cv2' / 'fft' / 'auto' (模板短边 >= FFT_MIN_SIDE 时用 FFT)
+FFT_MIN_SIDE = 256        # auto 模式下改用 FFT 的模板短边阈值 (见 match_engine.benchmark_fft)
+# 前瞻预取
+PREFETCH_LOOKAHEAD = 3          # 向后查找下一个查找步骤的最大步数
+SPECULATIVE_MIN_WAIT = 0.05     # WAIT 短于此值 (秒) 不做推测匹配
+SPECULATIVE_DEFAULT_LEAD = 0.1  # 无历史耗时时推测匹配的提前量 (秒)
+SPECULATIVE_MAX_AGE = 0.3       # 推测帧被采用时的最大年龄 (秒)
+CONTINUOUS_MAX_AGE = 0.1        # 查找步骤可直接采用的后台连续截图帧的最大年龄 (秒)
+# 画面稳定检测
+STABLE_SAMPLE_WIDTH = 240       # 采样帧缩小到约此宽度后再比较
+STABLE_DEFAULTS = {'interval_ms': 50, 'stable_count': 3, 'timeout_ms': 5000, 'threshold': 1.0}
 
 
 
@@ -46,13 +83,12 @@ except ImportError:
         TESSERACT_AVAILABLE = False
         RAPIDOCR_AVAILABLE = False
 
-try:
-    import cv2
-    import numpy as np 
-    OPENCV_AVAILABLE = True
+OPENCV_AVAILABLE = is_available('cv2') and is_available('numpy')
+if OPENCV_AVAILABLE:
+    cv2 = LazyModule('cv2')
+    np = LazyModule('numpy')
     print("[配置] ✓ OpenCV 引擎就绪 (极速找图内核已可用)")
-except ImportError:
-    OPENCV_AVAILABLE = False
+else:
     print("[配置] ✗ 未找到 OpenCV。将回退到慢速找图模式。")
 
 # ======================================================================
@@ -124,6 +160,9 @@ class MacroSchema:
         'END_IF':         '14. END_IF',
         'LOOP_START':     '15. 循环开始 (Loop)',
         'END_LOOP':       '16. 结束循环 (EndLoop)',
+        'WAIT_UNTIL_STABLE': '17. 等待画面稳定',
+        'IF_PIXEL_COLOR': '18. IF 像素颜色',
+        'GET_PIXELS':     '19. 读取像素颜色',
     }
     ACTION_KEYS_TO_NAME = {v: k for k, v in ACTION_TRANSLATIONS.items()}
     
@@ -132,6 +171,15 @@ class MacroSchema:
     
     CLICK_OPTIONS = {'left (左键)': 'left', 'right (右键)': 'right', 'middle (中键)': 'middle'}
     CLICK_VALUES_TO_NAME = {v: k for k, v in CLICK_OPTIONS.items()}
+    
+    TEXT_METHOD_OPTIONS = {'自动 (直接输入, 失败时粘贴)': 'auto', '直接输入 (Unicode)': 'unicode', '剪贴板粘贴': 'clipboard'}
+    TEXT_METHOD_VALUES_TO_NAME = {v: k for k, v in TEXT_METHOD_OPTIONS.items()}
+
+    MATCH_MODE_OPTIONS = {'模板匹配 (多缩放)': 'template', '特征点匹配 (缩放无关)': 'feature'}
+    MATCH_MODE_VALUES_TO_NAME = {v: k for k, v in MATCH_MODE_OPTIONS.items()}
+
+    PIXEL_MATCH_OPTIONS = {'全部匹配 (AND)': 'all', '任一匹配 (OR)': 'any'}
+    PIXEL_MATCH_VALUES_TO_NAME = {v: k for k, v in PIXEL_MATCH_OPTIONS.items()}
 
 # ======================================================================
 # 性能监控
@@ -162,6 +210,35 @@ perf = PerformanceMonitor()
 # ======================================================================
 # 循环缓存管理器
 # ======================================================================
+class TargetTrack:
+    """
+    移动目标的运动模型：保存最近位置与时间，按匀速假设预测下一次位置。
+    预测窗口半径随 速度×时间间隔 增长，并随连续未命中次数成倍扩大。
+    """
+    def __init__(self):
+        self.history = deque(maxlen=TRACK_HISTORY)   # [(t, x, y)]
+        self.velocity = (0.0, 0.0)                   # 像素/秒
+        self.misses = 0
+
+    def observe(self, loc, t=None):
+        t = time.monotonic() if t is None else t
+        if self.history:
+            # 用窗口内首尾两点估计速度，比相邻两点更抗抖动
+            t0, x0, y0 = self.history[0]
+            if t > t0:
+                self.velocity = ((loc[0] - x0) / (t - t0), (loc[1] - y0) / (t - t0))
+        self.history.append((t, loc[0], loc[1]))
+        self.misses = 0
+
+    def predict(self, t=None):
+        """返回 (预测坐标, 搜索半径)"""
+        t = time.monotonic() if t is None else t
+        t_last, x, y = self.history[-1]
+        dt = t - t_last
+        vx, vy = self.velocity
+        radius = (TRACK_BASE_RADIUS + TRACK_VELOCITY_FACTOR * (abs(vx) + abs(vy)) * dt) * TRACK_MISS_GROWTH ** self.misses
+        return (int(x + vx * dt), int(y + vy * dt)), int(min(radius, TRACK_MAX_RADIUS))
+
 class LoopCacheManager:
     def __init__(self): self.reset()
     
@@ -199,57 +276,235 @@ class LoopCacheManager:
             if loop_id not in self.caches:
                  self.caches[loop_id] = {}
             self.caches[loop_id][sig] = loc
+            track = self.caches[loop_id].get(('track', sig))
+            if track: track.observe(loc)
+
+    def get_track(self, sig, create=False):
+        """返回当前循环中该目标的 TargetTrack (仅跟踪模式的步骤会创建)"""
+        loop_id = self.get_current_loop_id()
+        if not loop_id: return None
+        cache = self.caches.setdefault(loop_id, {})
+        track = cache.get(('track', sig))
+        if track is None and create:
+            track = cache[('track', sig)] = TargetTrack()
+            if sig in cache: track.observe(cache[sig])
+        return track
 
 loop_cache = LoopCacheManager()
 
 # ======================================================================
 # 核心工具函数
 # ======================================================================
-def smart_screenshot(region=None):
-    if region:
-        pad = 0
-        x = max(0, region[0] - pad)
-        y = max(0, region[1] - pad)
-        return ImageGrab.grab(bbox=(x, y, region[0]+region[2]+pad, region[1]+region[3]+pad)), (x, y)
-    return ImageGrab.grab(), (0, 0)
+_last_frame = (0.0, None, (0, 0))  # (截取开始时间, 截图, 左上角)：最近一次截图，供像素探测复用
+
+def _region_bbox(region):
+    """region=(x, y, w, h) -> 截图框 (left, top, right, bottom)；None 为全屏"""
+    if not region: return None
+    return (max(0, region[0]), max(0, region[1]), region[0] + region[2], region[1] + region[3])
+
+def smart_screenshot(region=None, fmt='pil', scale=1.0, max_width=None, not_before=None):
+    """
+    截取 region=(x, y, w, h) (None 为全屏)，返回 (截图, 左上角)。
+    fmt/scale/max_width 为格式提示 (见 capture_engine.capture)，截图层一次转换到位。
+    not_before 不为 None 且后台连续截图在运行时，优先从截取开始时间不早于它的最新帧裁剪。
+    """
+    global _last_frame
+    bbox = _region_bbox(region)
+    offset = (bbox[0], bbox[1]) if bbox else (0, 0)
+    hit = None
+    if not_before is not None and continuous_capture.active:
+        hit = continuous_capture.capture(bbox, fmt, scale, max_width, not_before)
+    if hit is not None:
+        ss, started = hit  # 后台帧记其截取开始时间，而不是取出的时间
+    else:
+        started = time.monotonic()
+        ss = capture(bbox, fmt, scale, max_width)
+    # 原分辨率的彩色帧才能供像素探测复用
+    if fmt in ('pil', 'rgb') and scale >= 1.0 and not max_width:
+        _last_frame = (started, ss, offset)
+    return ss, offset
+
+def _capture_format(is_img, p=None, engine='auto'):
+    """
+    查找步骤需要的截图格式: 找图匹配只用灰度，颜色预过滤额外需要颜色；
+    Tesseract 只用灰度，RapidOCR 用数组，WinOCR 与未指定引擎时保持 PIL 图像。
+    """
+    if not OPENCV_AVAILABLE: return 'pil'
+    if is_img:
+        feature = p is not None and p.get('match_mode') == 'feature'
+        return 'rgb' if COLOR_PREFILTER and not feature else 'gray'
+    return {'tesseract': 'gray', 'rapidocr': 'rgb'}.get(engine, 'pil')
+
+def _fresh_after(ctx):
+    """后台帧必须在此时间之后开始截取: 不早于上一个可能改变画面的步骤结束，且不超过 CONTINUOUS_MAX_AGE"""
+    return max(ctx.get('screen_changed_at', 0.0), time.monotonic() - CONTINUOUS_MAX_AGE)
+
+def read_pixels(points, ctx=None):
+    """
+    批量读取探测点颜色，只截一次图: 最近的共享帧足够新、覆盖全部点，
+    且截取后没有执行过可能改变画面的步骤 (ctx['screen_changed_at']) 时直接复用，
+    否则只截取所有点的外接框。返回 (颜色列表, 来源 'shared'/'bbox')。
+    """
+    t, ss, offset = _last_frame
+    changed_at = ctx.get('screen_changed_at', 0.0) if ctx else 0.0
+    if (ss is not None and t >= changed_at and time.monotonic() - t <= PIXEL_FRAME_MAX_AGE
+            and covers(ss, offset, points)):
+        return sample(ss, offset, points), 'shared'
+    bbox = bounding_box(points)
+    return sample(capture(bbox, 'pil'), (bbox[0], bbox[1]), points), 'bbox'
 
 SCALES = [1.0, 0.9, 1.1, 0.8, 1.2]
 @functools.lru_cache(maxsize=500)  # [优化] 增大缓存以减少文件读取
 def _get_template(path, scale):
-    img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    img = read_template(path, cv2.IMREAD_GRAYSCALE)  # 经模板优化器裁剪过的只返回裁剪块
     if img is None: return None, 0, 0
     if scale != 1.0:
         h, w = img.shape[:2]
         img = cv2.resize(img, (int(w*scale), int(h*scale)), interpolation=cv2.INTER_AREA)
     return img, img.shape[1], img.shape[0]
 
+def _template_anchor(path, scale, tw, th):
+    """
+    返回 (ax, ay, w, h): 匹配位置 (模板左上角) 到点击中心的偏移，以及报告的目标尺寸。
+    裁剪过的模板指向原模板的中心与尺寸，未裁剪时就是模板自身的中心。
+    """
+    crop = template_crop(path)
+    if not crop: return tw // 2, th // 2, tw, th
+    x0, y0, _x1, _y1, W, H = crop
+    return int((W / 2 - x0) * scale), int((H / 2 - y0) * scale), int(W * scale), int(H * scale)
+
+def _anchored_templates(path, scales):
+    """[(模板, tw, th, ax, ay)]，跳过读取失败的缩放比例"""
+    out = []
+    for s in scales:
+        tmpl, tw, th = _get_template(path, s)
+        if tmpl is None: continue
+        ax, ay, _w, _h = _template_anchor(path, s, tw, th)
+        out.append((tmpl, tw, th, ax, ay))
+    return out
+
+def clear_template_caches():
+    """模板文件或裁剪信息变化后 (如运行模板优化器) 清空所有按路径缓存的模板数据"""
+    _get_template.cache_clear()
+    template_crop.cache_clear()
+    match_engine._template_gray.cache_clear()
+    match_engine._exact_template.cache_clear()
+    match_engine._template_signature.cache_clear()
+    exact_matcher.clear(); incremental_matcher.clear(); fft_matcher.clear()
+
+def _use_fft(tmpl):
+    """
+    全图匹配是否走 FFT 后端。大模板下 FFT 明显更快，且同一帧的各缩放比例共用画面频谱；
+    增量匹配对大模板收益有限 (脏块按模板尺寸外扩后几乎覆盖全图)，因此 FFT 优先于增量匹配。
+    """
+    if MATCH_BACKEND == 'fft': return True
+    return MATCH_BACKEND == 'auto' and min(tmpl.shape[:2]) >= FFT_MIN_SIDE
+
 def find_image_cv2(path, conf, screenshot_pil, offset=(0,0)):
     if not OPENCV_AVAILABLE: return None
     try:
         t0 = time.time()
-        screen_gray = cv2.cvtColor(np.array(screenshot_pil), cv2.COLOR_RGB2GRAY)
-        best = (-1, None, 0, 0)
+        screen_gray = _frame_gray(screenshot_pil)
+        if EXACT_MATCH and exact_matcher.is_promoted(path):
+            hit = exact_matcher.find(path, screen_gray)
+            if hit is not None and hit[1] >= conf:
+                (x, y), val, (tw, th) = hit
+                ax, ay, w, h = _template_anchor(path, 1.0, tw, th)
+                perf.record_time(time.time()-t0, False)
+                return (offset[0] + x + ax, offset[1] + y + ay, w, h), val
+        best = (-1, None, 0, 0, 1.0)
         for scale in SCALES:
             tmpl, tw, th = _get_template(path, scale)
             if tmpl is None or th > screen_gray.shape[0] or tw > screen_gray.shape[1]: continue
-            res = cv2.matchTemplate(screen_gray, tmpl, cv2.TM_CCOEFF_NORMED)
-            min_v, max_v, min_l, max_l = cv2.minMaxLoc(res)
-            if max_v > best[0]: best = (max_v, max_l, tw, th)
+            boxes = color_prefilter.candidates(path, scale, screenshot_pil, tmpl.shape) \
+                if COLOR_PREFILTER and getattr(screenshot_pil, 'ndim', 3) == 3 else None
+            if boxes is not None:
+                if not boxes: continue  # 颜色签名排除，此缩放比例不可能命中
+                max_v, max_l = match_in_boxes(screen_gray, tmpl, boxes)
+                if max_l is None: continue
+            elif _use_fft(tmpl):
+                max_v, max_l = fft_matcher.match((path, scale), screen_gray, tmpl)
+            elif INCREMENTAL_MATCH:
+                max_v, max_l = incremental_matcher.match((path, scale, tuple(offset)), screen_gray, tmpl)
+            else:
+                res = cv2.matchTemplate(screen_gray, tmpl, cv2.TM_CCOEFF_NORMED)
+                min_v, max_v, min_l, max_l = cv2.minMaxLoc(res)
+            if max_v > best[0]: best = (max_v, max_l, tw, th, scale)
             if best[0] >= 0.95 and best[0] >= conf: break 
-        val, loc, w, h = best
+        val, loc, w, h, scale = best
         if val >= conf and loc:
-            cx, cy = offset[0] + loc[0] + w//2, offset[1] + loc[1] + h//2
+            if EXACT_MATCH: exact_matcher.observe(path, screen_gray, loc, scale, val)
+            ax, ay, w, h = _template_anchor(path, scale, w, h)
+            cx, cy = offset[0] + loc[0] + ax, offset[1] + loc[1] + ay
             perf.record_time(time.time()-t0, False)
             return (cx, cy, w, h), val
     except (cv2.error, ValueError, TypeError, AttributeError) as e:
         print(f"CV2找图错误: {e}")
     return None
 
+def find_image_feature(path, conf, screenshot_pil, offset=(0,0)):
+    """
+    特征点模式找图 (见 match_engine.FeatureMatcher)，返回格式与 find_image_cv2 相同。
+    模板特征点不足时返回 False，由调用方回退到模板匹配。
+    """
+    if not OPENCV_AVAILABLE: return None
+    try:
+        t0 = time.time()
+        hit = feature_matcher.find(path, _frame_gray(screenshot_pil))
+        if hit is False: return False
+        if hit and hit[2] >= conf:
+            (cx, cy), (w, h), val = hit
+            perf.record_time(time.time()-t0, False)
+            return (offset[0] + cx, offset[1] + cy, w, h), val
+    except (cv2.error, ValueError, TypeError, AttributeError) as e:
+        print(f"特征点找图错误: {e}")
+    return None
+
+_feature_fallback_warned = set()
+
+def find_image(path, conf, screenshot_pil, offset=(0,0), mode='template'):
+    """按匹配方式找图: 'template' 多缩放模板匹配 / 'feature' 特征点匹配"""
+    if mode == 'feature':
+        res = find_image_feature(path, conf, screenshot_pil, offset)
+        if res is not False: return res
+        if path not in _feature_fallback_warned:
+            _feature_fallback_warned.add(path)
+            print(f"  [特征点] 模板纹理不足，无法提取足够特征点，改用模板匹配: {os.path.basename(path)}")
+    return find_image_cv2(path, conf, screenshot_pil, offset)
+
+_gray_slot = (None, None)  # (截图对象, 灰度数组)：同一帧只转换一次；整体替换保证线程间一致
+
+def _frame_gray(screenshot_pil, box=None):
+    """
+    返回截图 (或其 box 区域) 的灰度数组。整帧灰度会被缓存，
+    同一帧上的后续查询直接切片，不再重复转换。
+    """
+    global _gray_slot
+    if getattr(screenshot_pil, 'ndim', 0) == 2:
+        # 截图层已直接产出灰度
+        return screenshot_pil if box is None else screenshot_pil[box[1]:box[3], box[0]:box[2]]
+    cached_ss, gray = _gray_slot
+    if cached_ss is screenshot_pil:
+        return gray if box is None else gray[box[1]:box[3], box[0]:box[2]]
+    if box is not None:
+        sub = screenshot_pil[box[1]:box[3], box[0]:box[2]] if hasattr(screenshot_pil, 'shape') \
+            else np.array(screenshot_pil.crop(box))
+        return cv2.cvtColor(sub, cv2.COLOR_RGB2GRAY)
+    gray = cv2.cvtColor(np.asarray(screenshot_pil), cv2.COLOR_RGB2GRAY)
+    _gray_slot = (screenshot_pil, gray)
+    return gray
+
+def _window_box(center, half_w, half_h, size):
+    l, t = max(0, center[0] - half_w), max(0, center[1] - half_h)
+    r, b = min(size[0], center[0] + half_w), min(size[1], center[1] + half_h)
+    return (l, t, r, b)
+
 def quick_check_cv2(path, conf, screenshot_pil, offset, target_loc):
     """
     [补丁优化] 快速检查图片是否仍在缓存位置
     
-    优化: 支持多缩放比例检查，避免缓存失效
+    优化: 支持多缩放比例检查，避免缓存失效；
+    所有缩放比例共用一次灰度转换 (取最大窗口转换一次，再按各自窗口切片)
     
     Args:
         path: 图片文件路径
@@ -263,18 +518,20 @@ def quick_check_cv2(path, conf, screenshot_pil, offset, target_loc):
     """
     if not OPENCV_AVAILABLE: return False
     try:
+        rel = (target_loc[0] - offset[0], target_loc[1] - offset[1])
+        tmpls = _anchored_templates(path, QUICK_CHECK_SCALES)
+        if not tmpls: return False
+        # 每个缩放比例的检查窗口: 以模板自身中心的预期位置为中心 (裁剪模板相对点击中心有偏移)
+        boxes = [_window_box((rel[0] - ax + tw//2, rel[1] - ay + th//2), tw//2 + 15, th//2 + 15, frame_size(screenshot_pil))
+                 for _, tw, th, ax, ay in tmpls]
+        outer = (min(b[0] for b in boxes), min(b[1] for b in boxes), max(b[2] for b in boxes), max(b[3] for b in boxes))
+        if outer[2] <= outer[0] or outer[3] <= outer[1]: return False
+        gray = _frame_gray(screenshot_pil, outer)
+        
         # [补丁优化] 尝试多个缩放比例，避免因缩放不匹配导致误判
-        for scale in QUICK_CHECK_SCALES:
-            tmpl, tw, th = _get_template(path, scale)
-            if tmpl is None: continue
-            
-            pad_w, pad_h = tw//2 + 15, th//2 + 15
-            rel_x, rel_y = target_loc[0] - offset[0], target_loc[1] - offset[1]
-            l, t = max(0, rel_x - pad_w), max(0, rel_y - pad_h)
-            r, b = min(screenshot_pil.width, rel_x + pad_w), min(screenshot_pil.height, rel_y + pad_h)
-            if r <= l or b <= t: continue
-            
-            crop = cv2.cvtColor(np.array(screenshot_pil.crop((l, t, r, b))), cv2.COLOR_RGB2GRAY)
+        for (tmpl, tw, th, _ax, _ay), (l, t, r, b) in zip(tmpls, boxes):
+            crop = gray[t - outer[1]:b - outer[1], l - outer[0]:r - outer[0]]
+            if crop.shape[0] < th or crop.shape[1] < tw: continue
             _, max_v, _, _ = cv2.minMaxLoc(cv2.matchTemplate(crop, tmpl, cv2.TM_CCOEFF_NORMED))
             
             if max_v >= conf:
@@ -288,16 +545,346 @@ def quick_check_cv2(path, conf, screenshot_pil, offset, target_loc):
         traceback.print_exc()
         return False
 
+def track_check_cv2(path, conf, screenshot_pil, offset, center, radius):
+    """
+    在预测位置 center 周围 radius 的窗口内查找模板 (跟踪模式)。
+    与 quick_check_cv2 相同，整个窗口只做一次灰度转换。
+
+    Returns:
+        (x, y) 命中时的屏幕坐标，否则 None
+    """
+    if not OPENCV_AVAILABLE: return None
+    try:
+        rel = (center[0] - offset[0], center[1] - offset[1])
+        tmpls = _anchored_templates(path, QUICK_CHECK_SCALES)
+        if not tmpls: return None
+        boxes = [_window_box((rel[0] - ax + tw//2, rel[1] - ay + th//2), tw//2 + radius, th//2 + radius, frame_size(screenshot_pil))
+                 for _, tw, th, ax, ay in tmpls]
+        box = (min(b[0] for b in boxes), min(b[1] for b in boxes), max(b[2] for b in boxes), max(b[3] for b in boxes))
+        gray = _frame_gray(screenshot_pil, box)
+        best = (-1, None, 0, 0)
+        for tmpl, tw, th, ax, ay in tmpls:
+            if gray.shape[0] < th or gray.shape[1] < tw: continue
+            _, max_v, _, max_l = cv2.minMaxLoc(cv2.matchTemplate(gray, tmpl, cv2.TM_CCOEFF_NORMED))
+            if max_v > best[0]: best = (max_v, max_l, ax, ay)
+        val, loc, ax, ay = best
+        if loc is None or val < conf: return None
+        return (offset[0] + box[0] + loc[0] + ax, offset[1] + box[1] + loc[1] + ay)
+    except (cv2.error, ValueError, TypeError, AttributeError, IndexError) as e:
+        print(f"[track_check_cv2] 异常: {e}")
+        return None
+
+# ======================================================================
+# 步骤融合优化 (Peephole)
+# ======================================================================
+def _is_plain_click(step):
+    """不带坐标的 CLICK (在当前鼠标位置点击)"""
+    return step.get('action') == 'CLICK' and 'x' not in step.get('params', {}) and 'y' not in step.get('params', {})
+
+def _fused(action, params, group):
+    first, last = group[0][0] + 1, group[-1][0] + 1
+    return {'action': action, 'params': params, '_line': f"{first}-{last}" if last != first else first}
+
+def optimize_steps(steps):
+    """
+    执行前的窥孔优化：把常见的相邻步骤组合融合为一个复合操作。
+
+    - FIND_IMAGE/FIND_TEXT → CLICK  => FUSED_FIND_CLICK (直接点击找到的坐标)
+    - MOVE_TO → CLICK               => FUSED_MOVE_CLICK (无移动动画，直接点击)
+    - WAIT → WAIT ...               => 合并为一个 WAIT
+    - PRESS_KEY → PRESS_KEY ...     => FUSED_KEYS (一次分发)
+
+    只融合相邻的非流程控制步骤，IF/ELSE/LOOP 结构与跳转目标保持不变。
+    融合后的步骤带有 '_line' (原始编号，如 "3-4") 用于日志；
+    原步骤的 params 字典按引用复用，执行期间的缓存更新 (如 cache_box) 会回写到原宏。
+
+    Returns:
+        list: 新的步骤列表 (原列表不被修改)
+    """
+    out = []
+    i, n = 0, len(steps)
+    while i < n:
+        step = steps[i]; act = step.get('action', ''); p = step.get('params', {})
+        nxt = steps[i + 1] if i + 1 < n else None
+        
+        if act in ('FIND_IMAGE', 'FIND_TEXT') and nxt and _is_plain_click(nxt):
+            out.append(_fused('FUSED_FIND_CLICK', {'find_action': act, 'find_params': p, 'click_params': nxt['params']},
+                              [(i, step), (i + 1, nxt)]))
+            i += 2; continue
+        
+        # 用户显式设置了移动时长时保留动画
+        if act == 'MOVE_TO' and not float(p.get('duration', 0) or 0) and nxt and _is_plain_click(nxt):
+            out.append(_fused('FUSED_MOVE_CLICK', {'move_params': p, 'click_params': nxt['params']},
+                              [(i, step), (i + 1, nxt)]))
+            i += 2; continue
+        
+        if act in ('WAIT', 'PRESS_KEY'):
+            j = i
+            while j + 1 < n and steps[j + 1].get('action') == act: j += 1
+            if j > i:
+                group = [(k, steps[k]) for k in range(i, j + 1)]
+                if act == 'WAIT':
+                    total = sum(int(s['params']['ms']) for _, s in group)
+                    out.append(_fused('WAIT', {'ms': total}, group))
+                else:
+                    out.append(_fused('FUSED_KEYS', {'keys': [s['params'].get('key', '') for _, s in group]}, group))
+                i = j + 1; continue
+        
+        out.append(dict(step, _line=i + 1))
+        i += 1
+    
+    if len(out) < n:
+        print(f"[优化] 步骤融合: {n} → {len(out)}")
+    return out
+
+# ======================================================================
+# 画面稳定检测
+# ======================================================================
+class SettleMonitor:
+    """记录每个步骤的画面稳定耗时，用于评估固定 WAIT 浪费了多少时间"""
+    def __init__(self): self.reset()
+    def reset(self):
+        self.records = defaultdict(list)   # 步骤编号 -> [(动作, 稳定耗时, 实际等待, 是否稳定)]
+    def record(self, line, act, settle, elapsed, stable):
+        self.records[line].append((act, settle, elapsed, stable))
+    def report(self):
+        if not self.records: return None
+        lines, wasted = [], 0.0
+        for line, recs in self.records.items():
+            act = recs[0][0]
+            settles = [r[1] for r in recs if r[3]]
+            avg_settle = sum(settles) / len(settles) if settles else 0.0
+            avg_elapsed = sum(r[2] for r in recs) / len(recs)
+            timeouts = sum(1 for r in recs if not r[3])
+            text = f"  [{line}] {act}: {len(recs)}次 | 稳定均耗{avg_settle*1000:.0f}ms 最长{max(settles, default=0)*1000:.0f}ms | 实际等待均{avg_elapsed*1000:.0f}ms"
+            if act == 'WAIT':
+                waste = sum(max(0.0, r[2] - r[1]) for r in recs if r[3])
+                wasted += waste
+                text += f" | 多等{waste*1000:.0f}ms"
+            if timeouts: text += f" | 未稳定{timeouts}次"
+            lines.append(text)
+        if wasted: lines.append(f"  固定等待合计多等 {wasted*1000:.0f}ms")
+        return "\n".join(lines)
+
+settle_monitor = SettleMonitor()
+
+def _stability_frame(region):
+    """截取并缩小为灰度小图，比较开销与屏幕分辨率基本无关"""
+    if OPENCV_AVAILABLE:
+        return smart_screenshot(region, 'gray', max_width=STABLE_SAMPLE_WIDTH)[0]
+    img, _ = smart_screenshot(region)
+    factor = max(1, img.width // STABLE_SAMPLE_WIDTH)
+    if factor > 1: img = img.reduce(factor)
+    return img.convert('L')
+
+def _frame_changed(a, b, threshold):
+    if hasattr(a, 'shape'):
+        return a.shape != b.shape or float(cv2.absdiff(a, b).mean()) > threshold
+    if a.size != b.size: return True
+    return ImageStat.Stat(ImageChops.difference(a, b)).mean[0] > threshold
+
+def wait_until_stable(region=None, interval=0.05, stable_count=3, timeout=5.0, threshold=1.0,
+                      stop_event=None, deadline=None):
+    """
+    按 interval 采样画面，连续 stable_count 次与上一帧无变化 (平均像素差 <= threshold) 即返回。
+
+    Returns:
+        (是否稳定, 稳定耗时, 采样次数)；稳定耗时为最后一次检测到变化的时间点
+        (从未变化则为 0)，timeout 或停止时"是否稳定"为 False
+    """
+    t0 = time.monotonic()
+    deadline = deadline or t0 + timeout
+    prev = _stability_frame(region)
+    settled_at, unchanged, samples = t0, 0, 1
+    next_at = t0 + interval
+    while unchanged < stable_count:
+        if next_at > deadline or not wait_until(next_at, stop_event):
+            return False, settled_at - t0, samples
+        frame = _stability_frame(region)
+        samples += 1
+        now = time.monotonic()
+        if _frame_changed(prev, frame, threshold):
+            unchanged, settled_at = 0, now
+        else:
+            unchanged += 1
+        prev = frame
+        next_at += interval
+        # 采样本身耗时超过间隔时不追赶，避免连续无间隔截屏
+        if next_at < now: next_at = now + interval
+    return True, settled_at - t0, samples
+
+# ======================================================================
+# 前瞻预取 (Look-ahead)
+# ======================================================================
+_FIND_ACTIONS = ('FIND_IMAGE', 'FIND_TEXT', 'IF_IMAGE_FOUND', 'IF_TEXT_FOUND')
+# 执行这些步骤时宏线程基本处于等待状态，可借机为后续查找做准备
+# 不会改变画面的步骤；其余步骤 (含移动鼠标到目标的查找) 结束后，此前的后台截图帧不再可用
+_PASSIVE_ACTIONS = ('WAIT', 'WAIT_UNTIL_STABLE', 'IF_PIXEL_COLOR', 'GET_PIXELS', 'ELSE', 'END_IF', 'LOOP_START', 'END_LOOP')
+_IDLE_ACTIONS = ('WAIT', 'WAIT_UNTIL_STABLE', 'CLICK', 'MOVE_TO', 'MOVE_OFFSET', 'SCROLL', 'TYPE_TEXT', 'PRESS_KEY',
+                 'ACTIVATE_WINDOW', 'FUSED_MOVE_CLICK', 'FUSED_KEYS')
+
+def _find_target(step):
+    """返回查找步骤的 (动作, 参数)；非查找步骤返回 None"""
+    act = step.get('action', '')
+    if act == 'FUSED_FIND_CLICK': return step['params']['find_action'], step['params']['find_params']
+    if act in _FIND_ACTIONS: return act, step.get('params', {})
+    return None
+
+def _find_sig(act, p):
+    return f"{act}_{p.get('path', p.get('text',''))}"
+
+class LookaheadPrefetcher:
+    """
+    在宏线程空等 (WAIT / 键鼠动作) 时为后续查找步骤做准备:
+      1. 预热: 解码模板的全部缩放版本 / 预热 OCR 引擎 (每次运行每个目标一次)
+      2. 推测匹配: WAIT 后紧跟找图步骤时，在等待结束前 lead 秒截一帧并匹配，
+         lead 取该目标最近一次查找耗时，使匹配恰好在等待结束时完成
+    推测结果被采用前会在命中位置重新截取小区域做 quick_check 验证，
+    画面已变化则丢弃，走正常查找流程，因此不会改变执行结果。
+    """
+    def __init__(self):
+        self.executor = None
+        self._lock = threading.Lock()   # stats 由宏线程与预取线程共同更新
+        self.reset()
+
+    def reset(self):
+        self.warmed = set()
+        self.pending = None     # (sig, future, 取消事件)
+        self.lead = {}          # sig -> 最近一次完整查找耗时
+        self.stats = {'warm': 0, 'warm_time': 0.0, 'spec': 0, 'used': 0, 'rejected': 0, 'hidden': 0.0}
+
+    def _count(self, key, value=1):
+        with self._lock: self.stats[key] += value
+
+    def _submit(self, fn, *args):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='prefetch')
+        return self.executor.submit(fn, *args)
+
+    def warm(self, steps, pc):
+        """预热 pc 之后 PREFETCH_LOOKAHEAD 步内的第一个查找步骤"""
+        for step in steps[pc + 1: pc + 1 + PREFETCH_LOOKAHEAD]:
+            target = _find_target(step)
+            if not target: continue
+            act, p = target
+            is_img = 'IMAGE' in act
+            key = ('img', p.get('path')) if is_img else ('ocr', p.get('engine', 'auto'))
+            if key in self.warmed: return
+            self.warmed.add(key)
+            self._submit(self._warm_job, is_img, key[1], p.get('match_mode', 'template'))
+            return
+
+    def _warm_job(self, is_img, target, mode='template'):
+        t0 = time.perf_counter()
+        try:
+            if is_img:
+                if not OPENCV_AVAILABLE: return
+                if mode == 'feature': feature_matcher.template_features(target)
+                for scale in SCALES: _get_template(target, scale)
+            else:
+                ocr_engine.warm_up(FORCE_OCR_ENGINE or target)
+        except Exception as e:
+            print(f"  [预取] 预热失败: {e}")
+            return
+        self._count('warm')
+        self._count('warm_time', time.perf_counter() - t0)
+
+    def speculate(self, steps, pc, deadline, ctx):
+        """WAIT 步骤调用: 若下一步是找图，在等待结束前启动推测匹配"""
+        self.discard()
+        if pc + 1 >= len(steps) or not OPENCV_AVAILABLE: return
+        target = _find_target(steps[pc + 1])
+        if not target or 'IMAGE' not in target[0]: return
+        act, p = target
+        wait = deadline - time.monotonic()
+        sig = _find_sig(act, p)
+        if wait < SPECULATIVE_MIN_WAIT: return
+        # 推测结果用固定缩放的 quick_check 验证，特征点模式 (任意缩放) 无法可靠验证
+        if p.get('match_mode') == 'feature': return
+        # 循环缓存可用时 quick_check 已经足够快，无需推测
+        if loop_cache.get(sig): return
+        # 提前量不超过 SPECULATIVE_MAX_AGE 的一半，否则推测帧在 take() 时已超龄，必然被丢弃
+        lead = min(self.lead.get(sig, SPECULATIVE_DEFAULT_LEAD), wait * 0.5, SPECULATIVE_MAX_AGE * 0.5)
+        region = _anchored_region(p, ctx, verbose=False) or _search_region(p)
+        cancel = threading.Event()
+        self._count('spec')
+        future = self._submit(self._speculate_job, p['path'], float(p.get('confidence', 0.8)),
+                              region, _capture_format(True, p), deadline - lead, cancel)
+        self.pending = (sig, future, cancel)
+
+    def _speculate_job(self, path, conf, region, fmt, fire_at, cancel):
+        if not wait_until(fire_at, cancel): return None
+        t0 = time.monotonic()
+        ss, offset = smart_screenshot(region, fmt)
+        res = find_image_cv2(path, conf, ss, offset)
+        return {'captured': t0, 'result': res, 'cost': time.monotonic() - t0}
+
+    def take(self, sig, p):
+        """
+        查找步骤调用: 返回经过验证的推测坐标 (x, y)，不可用时返回 None。
+        无论是否采用，挂起的推测都会被清除。
+        """
+        pending, self.pending = self.pending, None
+        if not pending or pending[0] != sig: return None
+        t0 = time.monotonic()
+        try:
+            spec = pending[1].result()
+        except Exception as e:
+            print(f"  [预取] 推测匹配异常: {e}")
+            return None
+        if not spec or not spec['result'] or time.monotonic() - spec['captured'] > SPECULATIVE_MAX_AGE:
+            self._count('rejected')
+            return None
+        (cx, cy, w, h), _val = spec['result']
+        # 在命中位置重新截取小区域确认画面未变
+        ss, offset = smart_screenshot((max(0, cx - w), max(0, cy - h), w * 2, h * 2), 'gray')
+        if not quick_check_cv2(p['path'], float(p.get('confidence', 0.8)), ss, offset, (cx, cy)):
+            self._count('rejected')
+            return None
+        self._count('used')
+        self._count('hidden', max(0.0, spec['cost'] - (time.monotonic() - t0)))
+        return (cx, cy)
+
+    def discard(self):
+        """丢弃挂起的推测 (预测落空或停止运行时)，正在等待的任务立即结束"""
+        if self.pending:
+            self.pending[2].set()
+            self.pending[1].cancel()
+            self.pending = None
+
+    def get_stats(self):
+        with self._lock: s = dict(self.stats)
+        if not (s['warm'] or s['spec']): return "(无记录)"
+        return (f"(预热{s['warm']}次/{s['warm_time']*1000:.0f}ms | 推测 采用{s['used']}/{s['spec']} "
+                f"弃用{s['rejected']} | 隐藏查找耗时{s['hidden']*1000:.0f}ms)")
+
+prefetcher = LookaheadPrefetcher()
+
 # ======================================================================
 # 主执行引擎
 # ======================================================================
 def execute_steps(steps, run_context=None, status_callback=None):
     print(f"\n--- 宏执行开始 (Core V1.55.5) ---")
-    perf.reset(); loop_cache.reset()
+    perf.reset(); loop_cache.reset(); prefetcher.reset(); settle_monitor.reset()
+    incremental_matcher.reset_stats(); color_prefilter.reset_stats(); exact_matcher.reset_stats(); fft_matcher.reset_stats()
+    feature_matcher.reset_stats(); capture_stats.reset()
     ctx = run_context if run_context else {}
+    if ctx.get('optimize'):
+        steps = optimize_steps(steps)
     ctx.setdefault('last_pos', (None, None))
     ctx.setdefault('stop_requested', False)
+    # 停止信号为 threading.Event：GUI 调用 request_stop(ctx) 后所有等待立即返回
+    stop_event = ensure_stop_event(ctx)
     ctx.setdefault('clipboard_var', '')
+    ctx['anchors'] = {}
+    # 后台连续截图需要 OpenCV (帧为数组)，只在本次运行期间工作
+    ctx['continuous_capture'] = bool(ctx.get('continuous_capture')) and OPENCV_AVAILABLE
+    ctx['frame_bus'] = bool(ctx.get('frame_bus')) and OPENCV_AVAILABLE
+    # 键鼠输入统一经过可插拔后端，节奏完全由 timing profile 显式控制
+    timing = resolve_timing_profile(ctx.get('timing_profile'))
+    inp = get_input_backend(ctx.get('input_backend') or timing['backend'])
+    ctx['timing'] = timing; ctx['input'] = inp
+    print(f"[输入] 后端: {inp.name} | 动作间隔 {timing['action_delay']*1000:.0f}ms | 移动时长 {timing['move_duration']*1000:.0f}ms")
     
     default_stop = "Ctrl+F11"
     try:
@@ -307,22 +894,44 @@ def execute_steps(steps, run_context=None, status_callback=None):
         stop_key_display = default_stop
     
     pc, loops = 0, []
+    hires = HighResolutionTimer(); hires.begin()
+    if ctx['continuous_capture']: continuous_capture.reset_stats(); continuous_capture.start()
+    if ctx['frame_bus']:
+        frame_bus.reset_stats()
+        try:
+            frame_bus.start()
+        except Exception as e:
+            print(f"[帧总线] 启动失败，本次在本进程内查找: {e}")
+            ctx['frame_bus'] = False
     try:
         while pc < len(steps):
 
-            if ctx.get('stop_requested', False): 
+            if is_stopped(ctx): 
                 print(f"  [停止] 用户请求停止 ({stop_key_display})")
                 break
                 
             step = steps[pc]; act = step.get('action',''); p = step.get('params',{})
-            print(f"[{pc+1}] {act}")
+            # 融合步骤使用原始编号 (如 "3-4")，日志与未优化时一致
+            print(f"[{step.get('_line', pc+1)}] {act}")
             next_pc = pc + 1
+            if ctx.get('prefetch') and act in _IDLE_ACTIONS:
+                prefetcher.warm(steps, pc)
 
             try:
                 # [关键] 每次循环初始化结果变量
                 res = None
-                if act.startswith('FIND_') or act.startswith('IF_'):
+                if act == 'IF_PIXEL_COLOR':
+                    # 像素探测不经过找图流程，跳转规则与其他 IF 相同
+                    if not _handle_pixel_probe(p, ctx):
+                        print("  -> IF条件不满足,跳过")
+                        next_pc = _find_jump(steps, pc, 'IF_', 'END_IF', ['ELSE', 'END_IF'])
+                
+                elif act == 'GET_PIXELS':
+                    _handle_get_pixels(p, ctx)
+                
+                elif act.startswith('FIND_') or act.startswith('IF_'):
                     res = _handle_find(act, p, ctx, loop_cache.get_current_loop_id() is not None)
+                    if res and p.get('anchor_name'): set_anchor(ctx, p['anchor_name'], res)
                     if act.startswith('IF_'):
                         if not res:
                             print("  -> IF条件不满足,跳过")
@@ -333,39 +942,90 @@ def execute_steps(steps, run_context=None, status_callback=None):
                     if res:
                         # 取前两个值作为坐标
                         target_x, target_y = res[0], res[1]
-                        pyautogui.moveTo(target_x, target_y)
+                        inp.move_to(target_x, target_y)
+                        _pace(ctx)
                 
                 elif act == 'CLICK':
-                    btn = p.get('button', 'left').lower()
-                    clicks = int(p.get('clicks', 1))
-                    interval = float(p.get('interval', 0.0))
-                    duration = float(p.get('duration', 0.0))
                     x = int(p['x']) if 'x' in p else None
                     y = int(p['y']) if 'y' in p else None
-                    pyautogui.click(x=x, y=y, button=btn, clicks=clicks, interval=interval, duration=duration)
+                    _click(inp, p, x, y)
                     if x and y: ctx['last_pos'] = (x, y)
+                    _pace(ctx)
+                
+                # --- 融合步骤 (由 optimize_steps 生成) ---
+                elif act == 'FUSED_FIND_CLICK':
+                    # 找到后直接在目标坐标点击，省去中间的 moveTo 与一次停顿
+                    res = _handle_find(p['find_action'], p['find_params'], ctx, loop_cache.get_current_loop_id() is not None)
+                    if not res: print("  -> 没找到目标,宏停止"); break
+                    if p['find_params'].get('anchor_name'): set_anchor(ctx, p['find_params']['anchor_name'], res)
+                    _click(inp, p['click_params'], res[0], res[1])
+                    _pace(ctx)
+                
+                elif act == 'FUSED_MOVE_CLICK':
+                    x, y = int(p['move_params']['x']), int(p['move_params']['y'])
+                    _click(inp, p['click_params'], x, y)
+                    ctx['last_pos'] = (x, y)
+                    _pace(ctx)
+                
+                elif act == 'FUSED_KEYS':
+                    print(f"  [按键] {' → '.join(p['keys'])}")
+                    for combo in p['keys']:
+                        if is_stopped(ctx): break
+                        keys = combo.lower().replace(' ', '').split('+')
+                        if keys:
+                            inp.hotkey(*keys)
+                            _pace(ctx)
                 
                 elif act == 'MOVE_TO':
                     x, y = int(p['x']), int(p['y'])
-                    pyautogui.moveTo(x, y, duration=float(p.get('duration', 0.25)))
+                    inp.move_to(x, y, duration=float(p.get('duration', timing['move_duration'])))
                     ctx['last_pos'] = (x, y)
+                    _pace(ctx)
                 
                 elif act == 'MOVE_OFFSET':
                     if not ctx['last_pos'][0]: print("  [错误] 无上次坐标"); break
                     ox, oy = int(p['x_offset']), int(p['y_offset'])
-                    pyautogui.move(ox, oy, duration=float(p.get('duration', 0.25)))
+                    inp.move_rel(ox, oy, duration=float(p.get('duration', timing['move_duration'])))
                     ctx['last_pos'] = (ctx['last_pos'][0]+ox, ctx['last_pos'][1]+oy)
+                    _pace(ctx)
                 
                 elif act == 'SCROLL':
                     clicks = int(p.get('amount', 0))
-                    if 'x' in p and 'y' in p: pyautogui.moveTo(int(p['x']), int(p['y']))
-                    pyautogui.scroll(clicks) 
+                    if 'x' in p and 'y' in p: inp.scroll(clicks, int(p['x']), int(p['y']))
+                    else: inp.scroll(clicks)
+                    _pace(ctx)
                 
                 elif act == 'WAIT': 
-                    total_ms = int(p['ms'])
-                    for _ in range(0, total_ms, 100):
-                        if ctx.get('stop_requested'): break
-                        time.sleep(min(100, total_ms - _) / 1000.0)
+                    # 单调时钟截止 + 事件唤醒：停止请求到达时立即结束等待
+                    t_start = time.monotonic()
+                    deadline = t_start + int(p['ms']) / 1000.0
+                    if ctx.get('prefetch'): prefetcher.speculate(steps, pc, deadline, ctx)
+                    if ctx.get('measure_waits'):
+                        # 测量模式: 不改变等待时长，只记录画面实际在何时稳定
+                        stable, settle, _n = wait_until_stable(interval=STABLE_DEFAULTS['interval_ms'] / 1000.0,
+                                                               stable_count=STABLE_DEFAULTS['stable_count'],
+                                                               threshold=STABLE_DEFAULTS['threshold'],
+                                                               stop_event=stop_event, deadline=deadline)
+                        wait_until(deadline, stop_event)
+                        settle_monitor.record(step.get('_line', pc+1), act, settle, time.monotonic() - t_start, stable)
+                    else:
+                        wait_until(deadline, stop_event)
+                
+                elif act == 'WAIT_UNTIL_STABLE':
+                    cfg = {k: float(p.get(k, v)) for k, v in STABLE_DEFAULTS.items()}
+                    t_start = time.monotonic()
+                    cb = p.get('cache_box')
+                    region = (cb[0], cb[1], cb[2] - cb[0], cb[3] - cb[1]) if cb and len(cb) >= 4 and cb[2] > cb[0] and cb[3] > cb[1] else None
+                    region = _anchored_region(p, ctx, pad=0) or region
+                    stable, settle, samples = wait_until_stable(
+                        region, cfg['interval_ms'] / 1000.0, int(cfg['stable_count']),
+                        cfg['timeout_ms'] / 1000.0, cfg['threshold'], stop_event)
+                    elapsed = time.monotonic() - t_start
+                    settle_monitor.record(step.get('_line', pc+1), act, settle, elapsed, stable)
+                    if stable:
+                        print(f"  [稳定] 画面 {settle*1000:.0f}ms 后稳定 (共等待 {elapsed*1000:.0f}ms, 采样 {samples} 次)")
+                    elif not is_stopped(ctx):
+                        print(f"  [稳定] ⚠️ {cfg['timeout_ms']:.0f}ms 内画面未稳定,继续执行")
                 
                 elif act == 'TYPE_TEXT':
                     interval = float(p.get('interval', 0.0))
@@ -382,27 +1042,23 @@ def execute_steps(steps, run_context=None, status_callback=None):
                         text = text.replace('{CLIPBOARD}', clipboard_content)
                         print(f"  [输入] 替换占位符: {text}")
                     
-                    if interval > 0: pyautogui.write(text, interval=interval)
-                    else: 
-                        # 增加剪贴板重试机制，防止被系统占用报错
-                        # 尝试 3 次，每次间隔 0.2 秒
-                        for _retry in range(3):
-                            try:
-                                pyperclip.copy(text)
-                                break # 成功则跳出重试循环
-                            except Exception:
-                                time.sleep(0.2)
-                        
-                        # 无论成功与否，尝试粘贴 (pyautogui 不会报错)
-                        time.sleep(0.1)
-                        pyautogui.hotkey('ctrl', 'v')
+                    # 默认直接发送 Unicode 键盘事件；剪贴板仅作回退，且会恢复用户原有内容
+                    used = inject_text(inp, text, method=p.get('input_method', 'auto'), interval=interval,
+                                       timing=timing, should_stop=lambda: is_stopped(ctx))
+                    if used: print(f"  [输入] {len(text)} 字 ({used})")
+                    else: print(f"  [错误] {len(text)} 字未能输入 (剪贴板被占用)")
+                    _pace(ctx)
                 
                 elif act == 'PRESS_KEY':
                     keys = p.get('key', '').lower().replace(' ', '').split('+')
-                    if keys: pyautogui.hotkey(*keys)
+                    if keys:
+                        inp.hotkey(*keys)
+                        _pace(ctx)
                 
                 elif act == 'ACTIVATE_WINDOW':
-                    if not PYGETWINDOW_AVAILABLE:
+                    # 可通过 run_context['window_registry'] 注入 (如 FakeWindowManager 测试)
+                    registry = ctx.get('window_registry') or window_registry
+                    if registry is window_registry and not PYGETWINDOW_AVAILABLE:
                         print("  [错误] pygetwindow 库未安装,无法激活窗口。")
                         break
                     title = p.get('title')
@@ -411,17 +1067,18 @@ def execute_steps(steps, run_context=None, status_callback=None):
                         break
                     
                     try:
-                        wins = gw.getWindowsWithTitle(title)
-                        if not wins:
+                        # 句柄按标题缓存，窗口到前台即返回，不再固定等待 0.5s
+                        win, state = registry.activate(title, should_stop=lambda: is_stopped(ctx))
+                        if state == 'not_found':
                             print(f"  [失败] 未找到标题包含 '{title}' 的窗口。")
                             break
-                        
-                        target_win = wins[0]
-                        if target_win.isMinimized:
-                            target_win.restore()
-                        target_win.activate()
-                        print(f"  [成功] 已激活窗口: {target_win.title}")
-                        time.sleep(0.5) 
+                        if state == 'timeout':
+                            print(f"  [警告] 窗口未能在 {WINDOW_ACTIVATE_TIMEOUT}s 内切到前台,继续执行")
+                        elif state != 'stopped':
+                            print(f"  [成功] 已激活窗口: {registry.manager.title_of(win)}" + (" (已在前台)" if state == 'foreground' else ""))
+                        # 窗口锚点只记句柄，使用时再读取窗口矩形，窗口被拖动后相对区域仍然准确
+                        set_anchor(ctx, WINDOW_ANCHOR, window=(registry, win))
+                        if p.get('anchor_name'): set_anchor(ctx, p['anchor_name'], window=(registry, win))
                     except Exception as e:
                         print(f"  [错误] 激活窗口时出错: {e}")
                         break
@@ -444,7 +1101,7 @@ def execute_steps(steps, run_context=None, status_callback=None):
                             
                             # 更新状态显示
                             if status_callback:
-                                status_callback(f"🔄 循环第 {top['iteration']} 次 (最多 {top['max_iterations']} 次)")
+                                status_callback(_loop_status('until_iteration', top))
                             
                             # 检查是否超过最大次数 (安全阀)
                             if top['iteration'] >= top['max_iterations']:
@@ -452,7 +1109,7 @@ def execute_steps(steps, run_context=None, status_callback=None):
                                 loop_cache.exit()
                                 loop_cache.clear_cache(loop_id_to_exit)
                                 if status_callback:
-                                    status_callback(f"⚠️ 达到最大迭代 {top['max_iterations']} 次,强制退出")
+                                    status_callback(_loop_status('max_reached', top))
                                 print(f"  [Loop Until] ⚠️ 达到最大迭代次数,强制退出")
                                 next_pc = pc + 1  # 继续执行下一步
                             else:
@@ -464,7 +1121,7 @@ def execute_steps(steps, run_context=None, status_callback=None):
                                     loop_cache.exit()
                                     loop_cache.clear_cache(loop_id_to_exit)
                                     if status_callback:
-                                        status_callback(f"✓ 条件满足,循环结束 (共 {top['iteration']} 次)")
+                                        status_callback(_loop_status('condition_met', top))
                                     print(f"  [Loop Until] ✓✓✓ 条件满足,循环结束")
                                     next_pc = pc + 1  # 继续执行下一步
                                 else:
@@ -473,7 +1130,7 @@ def execute_steps(steps, run_context=None, status_callback=None):
                                     
                                     # 使用可配置的检测间隔，平衡速度与准确率
                                     # 0.15s 经过实测：既不会让UI卡顿，也能及时检测到目标
-                                    time.sleep(LOOP_CHECK_INTERVAL)
+                                    wait_for(LOOP_CHECK_INTERVAL, stop_event)
                                     
                                     next_pc = top['start']  # 跳回循环开始
                         else:
@@ -485,15 +1142,93 @@ def execute_steps(steps, run_context=None, status_callback=None):
 
             except Exception as e:
                 print(f"  [执行异常] {e}"); import traceback; traceback.print_exc(); break
+            if act not in _PASSIVE_ACTIONS: ctx['screen_changed_at'] = time.monotonic()
             pc = next_pc
     finally:
+        hires.end()
+        prefetcher.discard()
+        if ctx.get('continuous_capture'): continuous_capture.stop()
+        if ctx.get('frame_bus'): frame_bus.stop()
         loop_cache.reset()
         print(f"--- 执行结束 ---\n[统计] {perf.get_stats()}\n")
+        if ctx.get('prefetch'): print(f"[预取] {prefetcher.get_stats()}\n")
+        if capture_stats.count: print(f"[截图] {capture_stats.get_stats()}\n")
+        if ctx.get('continuous_capture'): print(f"[连续截图] {continuous_capture.get_stats()}\n")
+        if ctx.get('frame_bus'): print(f"[帧总线] {frame_bus.get_stats()}\n")
+        if feature_matcher.stats['searches']:
+            print(f"[特征点匹配] {feature_matcher.get_stats()}\n")
+        if fft_matcher.stats['matches']:
+            print(f"[FFT匹配] {fft_matcher.get_stats()}\n")
+        fft_matcher.release_frame()
+        if exact_matcher.stats['searches'] or exact_matcher.stats['promoted']:
+            print(f"[精确匹配] {exact_matcher.get_stats()}\n")
+        if color_prefilter.stats['checks']:
+            print(f"[颜色预过滤] {color_prefilter.get_stats()}\n")
+        if incremental_matcher.stats['incremental'] or incremental_matcher.stats['reused']:
+            print(f"[增量匹配] {incremental_matcher.get_stats()}\n")
+        settle_report = settle_monitor.report()
+        if settle_report: print(f"[画面稳定]\n{settle_report}\n")
 
-def _handle_find(act, p, ctx, in_loop):
-    is_img = 'IMAGE' in act
-    final_engine = FORCE_OCR_ENGINE if (FORCE_OCR_ENGINE and FORCE_OCR_ENGINE != 'auto') else p.get('engine', 'auto')
-    
+def _click(inp, p, x=None, y=None):
+    """按 CLICK 步骤参数点击；x/y 为 None 时在当前位置点击"""
+    inp.click(x=x, y=y, button=p.get('button', 'left').lower(),
+              clicks=int(p.get('clicks', 1)),
+              interval=float(p.get('interval', 0.0)),
+              duration=float(p.get('duration', 0.0)))
+
+def _pace(ctx):
+    """键鼠动作后的显式停顿 (取代 pyautogui 的全局 PAUSE)"""
+    delay = ctx['timing']['action_delay']
+    if delay > 0:
+        wait_for(delay, ctx.get('stop_event'))
+
+def set_anchor(ctx, name, pos=None, window=None):
+    """登记锚点: 查找到的坐标 pos，或窗口 window=(registry, handle)"""
+    ctx.setdefault('anchors', {})[name] = ('window', window) if window else ('point', (int(pos[0]), int(pos[1])))
+
+def resolve_anchor(ctx, name):
+    """锚点原点 (x, y): 图像/文本锚点为找到的中心，窗口锚点为窗口当前左上角；未登记或窗口已关闭时返回 None"""
+    entry = ctx.get('anchors', {}).get(name)
+    if entry is None: return None
+    kind, val = entry
+    if kind == 'point': return val
+    registry, handle = val
+    try:
+        left, top, _r, _b = registry.manager.rect_of(handle)
+        return left, top
+    except Exception:
+        return None
+
+def _anchored_region(p, ctx, pad=ANCHOR_REGION_PADDING, verbose=True):
+    """
+    anchor_region (相对锚点原点的 x1,y1,x2,y2) 换算为屏幕搜索区域 (x, y, w, h)。
+    步骤未声明锚点、锚点尚未定位或区域无效时返回 None，由调用方回退到 cache_box / 全屏。
+    """
+    name, box = p.get('anchor'), p.get('anchor_region')
+    if not name or not isinstance(box, list) or len(box) != 4: return None
+    origin = resolve_anchor(ctx, name)
+    if origin is None:
+        if verbose: print(f"  [锚点] '{name}' 尚未定位，使用普通搜索范围")
+        return None
+    x0, y0 = origin[0] + box[0], origin[1] + box[1]
+    x1, y1 = origin[0] + box[2], origin[1] + box[3]
+    if x1 <= x0 or y1 <= y0: return None
+    x, y = max(0, x0 - pad), max(0, y0 - pad)
+    if verbose: print(f"  [锚点] '{name}' @ {origin} → 区域 ({x},{y},{x1 + pad},{y1 + pad})")
+    return (x, y, x1 + pad - x, y1 + pad - y)
+
+def _anchored_points(points, p, ctx):
+    """像素步骤声明了锚点时，探测点坐标视为相对锚点原点"""
+    name = p.get('anchor')
+    if not name: return points
+    origin = resolve_anchor(ctx, name)
+    if origin is None:
+        print(f"  [锚点] '{name}' 尚未定位，按绝对坐标读取")
+        return points
+    return [(x + origin[0], y + origin[1], c) for x, y, c in points]
+
+def _search_region(p):
+    """由 cache_box 计算带边距的搜索区域 (x, y, w, h)；无效的 cache_box 会被移除"""
     region = None
     if 'cache_box' in p:
         cb = p['cache_box']
@@ -507,22 +1242,66 @@ def _handle_find(act, p, ctx, in_loop):
                 if 'cache_box' in p: del p['cache_box']
         else:
             if 'cache_box' in p: del p['cache_box']
+    return region
 
-    ss, offset = smart_screenshot(region)
-    sig = f"{act}_{p.get('path', p.get('text',''))}"
+def _handle_find(act, p, ctx, in_loop):
+    is_img = 'IMAGE' in act
+    final_engine = FORCE_OCR_ENGINE if (FORCE_OCR_ENGINE and FORCE_OCR_ENGINE != 'auto') else p.get('engine', 'auto')
+    
+    # 相对锚点的区域优先；cache_box 是绝对坐标，窗口移动后就会失效
+    anchored = _anchored_region(p, ctx)
+    region = anchored or _search_region(p)
+    sig = _find_sig(act, p)
+
+    # 前一个 WAIT 期间已推测匹配并验证通过
+    if ctx.get('prefetch') and is_img:
+        spec = prefetcher.take(sig, p)
+        if spec:
+            perf.record_hit(False, False)
+            print(f"  [预取命中] 图 ({spec[0]},{spec[1]})")
+            if in_loop: loop_cache.set(sig, spec)
+            ctx['last_pos'] = spec
+            return spec
+
+    t0 = time.monotonic()
+    fmt = _capture_format(is_img, p, final_engine)
+    # 帧总线: 截图与匹配都在子进程完成 (OCR 崩溃不影响本进程)；
+    # 循环内找图依赖本进程的循环缓存、跟踪与增量匹配状态，仍走本地流程
+    remote = ctx.get('frame_bus') and frame_bus.active and not (in_loop and is_img)
+    fresh = _fresh_after(ctx) if (remote or ctx.get('continuous_capture')) else None
+    ss, offset = (None, None) if remote else smart_screenshot(region, fmt, not_before=fresh)
+
+    if in_loop and is_img and p.get('track'):
+        # 跟踪模式: 在预测窗口内查找，未命中则成倍扩大窗口重试，连续 K 次未命中才回退全局搜索
+        track = loop_cache.get_track(sig, create=True)
+        if track.history:
+            for _attempt in range(int(p.get('track_misses', TRACK_MAX_MISSES))):
+                center, radius = track.predict()
+                hit = track_check_cv2(p['path'], float(p.get('confidence',0.8)), ss, offset, center, radius)
+                if hit:
+                    loop_cache.set(sig, hit)
+                    perf.record_hit(True, False); print(f"  [跟踪] {hit} (预测 {center} ±{radius}px)"); ctx['last_pos'] = hit; return hit
+                track.misses += 1
+                if radius >= TRACK_MAX_RADIUS: break
+            print(f"  [跟踪] 预测窗口连续 {track.misses} 次未命中，回退全局搜索")
 
     if in_loop:
         cached = loop_cache.get(sig)
-        if cached and is_img and quick_check_cv2(p['path'], float(p.get('confidence',0.8)), ss, offset, cached):
+        if cached and is_img and not p.get('track') and p.get('match_mode') != 'feature' and quick_check_cv2(p['path'], float(p.get('confidence',0.8)), ss, offset, cached):
             perf.record_hit(True, False); print(f"  [Loop缓存] {cached}"); ctx['last_pos'] = cached; return cached
 
-    res = _do_find(is_img, p, ss, offset, final_engine, ctx)
+    if remote: res = _do_find(is_img, p, None, None, final_engine, ctx, remote=(_region_bbox(region), fresh))
+    else: res = _do_find(is_img, p, ss, offset, final_engine, ctx)
     
     if not res and region and ENABLE_GLOBAL_FALLBACK:
         print("  [缓存失效] 全局搜索...")
-        ss, offset = smart_screenshot(None)
-        res = _do_find(is_img, p, ss, offset, final_engine, ctx)
-        if res:
+        if remote:
+            res = _do_find(is_img, p, None, None, final_engine, ctx, remote=(None, fresh))
+        else:
+            del ss   # 先释放区域截图，全屏截图不与它同时驻留
+            ss, offset = smart_screenshot(None, fmt, not_before=fresh)
+            res = _do_find(is_img, p, ss, offset, final_engine, ctx)
+        if res and not anchored:
             # _do_find 保证返回 (x, y)，估算点击区域
             w, h = (0, 0) 
             if len(res) >= 2:
@@ -530,6 +1309,7 @@ def _handle_find(act, p, ctx, in_loop):
 
     if res:
         pos = (res[0], res[1])
+        prefetcher.lead[sig] = time.monotonic() - t0
         if in_loop: loop_cache.set(sig, pos)
         ctx['last_pos'] = pos
         return res # 返回完整结果
@@ -537,23 +1317,62 @@ def _handle_find(act, p, ctx, in_loop):
     perf.record_miss(not is_img)
     return None
 
-def _do_find(is_img, p, ss, offset, engine='auto', ctx=None):
-    """执行查找（图像或文本）并返回统一格式坐标 (x, y)"""
+def _handle_pixel_probe(p, ctx):
+    """IF_PIXEL_COLOR: 一次截图读取全部探测点，按 all/any 条件判断"""
+    t0 = time.perf_counter()
+    points = _anchored_points(parse_pixel_spec(p.get('pixels', '')), p, ctx)
+    tol = int(p.get('tolerance', PIXEL_DEFAULT_TOLERANCE))
+    mode = p.get('match', 'all')
+    colors, source = read_pixels(points, ctx)
+    ok, matched = evaluate(points, colors, tol, mode)
+    elapsed = time.perf_counter() - t0
+    detail = ', '.join(f"({x},{y}) {format_color(c)}" for (x, y, _e), c in zip(points, colors))
+    print(f"  [像素] {matched}/{len(points)} 匹配 ({'任一' if mode == 'any' else '全部'}, 容差 {tol}) "
+          f"{detail} | {source} {elapsed*1e6:.0f}µs")
+    return ok
+
+def _handle_get_pixels(p, ctx):
+    """GET_PIXELS: 读取探测点颜色，结果保存在 ctx['pixels']，可选写入剪贴板 ({CLIPBOARD} 占位符可引用)"""
+    points = _anchored_points(parse_pixel_spec(p.get('pixels', ''), need_color=False), p, ctx)
+    colors, source = read_pixels(points, ctx)
+    values = [format_color(c) for c in colors]
+    ctx['pixels'] = {(x, y): v for (x, y, _e), v in zip(points, values)}
+    print(f"  [像素] " + ', '.join(f"({x},{y}) {v}" for (x, y, _e), v in zip(points, values)) + f" | {source}")
+    if p.get('save_to_clipboard', False):
+        text = ';'.join(values)
+        ctx['clipboard_var'] = text
+        try:
+            pyperclip.copy(text)
+            print(f"  [剪贴板] ✓ 已复制")
+        except Exception as e:
+            print(f"  [剪贴板] 失败: {e}")
+    return values
+
+def _do_find(is_img, p, ss, offset, engine='auto', ctx=None, remote=None):
+    """
+    执行查找（图像或文本）并返回统一格式坐标 (x, y)。
+    remote=(截图框, not_before) 时由帧总线工作进程在共享内存帧上查找，ss/offset 不使用。
+    """
     if is_img:
         # 图片查找返回: (cx, cy, w, h)
-        res_val = find_image_cv2(p['path'], float(p.get('confidence', 0.8)), ss, offset)
+        conf, mode = float(p.get('confidence', 0.8)), p.get('match_mode', 'template')
+        if remote: res_val = frame_bus.find_image(p['path'], conf, mode, *remote)
+        else: res_val = find_image(p['path'], conf, ss, offset, mode)
         if res_val:
             perf.record_hit(False, False)
             print(f"  [找到] 图 ({res_val[0][0]},{res_val[0][1]})")
             return (res_val[0][0], res_val[0][1]) 
     else:
         # OCR 查找返回: ((cx, cy), full_text)
-        res = ocr_engine.find_text_location(
-            p['text'], 
-            p.get('lang','eng'), 
-            p.get('debug',True), 
-            ss, offset, engine
-        )
+        if remote:
+            res = frame_bus.find_text(p['text'], p.get('lang', 'eng'), engine, *remote)
+        else:
+            res = ocr_engine.find_text_location(
+                p['text'], 
+                p.get('lang','eng'), 
+                p.get('debug',True), 
+                ss, offset, engine
+            )
         
         if res:
             perf.record_hit(False, True)
@@ -610,37 +1429,64 @@ def _do_find(is_img, p, ss, offset, engine='auto', ctx=None):
     return None
 
 
+def _loop_status(kind, loop):
+    """
+    构造结构化循环状态，交给 status_callback 发布。
+    
+    引擎只传递原始数值，文本格式化推迟到 GUI 实际渲染时进行，
+    每次迭代的开销仅为一次字典构造。
+    """
+    return {
+        'kind': kind,
+        'loop_id': loop['id'],
+        'iteration': loop['iteration'],
+        'max': loop['max_iterations'],
+        'remain': loop['remain'],
+        'overruns': loop['timer'].overruns if loop.get('timer') else 0,
+    }
+
 def _handle_loop_start(steps, pc, loops, p, ctx, cb):
     top = loops[-1] if loops else None
     
     
     # 如果是已有循环的迭代检查
     if top and top['start'] == pc:
-         # === [修复] 强制给循环加一个物理冷却，防止队列瞬间爆炸 ===
-        time.sleep(LOOP_PHYSICAL_COOLDOWN)  # 使用常量 
         mode = top.get('mode', 'fixed')
+        timer = top.get('timer')
+        if timer is None:
+            # === [修复] 强制给循环加一个物理冷却，防止队列瞬间爆炸 ===
+            # 定频循环由节拍器控制节奏，不再叠加冷却
+            if not wait_for(LOOP_PHYSICAL_COOLDOWN, ctx.get('stop_event')): return pc + 1
         
         # 检查是否超过最大迭代次数 (所有模式通用)
         if top['iteration'] >= top['max_iterations']:
             loop_id_to_exit = loops.pop()['id']
             loop_cache.exit()
             loop_cache.clear_cache(loop_id_to_exit)
-            if cb: cb(f"达到最大迭代 {top['max_iterations']} 次,循环结束")
+            if cb: cb(_loop_status('max_reached', top))
             print(f"  [Loop] 警告:达到最大迭代次数 {top['max_iterations']}")
             return _find_jump(steps, pc, 'LOOP_START', 'END_LOOP', ['END_LOOP'])
         
-        # 固定次数循环:检查剩余次数
-        if mode == 'fixed':
+        # 固定次数循环 (含定频):检查剩余次数
+        if mode in ('fixed', 'fixed_rate'):
             # [补丁修复] 先检查后递减，确保计数正确
             if top['remain'] > 0:
+                if timer is not None:
+                    # 截止时间按 start + k*period 计算，循环体耗时波动不会累积成漂移
+                    ok, late = timer.wait_next(ctx.get('stop_event'))
+                    if not ok: return pc + 1  # 停止请求: 由主循环统一退出
+                    if late > 0 and timer.overruns <= OVERRUN_REPORT_LIMIT:
+                        print(f"  [Loop 定频] ⚠️ 循环体超时 {late*1000:.1f}ms (周期 {timer.period*1000:.0f}ms)")
                 top['remain'] -= 1
                 top['iteration'] += 1
-                if cb: cb(f"循环第 {top['iteration']} 次 (剩余: {top['remain']}次)")
+                if cb: cb(_loop_status('fixed_iteration', top))
                 return pc + 1
             else:
                 loop_id_to_exit = loops.pop()['id']
                 loop_cache.exit()
                 loop_cache.clear_cache(loop_id_to_exit)
+                if timer is not None:
+                    print(f"  [Loop 定频] 结束: {timer.summary()}")
                 return _find_jump(steps, pc, 'LOOP_START', 'END_LOOP', ['END_LOOP'])
         
         # === 关键修复: 条件循环不在此增加计数,交给 END_LOOP ===
@@ -652,7 +1498,7 @@ def _handle_loop_start(steps, pc, loops, p, ctx, cb):
         mode = p.get('mode', 'fixed')
         max_iter = int(p.get('max_iterations', 1000))
         
-        if mode == 'fixed':
+        if mode in ('fixed', 'fixed_rate'):
             count = int(p.get('times', 1))
             if count <= 0:
                 return _find_jump(steps, pc, 'LOOP_START', 'END_LOOP', ['END_LOOP'])
@@ -671,7 +1517,11 @@ def _handle_loop_start(steps, pc, loops, p, ctx, cb):
         }
         
         # 保存条件参数
-        if mode == 'until_image':
+        if mode == 'fixed_rate':
+            period_ms = float(p.get('period_ms', 1000))
+            loop_data['timer'] = FixedRateTimer(period_ms / 1000.0)
+            print(f"  [Loop 定频] 每 {period_ms:.0f}ms 执行一次循环体")
+        elif mode == 'until_image':
             loop_data['condition_image'] = p.get('condition_image', '')
             loop_data['confidence'] = float(p.get('confidence', 0.8))
             print(f"  [Loop Until Image] 目标: {loop_data['condition_image']}")
@@ -683,10 +1533,7 @@ def _handle_loop_start(steps, pc, loops, p, ctx, cb):
         loops.append(loop_data)
         loop_cache.enter(loop_id)
         
-        if mode == 'fixed':
-            if cb: cb(f"循环剩余: {remain}")
-        else:
-            if cb: cb(f"🔄 条件循环第 1 次 (最多 {max_iter} 次)")
+        if cb: cb(_loop_status('fixed_start' if mode in ('fixed', 'fixed_rate') else 'until_start', loop_data))
         
         return pc + 1
 
@@ -719,7 +1566,7 @@ def _check_loop_condition(loop_data, ctx):
             return False
         
         try:
-            ss = ImageGrab.grab()
+            ss, _ = smart_screenshot(None, _capture_format(True))
             res_val = find_image_cv2(path, conf, ss, offset=(0, 0))
             found = res_val is not None
             if found:
@@ -740,7 +1587,7 @@ def _check_loop_condition(loop_data, ctx):
             return False
         
         try:
-            ss = ImageGrab.grab()
+            ss, _ = smart_screenshot(None, _capture_format(False))
             # 兼容新的返回格式
             res = ocr_engine.find_text_location(text, lang, False, ss, (0, 0), 'auto')
             
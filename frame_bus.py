@@ -0,0 +1,417 @@
+# -*- coding: utf-8 -*-
+# frame_bus.py
+# 描述: 共享内存帧总线：截图进程把帧发布到共享内存环形缓冲，找图/OCR 工作进程零复制读取
+# 版本: 1.0.0
+#
+# 进程结构:
+#   GUI/宏进程   FrameBus: 创建共享内存，调度查找任务，监控子进程
+#   截图进程     按帧率截全屏写入环形缓冲 (宏未运行时空闲)
+#   工作进程 xN  在共享内存帧上直接找图 / OCR，各占一个 CPU 核；崩溃或卡死只影响当次查找
+#
+# 基准: python frame_bus.py  (使用内存中的假屏幕，无需桌面)；自检见 tests/test_frame_bus.py
+
+import multiprocessing as mp
+import os
+import queue
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+from lazy_loader import LazyModule
+
+cv2 = LazyModule('cv2')
+np = LazyModule('numpy')
+
+# ======================================================================
+# 全局配置
+# ======================================================================
+FRAME_BUS_SLOTS = 4             # 共享内存环形缓冲帧数 (读者有 SLOTS-1 个帧间隔的时间读完一帧)
+FRAME_BUS_FPS = 30              # 截图进程的目标帧率
+FRAME_BUS_WORKERS = 2           # 找图/OCR 工作进程数
+FRAME_BUS_FRAME_WAIT = 0.1      # 工作进程等待足够新的帧的最长时间 (秒)
+FRAME_BUS_TASK_TIMEOUT = 30.0   # 单次查找超时 (秒)，超时视为工作进程卡死并重启
+FRAME_BUS_RETRIES = 2           # 读取期间帧被覆盖时换最新帧重试的次数
+FRAME_BUS_START_TIMEOUT = 20.0  # 等待子进程就绪的最长时间 (秒，含导入 OpenCV/OCR 的耗时)
+
+_MAGIC = 0x53554246             # 'FBUS'
+# 头部 int64 字段
+_H_MAGIC, _H_SLOTS, _H_HEIGHT, _H_WIDTH, _H_SEQ, _H_ACTIVE, _H_DROPPED, _H_READY = range(8)
+_HEADER_FIELDS = 8
+_SLOT_FIELDS = 3                # 每帧 float64 元数据: [序号 (写入中为 -1), 截取开始时间, 截取完成时间]
+
+# ======================================================================
+# 共享内存环形缓冲
+# ======================================================================
+class FrameRing:
+    """
+    共享内存中的帧环形缓冲，布局: int64 头部 | 每帧 float64 元数据 | 每帧 高×宽×3 RGB。
+    只有截图进程一个写者，采用序号锁 (seqlock) 而不是跨进程锁: 写前把该帧序号置 -1，写完再置为新序号；
+    读者直接拿到共享内存上的数组视图，处理完用 valid() 确认期间未被覆盖，否则结果作废重试。
+    时间戳为 time.monotonic()，同一台机器上的进程之间可比较。
+    """
+    def __init__(self, name=None, width=0, height=0, slots=FRAME_BUS_SLOTS):
+        self.owner = name is None
+        if self.owner:
+            meta = _HEADER_FIELDS * 8 + slots * _SLOT_FIELDS * 8
+            self.shm = shared_memory.SharedMemory(create=True, size=meta + slots * height * width * 3)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.header = np.ndarray((_HEADER_FIELDS,), np.int64, buffer=self.shm.buf)
+        if self.owner:
+            self.header[:] = 0
+            self.header[[_H_MAGIC, _H_SLOTS, _H_HEIGHT, _H_WIDTH]] = (_MAGIC, slots, height, width)
+        elif self.header[_H_MAGIC] != _MAGIC:
+            raise ValueError(f"共享内存 {name} 不是帧总线")
+        self.slots, h, w = (int(v) for v in self.header[_H_SLOTS:_H_WIDTH + 1])
+        self.meta = np.ndarray((self.slots, _SLOT_FIELDS), np.float64, buffer=self.shm.buf, offset=_HEADER_FIELDS * 8)
+        if self.owner: self.meta[:] = 0
+        self.frames = np.ndarray((self.slots, h, w, 3), np.uint8, buffer=self.shm.buf,
+                                 offset=_HEADER_FIELDS * 8 + self.slots * _SLOT_FIELDS * 8)
+
+    @property
+    def size(self):
+        """(宽, 高)"""
+        return self.frames.shape[2], self.frames.shape[1]
+
+    def publish(self, raw, order, started):
+        """写入下一帧 (只由截图进程调用)；raw 为截图后端的原始像素，返回新序号"""
+        seq = int(self.header[_H_SEQ]) + 1
+        i = seq % self.slots
+        dst = self.frames[i]
+        if raw.shape[:2] != dst.shape[:2]:
+            raise ValueError(f"屏幕分辨率已变化 ({raw.shape[1]}x{raw.shape[0]})，需重启帧总线")
+        self.meta[i, 0] = -1
+        if order == 'RGB': np.copyto(dst, raw)
+        else: cv2.cvtColor(raw, cv2.COLOR_BGRA2RGB, dst=dst)
+        self.meta[i, 1:] = (started, time.monotonic())
+        self.meta[i, 0] = seq
+        self.header[_H_SEQ] = seq
+        return seq
+
+    def latest(self, not_before=0.0, timeout=0.0):
+        """
+        返回最新帧 (序号, 截取开始时间, 数组视图)，视图不复制，只在 valid(序号) 为真时内容可信。
+        最新帧的截取开始时间早于 not_before 时轮询等待，最多 timeout 秒，超时返回 None。
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            seq = int(self.header[_H_SEQ])
+            if seq:
+                i = seq % self.slots
+                if self.meta[i, 0] == seq and self.meta[i, 1] >= not_before:
+                    return seq, float(self.meta[i, 1]), self.frames[i]
+            if time.monotonic() >= deadline: return None
+            time.sleep(0.002)
+
+    def valid(self, seq):
+        return self.meta[seq % self.slots, 0] == seq
+
+    def close(self):
+        self.header = self.meta = self.frames = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass    # 工作进程的缓存仍引用帧视图，进程退出时自动解除映射
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+# ======================================================================
+# 子进程
+# ======================================================================
+def _make_backend(spec):
+    """spec: None (按 CAPTURE_BACKEND 选择) 或 ('fake', 宽, 高, 随机种子)"""
+    import capture_engine
+    if spec and spec[0] == 'fake':
+        capture_engine.set_backend(capture_engine.FakeCaptureBackend(spec[1], spec[2], seed=spec[3]))
+    return capture_engine.get_backend()
+
+def _capture_main(name, fps, backend_spec):
+    """截图进程: 头部 active 为 0 时空闲，否则按 fps 截图发布；父进程退出后自行结束"""
+    if sys.platform == 'win32':
+        # 与 GUI 进程一致的 DPI 感知，截图尺寸才与屏幕坐标对齐
+        try:
+            import ctypes
+            ctypes.windll.shcore.SetProcessDpiAwareness(2)
+        except Exception:
+            pass
+    ring = FrameRing(name)
+    backend = _make_backend(backend_spec)
+    parent = mp.parent_process()
+    period = 1.0 / fps
+    ring.header[_H_READY] = 1
+    next_at = time.monotonic()
+    while parent is None or parent.is_alive():
+        if not ring.header[_H_ACTIVE]:
+            time.sleep(0.05)
+            next_at = time.monotonic()
+            continue
+        try:
+            t0 = time.monotonic()
+            raw, order = backend.grab(None)
+            ring.publish(raw, order, t0)
+        except Exception as e:
+            print(f"[帧总线] 截图失败: {e}")
+            time.sleep(1.0)
+            next_at = time.monotonic()
+            continue
+        next_at += period
+        now = time.monotonic()
+        if now > next_at:
+            missed = int((now - next_at) / period) + 1
+            ring.header[_H_DROPPED] += missed
+            next_at += missed * period
+        time.sleep(max(0.0, next_at - time.monotonic()))
+
+def _task_image(frame, offset, path, conf, mode):
+    import core_engine
+    return core_engine.find_image(path, conf, frame, offset, mode)
+
+def _task_text(frame, offset, text, lang, engine):
+    import ocr_engine
+    return ocr_engine.find_text_location(text, lang, False, frame, offset, engine)
+
+_TASKS = {'image': _task_image, 'text': _task_text}
+
+def _run_task(ring, kind, args, bbox, not_before):
+    """在满足 not_before 的最新帧的 bbox 区域上执行任务；帧在处理期间被覆盖则换最新帧重试"""
+    w, h = ring.size
+    l, t, r, b = (0, 0, w, h) if bbox is None else bbox
+    l, t, r, b = max(0, l), max(0, t), min(w, r), min(h, b)
+    for _ in range(FRAME_BUS_RETRIES + 1):
+        got = ring.latest(not_before, FRAME_BUS_FRAME_WAIT)
+        if got is None: raise TimeoutError("没有足够新的帧 (截图进程未运行?)")
+        seq, _started, frame = got
+        res = _TASKS[kind](frame[t:b, l:r], (l, t), *args)
+        if ring.valid(seq): return res
+    raise RuntimeError("帧在读取期间被连续覆盖 (查找耗时过长，可增大 FRAME_BUS_SLOTS)")
+
+def _worker_main(name, conn):
+    """
+    工作进程: 就绪后先发送 ('ready', None)；之后从管道接收 (kind, args, bbox, not_before)，
+    回复 ('ok', 结果) 或 ('error', 说明)
+    """
+    ring = FrameRing(name)
+    import core_engine  # noqa: F401  导入匹配引擎与配置
+    # cv2/numpy 是惰性模块，首次使用时才真正加载；就绪前做一次极小的匹配，首个任务不必等待加载
+    warm = np.zeros((8, 8), np.uint8)
+    cv2.matchTemplate(warm, warm[:4, :4], cv2.TM_CCOEFF_NORMED)
+    parent = mp.parent_process()
+    conn.send(('ready', None))
+    while parent is None or parent.is_alive():
+        if not conn.poll(0.5): continue
+        task = conn.recv()
+        if task is None: break
+        try:
+            conn.send(('ok', _run_task(ring, *task)))
+        except Exception as e:
+            conn.send(('error', f"{type(e).__name__}: {e}"))
+
+# ======================================================================
+# 帧总线服务 (GUI/宏进程)
+# ======================================================================
+class _Worker:
+    __slots__ = ('proc', 'conn')
+
+    def __init__(self, proc, conn):
+        self.proc, self.conn = proc, conn
+
+class FrameBus:
+    """
+    帧总线服务: 首次 start() 时创建共享内存环形缓冲，启动截图进程与工作进程 (spawn 方式，各平台一致)。
+    子进程在整个程序生命周期内保留；没有使用者 (宏未运行) 时截图进程空闲。
+    find_image / find_text 把查找交给空闲的工作进程，返回值与进程内的 find_image /
+    ocr_engine.find_text_location 相同；工作进程崩溃、卡死或出错时自动重启，该次查找返回 None。
+    """
+    def __init__(self, workers=FRAME_BUS_WORKERS, fps=FRAME_BUS_FPS, backend=None):
+        self.workers = workers
+        self.fps = fps
+        self.backend = backend      # 子进程的截图后端，见 _make_backend
+        self.ring = None
+        self._mp = mp.get_context('spawn')
+        self._capture = None
+        self._idle = queue.Queue()
+        self._workers = []          # 全部工作进程 (含正在执行任务的)，close() 时逐个结束
+        self._lock = threading.Lock()
+        self._users = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {'tasks': 0, 'time': 0.0, 'failed': 0, 'crashed': 0, 'timeout': 0}
+
+    @property
+    def active(self):
+        return self.ring is not None and self._users > 0
+
+    def _open(self):
+        import capture_engine
+        if self.backend and self.backend[0] == 'fake':
+            w, h = self.backend[1], self.backend[2]
+        else:
+            w, h = capture_engine.frame_size(capture_engine.capture(None, 'rgb'))
+        t0 = time.perf_counter()
+        self.ring = FrameRing(None, w, h)
+        self._capture = self._mp.Process(target=_capture_main, args=(self.ring.name, self.fps, self.backend),
+                                         name='frame-bus-capture', daemon=True)
+        self._capture.start()
+        self._workers = [self._spawn_worker() for _ in range(self.workers)]
+        deadline = time.monotonic() + FRAME_BUS_START_TIMEOUT
+        for worker in self._workers:
+            # 就绪消息在这里取走；超时未到的由 _call 跳过
+            if worker.conn.poll(max(0.0, deadline - time.monotonic())): worker.conn.recv()
+            self._idle.put(worker)
+        while not self.ring.header[_H_READY] and time.monotonic() < deadline:
+            time.sleep(0.05)
+        print(f"[帧总线] {w}x{h} x{self.ring.slots}帧 ({self.ring.shm.size / 1048576:.0f}MB 共享内存) | "
+              f"截图进程 + {self.workers} 个工作进程 | 启动 {time.perf_counter() - t0:.1f}s")
+
+    def _spawn_worker(self):
+        conn, child = self._mp.Pipe()
+        proc = self._mp.Process(target=_worker_main, args=(self.ring.name, child), name='frame-bus-worker', daemon=True)
+        proc.start()
+        child.close()
+        return _Worker(proc, conn)
+
+    def _restart(self, worker):
+        worker.conn.close()
+        if worker.proc.is_alive():
+            worker.proc.kill()
+        worker.proc.join(1.0)
+        if worker not in self._workers: return worker  # 期间已 close()，不再补充
+        new = self._spawn_worker()
+        self._workers[self._workers.index(worker)] = new
+        return new
+
+    def start(self):
+        """登记一个使用者 (宏开始运行)；首次调用时启动子进程"""
+        with self._lock:
+            if self.ring is None: self._open()
+            self._users += 1
+            self.ring.header[_H_ACTIVE] = 1
+
+    def stop(self):
+        """注销一个使用者；全部注销后截图进程空闲"""
+        with self._lock:
+            self._users = max(0, self._users - 1)
+            if self.ring is not None and not self._users: self.ring.header[_H_ACTIVE] = 0
+
+    def _call(self, kind, args, bbox, not_before, timeout=FRAME_BUS_TASK_TIMEOUT):
+        with self._lock:
+            if self.ring is None: return None   # 未启动或已 close()
+            idle = self._idle
+        try:
+            # close() 会换上新的空队列，旧队列不再有工作进程放回，因此必须限时等待
+            worker = idle.get(timeout=timeout)
+        except queue.Empty:
+            self.stats['timeout'] += 1
+            print(f"[帧总线] {timeout:.0f}s 内没有空闲的工作进程，本次查找视为未找到")
+            return None
+        t0 = time.perf_counter()
+        try:
+            worker.conn.send((kind, args, bbox, not_before))
+            deadline = time.monotonic() + timeout
+            while True:
+                if worker.conn.poll(0.05):
+                    status, value = worker.conn.recv()
+                    if status != 'ready': break     # 重启后的工作进程先发送就绪消息
+                    continue
+                if not worker.proc.is_alive():
+                    raise EOFError
+                if time.monotonic() > deadline:
+                    self.stats['timeout'] += 1
+                    print(f"[帧总线] 工作进程 {timeout:.0f}s 未响应，已重启")
+                    worker = self._restart(worker)
+                    return None
+        except (EOFError, OSError):
+            self.stats['crashed'] += 1
+            worker.proc.join(1.0)
+            print(f"[帧总线] 工作进程崩溃 (退出码 {worker.proc.exitcode})，已重启；本次查找视为未找到")
+            worker = self._restart(worker)
+            return None
+        finally:
+            if worker in self._workers: self._idle.put(worker)
+        self.stats['tasks'] += 1
+        self.stats['time'] += time.perf_counter() - t0
+        if status != 'ok':
+            self.stats['failed'] += 1
+            print(f"[帧总线] 查找失败: {value}")
+            return None
+        return value
+
+    def find_image(self, path, conf, mode='template', bbox=None, not_before=0.0):
+        """在工作进程中找图，返回值同 core_engine.find_image；bbox=(left, top, right, bottom)"""
+        return self._call('image', (path, conf, mode), bbox, not_before)
+
+    def find_text(self, text, lang='eng', engine='auto', bbox=None, not_before=0.0):
+        """在工作进程中 OCR 查找文本，返回值同 ocr_engine.find_text_location"""
+        return self._call('text', (text, lang, engine), bbox, not_before)
+
+    def close(self):
+        """结束子进程并释放共享内存"""
+        with self._lock:
+            if self.ring is None: return
+            # 正在执行任务的工作进程不在空闲队列里，按完整列表结束，避免遗留子进程
+            workers, self._workers, self._idle = self._workers, [], queue.Queue()
+            for worker in workers:
+                try:
+                    worker.conn.send(None)
+                except OSError:
+                    pass
+            for proc in [worker.proc for worker in workers] + [self._capture]:
+                proc.join(1.0)
+                if proc.is_alive(): proc.kill()
+            self.ring.close()
+            self.ring, self._capture, self._users = None, None, 0
+
+    def get_stats(self):
+        s = self.stats
+        if not (s['tasks'] or s['crashed'] or s['timeout']): return "(无记录)"
+        frames = int(self.ring.header[_H_SEQ]) if self.ring is not None else 0
+        dropped = int(self.ring.header[_H_DROPPED]) if self.ring is not None else 0
+        return (f"(查找{s['tasks']}次 平均{s['time'] / max(1, s['tasks']) * 1000:.1f}ms | 失败{s['failed']} "
+                f"崩溃{s['crashed']} 超时{s['timeout']} | 累计发布{frames}帧 丢帧{dropped})")
+
+frame_bus = FrameBus()
+
+# ======================================================================
+# 基准测试
+# ======================================================================
+def benchmark(width=1920, height=1080, searches=40):
+    """
+    用假屏幕对比进程内找图与帧总线多工作进程并发找图的单次耗时。
+    返回 (进程内秒数, 帧总线秒数)。
+    """
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+    import capture_engine
+    import core_engine
+    seed = 7
+    screen = capture_engine.FakeCaptureBackend(width, height, seed=seed).screen
+    x, y, tw, th = width // 3, height // 2, 64, 48
+    path = os.path.join(tempfile.mkdtemp(), 'frame_bus_template.png')
+    cv2.imwrite(path, cv2.cvtColor(screen[y:y + th, x:x + tw], cv2.COLOR_RGB2BGR))
+
+    bus = FrameBus(backend=('fake', width, height, seed))
+    try:
+        bus.start()
+        t0 = time.perf_counter()
+        for _ in range(searches // 4): core_engine.find_image(path, 0.9, screen, (0, 0))
+        local = (time.perf_counter() - t0) / (searches // 4)
+        with ThreadPoolExecutor(bus.workers) as pool:
+            t0 = time.perf_counter()
+            hits = list(pool.map(lambda _i: bus.find_image(path, 0.9), range(searches)))
+            remote = (time.perf_counter() - t0) / searches
+        print(f"[基准] 进程内 {local * 1000:.1f}ms/次 | 帧总线 {bus.workers} 工作进程 {remote * 1000:.1f}ms/次 "
+              f"(吞吐 x{local / remote:.1f}) | 命中 {sum(map(bool, hits))}/{searches}")
+        print(f"[帧总线] {bus.get_stats()}")
+    finally:
+        bus.stop()
+        bus.close()
+        os.remove(path)
+    return local, remote
+
+if __name__ == "__main__":
+    benchmark()
@@ -1,14 +1,23 @@
 # -*- coding: utf-8 -*-
 # gui_utils.py
 # 描述：GUI 辅助工具库 (重构版 - 样式完美还原)
-# 版本：1.2.6
+# 版本：1.3.0
 
 import tkinter as tk
 from tkinter import ttk, messagebox
-import pyautogui
-from PIL import Image, ImageTk
 import os
 import time
+import bisect
+import itertools
+import queue
+import threading
+from collections import OrderedDict
+from lazy_loader import LazyModule
+
+# 重型依赖延迟到首次使用时导入
+pyautogui = LazyModule('pyautogui')
+Image = LazyModule('PIL.Image')
+ImageTk = LazyModule('PIL.ImageTk')
 
 # 引入核心库中的工具用于处理快捷键显示
 try:
@@ -47,28 +56,83 @@ def parse_region_string(region_str):
 # =================================================================
 # 2. 鼠标位置追踪器 (MouseTracker)
 # =================================================================
+MOUSE_TRACKER_FRAME_MS = 16   # 事件模式下的刷新节流 (约 60Hz 显示刷新率)
+MOUSE_TRACKER_POLL_MS = 100   # 轮询模式 (兜底) 的刷新间隔
+
 class MouseTracker:
-    def __init__(self, root, tk_var):
+    """
+    实时鼠标坐标显示。
+
+    默认由 pynput 鼠标移动事件驱动：监听线程只记录最新坐标，
+    并在一帧 (MOUSE_TRACKER_FRAME_MS) 内最多唤醒主线程一次，鼠标静止时不做任何工作。
+    pynput 不可用或监听器启动失败时回退为定时轮询。
+    注意: pynput 的 keyboard.Listener (快捷键监听) 只安装键盘钩子，无法接收鼠标事件，
+    因此这里使用独立的 mouse.Listener；它只在显示坐标期间存在，stop() 时即结束。
+
+    Args:
+        backend: 'auto' | 'pynput' | 'poll'
+    """
+    def __init__(self, root, tk_var, backend='auto'):
         self.root = root
         self.var = tk_var
+        self.backend = backend
         self.job = None
         self.is_running = False
+        self.listener = None
+        self.lock = threading.Lock()
+        self.latest = None
+        self.flush_scheduled = False
 
     def start(self):
         if not self.is_running:
             self.is_running = True
-            self._update()
+            if self.backend != 'poll' and self._start_listener():
+                self._show_current()  # 鼠标静止时不会有事件，先显示一次当前位置
+            else:
+                self._update()
 
     def stop(self):
         self.is_running = False
+        if self.listener:
+            try: self.listener.stop()
+            except: pass
+            self.listener = None
         if self.job:
             try: self.root.after_cancel(self.job)
             except: pass
             self.job = None
-            self.var.set("")
+        self.var.set("")
 
-    def _update(self):
-        if not self.is_running: return
+    def _start_listener(self):
+        try:
+            from pynput import mouse
+            self.listener = mouse.Listener(on_move=self._on_move)
+            self.listener.start()
+            return True
+        except Exception as e:
+            print(f"[MouseTracker] 事件监听不可用，回退为轮询: {e}")
+            self.listener = None
+            return False
+
+    def _on_move(self, x, y):
+        # 监听线程：只覆盖最新坐标，已安排刷新时不再重复唤醒
+        with self.lock:
+            self.latest = (x, y)
+            if self.flush_scheduled: return
+            self.flush_scheduled = True
+        try: self.root.after(MOUSE_TRACKER_FRAME_MS, self._flush)
+        except (RuntimeError, tk.TclError):
+            # 未能安排刷新：撤销标记，否则坐标显示会一直停住
+            with self.lock: self.flush_scheduled = False
+
+    def _flush(self):
+        with self.lock:
+            pos = self.latest
+            self.flush_scheduled = False
+        if self.is_running and pos:
+            self.var.set(f"X: {int(pos[0])}, Y: {int(pos[1])}")
+
+    def _show_current(self):
         try:
             x, y = pyautogui.position()
             self.var.set(f"X: {x}, Y: {y}")
@@ -76,7 +140,11 @@ class MouseTracker:
             self.var.set("未知")
             # 打印异常但不中断，防止刷屏
             # print(f"[MouseTracker] Error: {e}") 
-        self.job = self.root.after(100, self._update)
+
+    def _update(self):
+        if not self.is_running: return
+        self._show_current()
+        self.job = self.root.after(MOUSE_TRACKER_POLL_MS, self._update)
 
 # =================================================================
 # 3. 自动换行标签 (AutoWrapLabel)
@@ -162,36 +230,152 @@ class RegionSelector:
 # =================================================================
 # 5. 图片悬浮预览 (ImageTooltipManager)
 # =================================================================
+THUMBNAIL_SIZE = (300, 300)
+THUMBNAIL_CACHE_SIZE = 64      # 缓存的缩略图数量 (300x300 RGB 约 270KB/张)
+THUMBNAIL_PREFETCH_RADIUS = 3  # 预取选中行前后各 N 个步骤的缩略图
+
+class ThumbnailCache:
+    """
+    缩略图 LRU 缓存：以 (路径, 修改时间) 为键，文件被覆盖后自动失效。
+    解码与缩放在后台线程完成，结果通过 widget.after 交回 Tk 主线程。
+    """
+    PRIORITY_SHOW, PRIORITY_PREFETCH = 0, 1
+
+    def __init__(self, widget, maxsize=THUMBNAIL_CACHE_SIZE, size=THUMBNAIL_SIZE):
+        self.widget = widget
+        self.maxsize = maxsize
+        self.size = size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.tasks = queue.PriorityQueue()
+        self.pending = set()
+        self.seq = itertools.count()  # 同优先级按提交顺序处理
+        self.worker = None
+
+    @staticmethod
+    def _key(path):
+        try: return (path, os.stat(path).st_mtime_ns)
+        except OSError: return None
+
+    def get(self, path):
+        """仅查缓存 (主线程调用)，未命中返回 None"""
+        key = self._key(path)
+        if key is None: return None
+        with self.lock:
+            img = self.cache.get(key)
+            if img is not None: self.cache.move_to_end(key)
+            return img
+
+    def request(self, path, callback=None, prefetch=False):
+        """
+        请求缩略图。命中缓存时立即回调；否则交给后台线程解码，
+        完成后在主线程回调 callback(path, img)，解码失败时 img 为 None。
+        """
+        key = self._key(path)
+        if key is None:
+            if callback: callback(path, None)
+            return
+        img = self.get(path)
+        if img is not None:
+            if callback: callback(path, img)
+            return
+        with self.lock:
+            if prefetch and key in self.pending: return
+            self.pending.add(key)
+        priority = self.PRIORITY_PREFETCH if prefetch else self.PRIORITY_SHOW
+        self.tasks.put((priority, next(self.seq), key, callback))
+        self._ensure_worker()
+
+    def _ensure_worker(self):
+        if self.worker and self.worker.is_alive(): return
+        self.worker = threading.Thread(target=self._work, daemon=True)
+        self.worker.start()
+
+    def _work(self):
+        while True:
+            _, _, key, callback = self.tasks.get()
+            path = key[0]
+            with self.lock:
+                img = self.cache.get(key)
+            if img is None:
+                img = self._decode(path)
+                with self.lock:
+                    self.pending.discard(key)
+                    if img is not None:
+                        self.cache[key] = img
+                        while len(self.cache) > self.maxsize:
+                            self.cache.popitem(last=False)
+            if callback:
+                try: self.widget.after(0, callback, path, img)
+                except (RuntimeError, tk.TclError): pass  # 主窗口已销毁
+
+    def _decode(self, path):
+        try:
+            with Image.open(path) as src:
+                # JPEG 可在解码阶段直接降采样，避免解出全尺寸大图
+                src.draft('RGB', self.size)
+                img = src.convert('RGBA' if src.mode in ('RGBA', 'LA', 'P') else 'RGB')
+            img.thumbnail(self.size, Image.Resampling.LANCZOS)
+            return img
+        except (OSError, IOError, ValueError) as e:
+            print(f"[Tooltip] 缩略图解码失败: {e}")
+            return None
+
 class ImageTooltipManager:
-    def __init__(self, treeview, app_steps_getter):
+    def __init__(self, treeview, app_steps_getter, index_getter=None, select_event="<<TreeviewSelect>>"):
         self.tree = treeview
         self.get_steps = app_steps_getter
+        # 虚拟化列表中行序号不等于步骤索引，由调用方提供映射
+        self.get_index = index_getter or self._get_tree_index
         self.tooltip_window = None
         self.timer = None
-        self.tree.bind("<<TreeviewSelect>>", self.on_select)
+        self.pending_idx = None
+        self.thumbnails = ThumbnailCache(self.tree)
+        self.tree.bind(select_event, self.on_select, add="+")
+
+    def _get_tree_index(self):
+        sel = self.tree.selection()
+        return self.tree.index(sel[0]) if sel else None
+
+    @staticmethod
+    def _step_path(step):
+        return step.get('params', {}).get('path')
 
     def on_select(self, event):
         if self.timer: self.tree.after_cancel(self.timer)
         self.hide_tooltip()
-        sel = self.tree.selection()
-        if not sel: return
-        self.timer = self.tree.after(500, lambda: self.show_tooltip(sel[0]))
+        idx = self.get_index()
+        self.pending_idx = idx
+        if idx is None: return
+        self._prefetch_around(idx)
+        self.timer = self.tree.after(500, lambda: self.show_tooltip(idx))
+
+    def _prefetch_around(self, idx):
+        """预取选中行附近步骤的缩略图，方向键连续浏览时可直接命中缓存"""
+        steps = self.get_steps()
+        lo, hi = max(0, idx - THUMBNAIL_PREFETCH_RADIUS), min(len(steps), idx + THUMBNAIL_PREFETCH_RADIUS + 1)
+        # 先当前行，再由近及远
+        for i in sorted(range(lo, hi), key=lambda i: abs(i - idx)):
+            path = self._step_path(steps[i])
+            if path: self.thumbnails.request(path, prefetch=True)
 
     def hide_tooltip(self):
         if self.tooltip_window:
             self.tooltip_window.destroy()
             self.tooltip_window = None
 
-    def show_tooltip(self, row_id):
+    def show_tooltip(self, idx):
+        self.timer = None
+        steps = self.get_steps()
+        if not steps or idx >= len(steps): return
+        path = self._step_path(steps[idx])
+        if not path: return
+        self.thumbnails.request(path, lambda p, img: self._on_thumbnail_ready(idx, p, img))
+
+    def _on_thumbnail_ready(self, idx, path, img):
+        # 解码期间选中行已变化则丢弃
+        if img is None or idx != self.pending_idx or self.tooltip_window: return
         try:
-            steps = self.get_steps()
-            if not steps: return
-            idx = self.tree.index(row_id)
-            if idx >= len(steps): return
-            
-            path = steps[idx].get('params', {}).get('path')
-            if not path or not os.path.exists(path): return
-            
             # [优化] 使用 try-finally 确保资源清理
             window = None
             try:
@@ -202,8 +386,6 @@ class ImageTooltipManager:
                 frame = ttk.Frame(window, relief='solid', borderwidth=1)
                 frame.pack()
                 
-                img = Image.open(path)
-                img.thumbnail((300, 300), Image.Resampling.LANCZOS)
                 self.tk_img = ImageTk.PhotoImage(img)
                 
                 ttk.Label(frame, image=self.tk_img).pack(padx=2, pady=2)
@@ -422,3 +604,300 @@ class HotkeySettingsDialog:
                 if part not in valid_keys:
                     return False
         return True
+
+# =================================================================
+# 8. 虚拟化步骤列表 (VirtualStepList)
+# =================================================================
+class VirtualStepList:
+    """
+    虚拟化步骤列表：Treeview 中只保留可见窗口内的若干行，
+    滚动时复用这些行并重新填充数据，因此步骤数量再大也只创建一屏的行对象。
+
+    支持:
+        - 折叠/展开 IF 与 LOOP 块 (点击 # 列的 ▾/▸，或选中后按 ←/→)
+        - 按步骤索引记录选中项与滚动位置，刷新后保持不变
+        - 编辑行高亮 (tag: editing)
+
+    Args:
+        master: 父容器
+        steps_getter: 返回当前步骤列表的函数
+        row_formatter: (index, step, depth) -> (action_text, param_text)
+        editing_getter: 返回当前编辑行索引 (或 None) 的函数
+    """
+    SELECT_EVENT = "<<StepSelect>>"
+    CLOSING_ACTIONS = ('ELSE', 'END_IF', 'END_LOOP')
+    WHEEL_STEP = 3  # 每格滚轮滚动的行数
+
+    def __init__(self, master, steps_getter, row_formatter, editing_getter=lambda: None):
+        self.get_steps = steps_getter
+        self.format_row = row_formatter
+        self.get_editing = editing_getter
+
+        columns = ("id", "action", "params")
+        self.tree = ttk.Treeview(master, columns=columns, show="headings", selectmode="browse")
+        self.scrollbar = ttk.Scrollbar(master, orient=tk.VERTICAL, command=self._on_scrollbar)
+
+        self.depth = []          # 每个步骤的缩进层级
+        self.parent = []         # 每个步骤所属块的起始索引 (-1 表示顶层)
+        self.block_end = {}      # 块起始索引 -> 块结束索引
+        self.rows = []           # 当前可见的步骤索引 (已排除折叠部分)
+        self.collapsed = set()   # 已折叠块的 id(step)，步骤移动后仍然有效
+
+        self.top = 0             # 窗口首行在 rows 中的位置
+        self.visible_count = 1
+        self.selected_index = None
+        self.row_items = []      # 复用的 Treeview 行 ID
+
+        self.tree.bind("<Configure>", self._on_configure)
+        self.tree.bind("<<TreeviewSelect>>", self._on_tree_select)
+        self.tree.bind("<Button-1>", self._on_click, add="+")
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self._scroll_rows(-self.WHEEL_STEP))
+        self.tree.bind("<Button-5>", lambda e: self._scroll_rows(self.WHEEL_STEP))
+        for key, delta in (("<Up>", -1), ("<Down>", 1)):
+            self.tree.bind(key, lambda e, d=delta: self._move_selection(d))
+        self.tree.bind("<Prior>", lambda e: self._move_selection(-self.visible_count))
+        self.tree.bind("<Next>", lambda e: self._move_selection(self.visible_count))
+        self.tree.bind("<Home>", lambda e: self._move_selection(-len(self.rows)))
+        self.tree.bind("<End>", lambda e: self._move_selection(len(self.rows)))
+        self.tree.bind("<Left>", lambda e: self._set_collapsed_selected(True))
+        self.tree.bind("<Right>", lambda e: self._set_collapsed_selected(False))
+
+    # --- 结构计算 ---
+    def _rebuild_structure(self):
+        steps = self.get_steps()
+        n = len(steps)
+        depth, parent, block_end = [0] * n, [-1] * n, {}
+        stack = []
+        for i, step in enumerate(steps):
+            act = step.get('action', '')
+            depth[i] = max(0, len(stack) - (1 if act in self.CLOSING_ACTIONS else 0))
+            parent[i] = stack[-1] if stack else -1
+            if act.startswith('IF_') or act == 'LOOP_START':
+                stack.append(i)
+            elif act in ('END_IF', 'END_LOOP') and stack:
+                block_end[stack.pop()] = i
+        for start in stack:  # 未闭合的块延伸到末尾
+            block_end[start] = n - 1
+        self.depth, self.parent, self.block_end = depth, parent, block_end
+
+        # 清理已不存在的折叠记录，并计算可见行
+        live = {id(steps[i]) for i in block_end}
+        self.collapsed &= live
+        rows, i = [], 0
+        while i < n:
+            rows.append(i)
+            if i in block_end and id(steps[i]) in self.collapsed:
+                i = block_end[i] + 1
+            else:
+                i += 1
+        self.rows = rows
+        if self.selected_index is not None and self.selected_index >= n:
+            self.selected_index = n - 1 if n else None
+
+    def _row_of(self, index):
+        """返回步骤索引在可见行中的位置 (rows 有序，二分查找)"""
+        r = bisect.bisect_left(self.rows, index)
+        return r if r < len(self.rows) and self.rows[r] == index else None
+
+    # --- 渲染 ---
+    def _render(self):
+        steps = self.get_steps()
+        total = len(self.rows)
+        count = min(self.visible_count, total)
+        self.top = max(0, min(self.top, total - count))
+
+        while len(self.row_items) < count:
+            self.row_items.append(self.tree.insert("", "end", values=("", "", "")))
+        while len(self.row_items) > count:
+            self.tree.delete(self.row_items.pop())
+
+        editing = self.get_editing()
+        selected_item = None
+        for k, item_id in enumerate(self.row_items):
+            idx = self.rows[self.top + k]
+            step = steps[idx]
+            action_text, param_text = self.format_row(idx, step, self.depth[idx])
+            marker = ""
+            if idx in self.block_end:
+                if id(step) in self.collapsed:
+                    marker = "▸ "
+                    param_text = f"[已折叠 {self.block_end[idx] - idx} 步] {param_text}"
+                else:
+                    marker = "▾ "
+            tags = ('editing',) if idx == editing else ()
+            self.tree.item(item_id, values=(f"{marker}{idx + 1}", action_text, param_text), tags=tags)
+            if idx == self.selected_index: selected_item = item_id
+
+        current = self.tree.selection()
+        if selected_item and current != (selected_item,):
+            self.tree.selection_set(selected_item)
+        elif not selected_item and current:
+            self.tree.selection_remove(*current)
+        self.tree.yview_moveto(0)  # 行对象始终从顶部排列，防止 Treeview 自行滚动
+
+        if total:
+            self.scrollbar.set(self.top / total, (self.top + count) / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def refresh(self):
+        """步骤列表变化后调用：重新计算结构并渲染当前窗口"""
+        self._rebuild_structure()
+        self._render()
+
+    def reset_view(self):
+        """载入新宏时调用：回到顶部并清空选中与折叠状态"""
+        self.top = 0
+        self.selected_index = None
+        self.collapsed.clear()
+
+    # --- 公共接口 ---
+    def get_selected_index(self):
+        return self.selected_index
+
+    def see_index(self, index):
+        """确保指定步骤可见 (必要时展开其所在的折叠块)"""
+        steps = self.get_steps()
+        if index is None or not (0 <= index < len(steps)): return
+        p, expanded = self.parent[index] if index < len(self.parent) else -1, False
+        while p != -1:
+            if id(steps[p]) in self.collapsed:
+                self.collapsed.discard(id(steps[p])); expanded = True
+            p = self.parent[p]
+        if expanded: self._rebuild_structure()
+        r = self._row_of(index)
+        if r is None: return self._render()
+        if r < self.top: self.top = r
+        elif r >= self.top + self.visible_count: self.top = r - self.visible_count + 1
+        self._render()
+
+    def select_index(self, index, see=True):
+        steps = self.get_steps()
+        index = None if index is None or not steps else max(0, min(index, len(steps) - 1))
+        changed = index != self.selected_index
+        self.selected_index = index
+        if see and index is not None: self.see_index(index)
+        else: self._render()
+        if changed: self.tree.event_generate(self.SELECT_EVENT)
+
+    def toggle_collapse(self, index):
+        steps = self.get_steps()
+        if index not in self.block_end: return
+        key = id(steps[index])
+        if key in self.collapsed: self.collapsed.discard(key)
+        else: self.collapsed.add(key)
+        self.refresh()
+
+    def is_marker_click(self, event):
+        return self.tree.identify_column(event.x) == "#1"
+
+    # --- 事件处理 ---
+    def _on_configure(self, event):
+        rowheight = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        # 减去表头高度，只保留完整显示的行
+        count = max(1, (event.height - rowheight - 4) // rowheight)
+        if count != self.visible_count:
+            self.visible_count = count
+            self._render()
+
+    def _on_tree_select(self, event):
+        sel = self.tree.selection()
+        if not sel or sel[0] not in self.row_items: return
+        idx = self.rows[self.top + self.row_items.index(sel[0])]
+        if idx != self.selected_index:
+            self.selected_index = idx
+            self.tree.event_generate(self.SELECT_EVENT)
+
+    def _on_click(self, event):
+        if not self.is_marker_click(event): return
+        item_id = self.tree.identify_row(event.y)
+        if item_id in self.row_items:
+            self.toggle_collapse(self.rows[self.top + self.row_items.index(item_id)])
+
+    def _on_mousewheel(self, event):
+        # Windows 每格 delta=120，macOS 为较小的整数
+        notches = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        return self._scroll_rows(-notches * self.WHEEL_STEP)
+
+    def _scroll_rows(self, delta):
+        self.top += delta
+        self._render()
+        return "break"
+
+    def _on_scrollbar(self, *args):
+        total = len(self.rows)
+        if args[0] == 'moveto':
+            self.top = int(float(args[1]) * total)
+        elif args[0] == 'scroll':
+            n = int(args[1])
+            self.top += n * (self.visible_count if args[2] == 'pages' else 1)
+        self._render()
+
+    def _move_selection(self, delta):
+        if not self.rows: return "break"
+        r = self._row_of(self.selected_index) if self.selected_index is not None else None
+        if r is None: r = self.top if delta > 0 else self.top + self.visible_count
+        r = max(0, min(r + delta, len(self.rows) - 1))
+        self.select_index(self.rows[r])
+        return "break"
+
+    def _set_collapsed_selected(self, collapse):
+        idx = self.selected_index
+        if idx is None: return "break"
+        if idx not in self.block_end and collapse and self.parent[idx] != -1:
+            idx = self.parent[idx]  # 在块内按 ← 时折叠所在的块
+            self.selected_index = idx
+        if idx in self.block_end and (id(self.get_steps()[idx]) in self.collapsed) != collapse:
+            self.toggle_collapse(idx)
+            self.see_index(idx)
+        return "break"
+
+# =================================================================
+# 9. 状态推送通道 (StatusChannel)
+# =================================================================
+class StatusChannel:
+    """
+    单槽"最新值"状态通道 (替代定时轮询队列)。
+
+    工作线程调用 publish() 只覆盖槽位中的最新状态；
+    仅当主线程尚未被唤醒时才发送一次虚拟事件，
+    因此无论发布多频繁，两次渲染之间最多只有一次唤醒，空闲时没有任何定时器。
+
+    Args:
+        widget: 接收唤醒事件的 Tk 控件 (一般为 root)
+        render: 主线程中调用的渲染函数 render(status)
+    """
+    EVENT = "<<MacroStatus>>"
+
+    def __init__(self, widget, render):
+        self.widget = widget
+        self.render = render
+        self.lock = threading.Lock()
+        self.latest = None
+        self.wakeup_pending = False
+        self.widget.bind(self.EVENT, self._on_wakeup)
+
+    def publish(self, status):
+        """可在任意线程调用"""
+        with self.lock:
+            self.latest = status
+            if self.wakeup_pending: return
+            self.wakeup_pending = True
+        try:
+            self.widget.event_generate(self.EVENT, when="tail")
+        except (RuntimeError, tk.TclError):
+            # 主窗口已销毁或暂时无法投递：撤销标记，否则之后的状态都会被丢弃
+            with self.lock:
+                self.wakeup_pending = False
+
+    def clear(self):
+        with self.lock:
+            self.latest = None
+
+    def _on_wakeup(self, event):
+        with self.lock:
+            status, self.latest = self.latest, None
+            self.wakeup_pending = False
+        if status is not None:
+            self.render(status)
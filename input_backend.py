@@ -0,0 +1,437 @@
+# -*- coding: utf-8 -*-
+# input_backend.py
+# 描述: 可插拔的键鼠输入后端与执行节奏配置
+# 版本: 1.1.0
+
+import sys
+import time
+from lazy_loader import LazyModule
+
+pyautogui = LazyModule('pyautogui')
+pyperclip = LazyModule('pyperclip')
+pynput_mouse = LazyModule('pynput.mouse')
+pynput_keyboard = LazyModule('pynput.keyboard')
+
+# ======================================================================
+# 执行节奏配置 (Timing Profile)
+# ======================================================================
+# 所有停顿都由配置显式给出，后端本身不再附带任何隐式等待:
+#   backend       - 使用的输入后端
+#   action_delay  - 每个键鼠动作之后的停顿 (秒)，standard 与 pyautogui.PAUSE 默认值一致
+#   move_duration - MOVE_TO / MOVE_OFFSET 未指定 duration 时的移动动画时长 (秒)
+#   text_chunk    - TYPE_TEXT 直接输入时每批发送的字符数
+#   text_chunk_delay - 两批之间的停顿 (秒)，给目标程序消化消息队列的时间
+TIMING_PROFILES = {
+    'standard': {'backend': 'pyautogui', 'action_delay': 0.1,  'move_duration': 0.25,
+                 'text_chunk': 32,  'text_chunk_delay': 0.01},
+    'fast':     {'backend': 'pyautogui', 'action_delay': 0.02, 'move_duration': 0.0,
+                 'text_chunk': 64,  'text_chunk_delay': 0.002},
+    'turbo':    {'backend': 'turbo',     'action_delay': 0.0,  'move_duration': 0.0,
+                 'text_chunk': 256, 'text_chunk_delay': 0.0},
+}
+DEFAULT_TIMING_PROFILE = 'standard'
+
+def resolve_timing_profile(profile):
+    """接受配置名或字典 (可只覆盖部分字段)，返回完整配置"""
+    if isinstance(profile, dict):
+        base = dict(TIMING_PROFILES[profile.get('base', DEFAULT_TIMING_PROFILE)])
+        base.update({k: v for k, v in profile.items() if k != 'base'})
+        return base
+    return dict(TIMING_PROFILES.get(profile or DEFAULT_TIMING_PROFILE, TIMING_PROFILES[DEFAULT_TIMING_PROFILE]))
+
+# ======================================================================
+# 后端接口
+# ======================================================================
+class InputBackend:
+    """
+    键鼠输入后端接口。坐标均为屏幕绝对坐标；
+    实现类不得包含隐式停顿，节奏由 TIMING_PROFILES 控制。
+    """
+    name = 'base'
+
+    def position(self): raise NotImplementedError
+    def move_to(self, x, y, duration=0.0): raise NotImplementedError
+    def move_rel(self, dx, dy, duration=0.0): raise NotImplementedError
+    def click(self, x=None, y=None, button='left', clicks=1, interval=0.0, duration=0.0): raise NotImplementedError
+    def scroll(self, amount, x=None, y=None): raise NotImplementedError
+    def hotkey(self, *keys): raise NotImplementedError
+    def write(self, text, interval=0.0): raise NotImplementedError
+
+    def type_unicode(self, text, chunk_size=32, chunk_delay=0.0, should_stop=None):
+        """按字符直接发送 Unicode 键盘事件 (支持中文)，返回已发送字符数"""
+        return _send_unicode_text(text, chunk_size, chunk_delay, should_stop)
+
+class PyAutoGUIBackend(InputBackend):
+    """pyautogui 实现 (兼容原有行为)，所有调用传入 _pause=False 跳过全局 PAUSE"""
+    name = 'pyautogui'
+
+    def position(self):
+        return tuple(pyautogui.position())
+
+    def move_to(self, x, y, duration=0.0):
+        pyautogui.moveTo(x, y, duration=duration, _pause=False)
+
+    def move_rel(self, dx, dy, duration=0.0):
+        pyautogui.move(dx, dy, duration=duration, _pause=False)
+
+    def click(self, x=None, y=None, button='left', clicks=1, interval=0.0, duration=0.0):
+        pyautogui.click(x=x, y=y, button=button, clicks=clicks, interval=interval, duration=duration, _pause=False)
+
+    def scroll(self, amount, x=None, y=None):
+        pyautogui.scroll(amount, x=x, y=y, _pause=False)
+
+    def hotkey(self, *keys):
+        pyautogui.hotkey(*keys, _pause=False)
+
+    def write(self, text, interval=0.0):
+        pyautogui.write(text, interval=interval, _pause=False)
+
+class TurboBackend(InputBackend):
+    """
+    极速后端：直接通过 pynput 发送系统输入事件，完全绕开 pyautogui
+    (无 PAUSE、无 FAILSAFE 角落检查、无移动动画插值)。
+    duration 参数被忽略，鼠标瞬移到目标位置。
+    """
+    name = 'turbo'
+
+    # pyautogui 键名 -> pynput Key 属性名
+    KEY_ALIASES = {
+        'ctrl': 'ctrl', 'control': 'ctrl', 'ctrlleft': 'ctrl_l', 'ctrlright': 'ctrl_r',
+        'alt': 'alt', 'altleft': 'alt_l', 'altright': 'alt_r',
+        'shift': 'shift', 'shiftleft': 'shift_l', 'shiftright': 'shift_r',
+        'win': 'cmd', 'winleft': 'cmd_l', 'winright': 'cmd_r', 'cmd': 'cmd', 'command': 'cmd',
+        'enter': 'enter', 'return': 'enter', 'esc': 'esc', 'escape': 'esc',
+        'backspace': 'backspace', 'del': 'delete', 'delete': 'delete', 'insert': 'insert',
+        'tab': 'tab', 'space': 'space', 'capslock': 'caps_lock', 'caps_lock': 'caps_lock',
+        'pageup': 'page_up', 'pgup': 'page_up', 'page_up': 'page_up',
+        'pagedown': 'page_down', 'pgdn': 'page_down', 'page_down': 'page_down',
+        'home': 'home', 'end': 'end', 'up': 'up', 'down': 'down', 'left': 'left', 'right': 'right',
+        'printscreen': 'print_screen', 'prtsc': 'print_screen', 'menu': 'menu',
+    }
+
+    def __init__(self):
+        self._mouse = None
+        self._keyboard = None
+
+    @property
+    def mouse(self):
+        if self._mouse is None: self._mouse = pynput_mouse.Controller()
+        return self._mouse
+
+    @property
+    def keyboard(self):
+        if self._keyboard is None: self._keyboard = pynput_keyboard.Controller()
+        return self._keyboard
+
+    def _key(self, name):
+        name = name.strip().lower()
+        if len(name) == 1: return name
+        attr = self.KEY_ALIASES.get(name, name)
+        key = getattr(pynput_keyboard.Key, attr, None)
+        if key is None: raise ValueError(f"未知按键: {name}")
+        return key
+
+    def _button(self, name):
+        return getattr(pynput_mouse.Button, {'primary': 'left', 'secondary': 'right'}.get(name, name))
+
+    def position(self):
+        x, y = self.mouse.position
+        return (int(x), int(y))
+
+    def move_to(self, x, y, duration=0.0):
+        self.mouse.position = (int(x), int(y))
+
+    def move_rel(self, dx, dy, duration=0.0):
+        self.mouse.move(int(dx), int(dy))
+
+    def click(self, x=None, y=None, button='left', clicks=1, interval=0.0, duration=0.0):
+        if x is not None and y is not None: self.move_to(x, y)
+        btn = self._button(button)
+        if interval > 0:
+            for i in range(clicks):
+                if i: time.sleep(interval)
+                self.mouse.click(btn, 1)
+        else:
+            self.mouse.click(btn, clicks)
+
+    def scroll(self, amount, x=None, y=None):
+        if x is not None and y is not None: self.move_to(x, y)
+        # 与 pyautogui 单位保持一致: Windows 下为滚轮原始增量 (120 = 一格)，其他平台为格数
+        dy = amount / 120.0 if sys.platform == 'win32' else amount
+        self.mouse.scroll(0, dy)
+
+    def hotkey(self, *keys):
+        pressed = []
+        try:
+            for k in keys:
+                key = self._key(k)
+                self.keyboard.press(key)
+                pressed.append(key)
+        finally:
+            for key in reversed(pressed):
+                self.keyboard.release(key)
+
+    def write(self, text, interval=0.0):
+        if interval > 0:
+            for ch in text:
+                self.keyboard.type(ch)
+                time.sleep(interval)
+        else:
+            self.keyboard.type(text)
+
+class RecordingBackend(InputBackend):
+    """
+    记录型桩后端：不产生真实输入，只把调用按顺序记录到 events，
+    并维护一个虚拟鼠标位置。用于测试与宏的"空跑"。
+    """
+    name = 'recording'
+
+    def __init__(self, start_pos=(0, 0)):
+        self.pos = tuple(start_pos)
+        self.events = []
+
+    def _record(self, *event):
+        self.events.append(event)
+
+    def position(self):
+        return self.pos
+
+    def move_to(self, x, y, duration=0.0):
+        self.pos = (int(x), int(y))
+        self._record('move_to', self.pos[0], self.pos[1], duration)
+
+    def move_rel(self, dx, dy, duration=0.0):
+        self.pos = (self.pos[0] + int(dx), self.pos[1] + int(dy))
+        self._record('move_rel', int(dx), int(dy), duration)
+
+    # 带坐标的点击/滚轮与真实后端一样先瞬移光标，事件序列与 "MOVE_TO + 原地点击" 一致
+    def click(self, x=None, y=None, button='left', clicks=1, interval=0.0, duration=0.0):
+        if x is not None and y is not None: self.move_to(x, y)
+        self._record('click', self.pos[0], self.pos[1], button, clicks)
+
+    def scroll(self, amount, x=None, y=None):
+        if x is not None and y is not None: self.move_to(x, y)
+        self._record('scroll', amount, self.pos[0], self.pos[1])
+
+    def hotkey(self, *keys):
+        self._record('hotkey', *keys)
+
+    def write(self, text, interval=0.0):
+        self._record('write', text, interval)
+
+    def type_unicode(self, text, chunk_size=32, chunk_delay=0.0, should_stop=None):
+        sent = 0
+        for chunk in _chunks(text, chunk_size):
+            if should_stop and should_stop(): break
+            self._record('type_unicode', chunk)
+            sent += len(chunk)
+        return sent
+
+    def clear(self):
+        self.events = []
+
+# ======================================================================
+# 文本注入 (TYPE_TEXT)
+# ======================================================================
+# method:
+#   auto      - 优先 Unicode 直接输入，失败时剩余部分回退到剪贴板
+#   unicode   - 仅直接输入 (Windows: SendInput + KEYEVENTF_UNICODE；其他平台: pynput)
+#   clipboard - 剪贴板粘贴，粘贴后恢复用户原有剪贴板内容
+TEXT_INPUT_METHODS = ('auto', 'unicode', 'clipboard')
+CLIPBOARD_RETRY = 3             # 写剪贴板失败重试次数 (剪贴板可能被其他程序占用)
+CLIPBOARD_RETRY_DELAY = 0.05    # 重试间隔 (秒)
+CLIPBOARD_RESTORE_DELAY = 0.15  # Ctrl+V 后等待目标程序读取剪贴板再恢复 (秒)
+
+class TextInjectionError(Exception):
+    """直接输入中途失败；sent 为失败前已成功发送的字符数"""
+    def __init__(self, message, sent=0):
+        super().__init__(message)
+        self.sent = sent
+
+def _chunks(text, size):
+    size = max(1, int(size))
+    for i in range(0, len(text), size):
+        yield text[i:i + size]
+
+_win_sender = None
+
+def _get_win_sender():
+    """构造 SendInput 调用 (仅 Windows，首次使用时定义 ctypes 结构)"""
+    global _win_sender
+    if _win_sender is not None: return _win_sender
+    import ctypes
+    from ctypes import wintypes
+
+    INPUT_KEYBOARD = 1
+    KEYEVENTF_KEYUP = 0x0002
+    KEYEVENTF_UNICODE = 0x0004
+    VK_RETURN = 0x0D
+    ULONG_PTR = ctypes.c_size_t
+
+    class KEYBDINPUT(ctypes.Structure):
+        _fields_ = [('wVk', wintypes.WORD), ('wScan', wintypes.WORD), ('dwFlags', wintypes.DWORD),
+                    ('time', wintypes.DWORD), ('dwExtraInfo', ULONG_PTR)]
+
+    class MOUSEINPUT(ctypes.Structure):
+        _fields_ = [('dx', wintypes.LONG), ('dy', wintypes.LONG), ('mouseData', wintypes.DWORD),
+                    ('dwFlags', wintypes.DWORD), ('time', wintypes.DWORD), ('dwExtraInfo', ULONG_PTR)]
+
+    class _UNION(ctypes.Union):
+        # 联合体大小必须与系统定义一致 (含 MOUSEINPUT)，否则 SendInput 返回 0
+        _fields_ = [('ki', KEYBDINPUT), ('mi', MOUSEINPUT)]
+
+    class INPUT(ctypes.Structure):
+        _fields_ = [('type', wintypes.DWORD), ('u', _UNION)]
+
+    send_input = ctypes.WinDLL('user32', use_last_error=True).SendInput
+    send_input.argtypes = (wintypes.UINT, ctypes.POINTER(INPUT), ctypes.c_int)
+    send_input.restype = wintypes.UINT
+
+    def key_events(ch):
+        if ch == '\r': return []
+        if ch == '\n':
+            return [(VK_RETURN, 0, 0), (VK_RETURN, 0, KEYEVENTF_KEYUP)]
+        # BMP 以外的字符 (如 emoji) 拆成 UTF-16 代理对逐个发送
+        data = ch.encode('utf-16-le')
+        events = []
+        for i in range(0, len(data), 2):
+            unit = int.from_bytes(data[i:i + 2], 'little')
+            events.append((0, unit, KEYEVENTF_UNICODE))
+            events.append((0, unit, KEYEVENTF_UNICODE | KEYEVENTF_KEYUP))
+        return events
+
+    def send(chunk):
+        events = [e for ch in chunk for e in key_events(ch)]
+        if not events: return
+        arr = (INPUT * len(events))()
+        for i, (vk, scan, flags) in enumerate(events):
+            arr[i].type = INPUT_KEYBOARD
+            arr[i].u.ki = KEYBDINPUT(vk, scan, flags, 0, 0)
+        if send_input(len(events), arr, ctypes.sizeof(INPUT)) != len(events):
+            raise OSError(ctypes.get_last_error() or "SendInput 被拦截 (目标程序权限更高?)")
+
+    _win_sender = send
+    return send
+
+def _send_unicode_text(text, chunk_size, chunk_delay, should_stop=None):
+    """分批发送；每批一次系统调用，批间检查停止请求"""
+    if sys.platform == 'win32':
+        send = _get_win_sender()
+    else:
+        controller = pynput_keyboard.Controller()
+        send = controller.type
+    sent = 0
+    for chunk in _chunks(text, chunk_size):
+        if should_stop and should_stop(): break
+        if sent and chunk_delay > 0: time.sleep(chunk_delay)
+        try:
+            send(chunk)
+        except Exception as e:
+            raise TextInjectionError(f"直接输入失败: {e}", sent) from e
+        sent += len(chunk)
+    return sent
+
+def paste_via_clipboard(inp, text, restore=True):
+    """
+    剪贴板粘贴。restore=True 时先保存用户剪贴板，粘贴完成后恢复。
+    返回是否成功写入剪贴板。
+    """
+    previous = None
+    if restore:
+        try:
+            previous = pyperclip.paste()
+        except Exception:
+            previous = None
+    copied = False
+    for _retry in range(CLIPBOARD_RETRY):
+        try:
+            pyperclip.copy(text)
+            copied = True
+            break
+        except Exception:
+            time.sleep(CLIPBOARD_RETRY_DELAY)
+    if not copied:
+        print("  [错误] 剪贴板被占用，无法写入")
+        return False
+    inp.hotkey('ctrl', 'v')
+    if previous is not None:
+        # 粘贴由目标程序异步读取剪贴板，过早恢复会粘出旧内容
+        time.sleep(CLIPBOARD_RESTORE_DELAY)
+        try:
+            pyperclip.copy(previous)
+        except Exception:
+            pass
+    return True
+
+def inject_text(inp, text, method='auto', interval=0.0, timing=None, should_stop=None):
+    """
+    TYPE_TEXT 的统一入口，返回实际使用的方式 ('unicode' / 'clipboard')；
+    回退到剪贴板但剪贴板始终被占用时返回 None (文本未输入)。
+    interval > 0 时逐字直接输入 (每字之间停顿 interval 秒)，同样支持中文。
+    """
+    timing = timing or resolve_timing_profile(None)
+    if method not in TEXT_INPUT_METHODS: method = 'auto'
+    if interval > 0:
+        chunk_size, chunk_delay = 1, interval
+    else:
+        chunk_size, chunk_delay = timing['text_chunk'], timing['text_chunk_delay']
+    
+    if method in ('auto', 'unicode') or interval > 0:
+        try:
+            inp.type_unicode(text, chunk_size, chunk_delay, should_stop)
+            return 'unicode'
+        except (TextInjectionError, ImportError, OSError) as e:
+            if method == 'unicode': raise
+            sent = getattr(e, 'sent', 0)
+            print(f"  [输入] {e}，剩余 {len(text) - sent} 字回退到剪贴板")
+            text = text[sent:]
+    return 'clipboard' if paste_via_clipboard(inp, text) else None
+
+def benchmark_text_entry(inp=None, length=200, repeats=3, methods=('legacy', 'clipboard', 'unicode'), timing=None):
+    """
+    文本输入吞吐量基准 (字符/秒)。会向当前焦点窗口真实输入，请先聚焦到空白文本框。
+    legacy 为旧版路径: 写剪贴板 + 固定 0.1s 等待 + Ctrl+V，且不恢复剪贴板。
+    """
+    inp = get_input_backend(inp)
+    timing = timing or resolve_timing_profile('turbo')
+    sample = ("宏助手Macro" * (length // 8 + 1))[:length]
+    results = {}
+    for method in methods:
+        best = None
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            if method == 'legacy':
+                pyperclip.copy(sample); time.sleep(0.1); inp.hotkey('ctrl', 'v')
+            else:
+                inject_text(inp, sample, method=method, timing=timing)
+            dt = time.perf_counter() - t0
+            best = dt if best is None else min(best, dt)
+            inp.hotkey('enter')
+        results[method] = length / best if best else float('inf')
+        print(f"[基准] {method:<9} {results[method]:10.0f} 字/秒  (最佳 {best*1000:.1f} ms / {length} 字)")
+    return results
+
+# ======================================================================
+# 后端工厂
+# ======================================================================
+BACKENDS = {
+    'pyautogui': PyAutoGUIBackend,
+    'turbo': TurboBackend,
+    'recording': RecordingBackend,
+}
+_instances = {}
+
+def get_input_backend(backend=None):
+    """接受后端实例或名称；同名后端共享一个实例 (recording 每次新建)"""
+    if isinstance(backend, InputBackend): return backend
+    name = backend or 'pyautogui'
+    if name not in BACKENDS: raise ValueError(f"未知输入后端: {name}")
+    if name == 'recording': return RecordingBackend()
+    if name not in _instances: _instances[name] = BACKENDS[name]()
+    return _instances[name]
+
+if __name__ == "__main__":
+    # python input_backend.py [pyautogui|turbo]  -- 3 秒内切换到一个空白文本框
+    print("[基准] 3 秒后开始输入，请聚焦到空白文本框...")
+    time.sleep(3)
+    benchmark_text_entry(sys.argv[1] if len(sys.argv) > 1 else 'turbo')
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+# lazy_loader.py
+# 描述: 延迟导入、引擎探测缓存与启动耗时诊断
+# 版本: 1.0.0
+
+import builtins
+import importlib
+import importlib.util
+import json
+import sys
+import threading
+import time
+
+# ======================================================================
+# 全局配置
+# ======================================================================
+PROBE_CACHE_FILE = "probe_cache.json"  # 与 macro_settings.json 同目录
+PROBE_CACHE_TTL = 7 * 24 * 3600        # 探测结果最长有效期（秒）
+STARTUP_REPORT_TOP = 25                # 启动报告中列出的模块数量
+
+_T0 = time.perf_counter()
+
+# ======================================================================
+# 延迟导入
+# ======================================================================
+_LOAD_HOOKS = {}
+_LOAD_LOCK = threading.RLock()
+
+def is_available(name):
+    """只查找模块规格，不执行导入（开销为一次文件系统查找）"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+def when_imported(name, hook):
+    """注册模块首次通过 LazyModule 加载后的回调；若已加载则立即调用"""
+    with _LOAD_LOCK:
+        if name in sys.modules:
+            hook(sys.modules[name])
+        else:
+            _LOAD_HOOKS.setdefault(name, []).append(hook)
+
+class LazyModule:
+    """
+    模块代理：首次访问属性时才真正导入，导入耗时计入启动报告。
+
+    用法:
+        cv2 = LazyModule('cv2')
+        cv2.imread(...)   # 此时才 import cv2
+    """
+    def __init__(self, name):
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_module', None)
+
+    def _load(self):
+        module = object.__getattribute__(self, '_module')
+        if module is not None: return module
+        name = object.__getattribute__(self, '_name')
+        first = name not in sys.modules
+        t0 = time.perf_counter()
+        module = importlib.import_module(name)
+        if first:
+            _record_lazy_import(name, time.perf_counter() - t0)
+        with _LOAD_LOCK:
+            hooks = _LOAD_HOOKS.pop(name, [])
+        for hook in hooks:
+            hook(module)
+        object.__setattr__(self, '_module', module)
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        state = "已加载" if object.__getattribute__(self, '_module') else "未加载"
+        return f"<LazyModule {object.__getattribute__(self, '_name')} ({state})>"
+
+# ======================================================================
+# 探测结果磁盘缓存
+# ======================================================================
+class ProbeCache:
+    """
+    引擎可用性探测结果的磁盘缓存。
+
+    每条记录保存探测值和"指纹"(如 PATH、候选路径的修改时间)。
+    读取时指纹不一致或超过 PROBE_CACHE_TTL 即视为失效，需要重新探测。
+    """
+    def __init__(self, path=PROBE_CACHE_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.data = None
+
+    def _ensure_loaded(self):
+        if self.data is not None: return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.data = json.load(f)
+            if not isinstance(self.data, dict): self.data = {}
+        except (OSError, ValueError):
+            self.data = {}
+
+    def get(self, key, fingerprint):
+        """返回 (命中, 值)"""
+        with self.lock:
+            self._ensure_loaded()
+            entry = self.data.get(key)
+        if not isinstance(entry, dict): return False, None
+        if entry.get('fingerprint') != fingerprint: return False, None
+        if time.time() - entry.get('time', 0) > PROBE_CACHE_TTL: return False, None
+        return True, entry.get('value')
+
+    def set(self, key, fingerprint, value):
+        with self.lock:
+            self._ensure_loaded()
+            self.data[key] = {'fingerprint': fingerprint, 'value': value, 'time': time.time()}
+            try:
+                with open(self.path, 'w', encoding='utf-8') as f:
+                    json.dump(self.data, f, indent=2, ensure_ascii=False)
+            except OSError as e:
+                print(f"[探测缓存] 写入失败: {e}")
+
+    def invalidate(self, key=None):
+        with self.lock:
+            self._ensure_loaded()
+            if key is None: self.data.clear()
+            else: self.data.pop(key, None)
+
+probe_cache = ProbeCache()
+
+# ======================================================================
+# 启动耗时诊断 (-X importtime 风格)
+# ======================================================================
+_phases = []          # [(阶段名, 距进程启动的秒数)]
+_import_records = []  # [(模块名, 自身耗时, 累计耗时, 嵌套层级)]
+_lazy_records = []    # [(模块名, 耗时, 距启动的秒数)]
+_tls = threading.local()
+_original_import = None
+
+def mark(phase):
+    """记录一个启动阶段的时间点"""
+    _phases.append((phase, time.perf_counter() - _T0))
+
+def _record_lazy_import(name, dt):
+    _lazy_records.append((name, dt, time.perf_counter() - _T0))
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    # 已加载或相对导入直接放行，耗时计入外层模块
+    if level or name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+    stack = getattr(_tls, 'stack', None)
+    if stack is None: stack = _tls.stack = []
+    stack.append(0.0)
+    t0 = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        total = time.perf_counter() - t0
+        children = stack.pop()
+        if stack: stack[-1] += total
+        _import_records.append((name, total - children, total, len(stack)))
+
+def install_import_timer():
+    """
+    替换 builtins.__import__ 以记录每个模块的自身/累计导入耗时。
+    需在导入其他模块之前调用（由 --startup-report 启用）。
+    """
+    global _original_import
+    if _original_import is not None: return
+    _original_import = builtins.__import__
+    builtins.__import__ = _timed_import
+
+def uninstall_import_timer():
+    global _original_import
+    if _original_import is None: return
+    builtins.__import__ = _original_import
+    _original_import = None
+
+def format_startup_report():
+    lines = ["=== 启动耗时诊断 ==="]
+    if _phases:
+        lines.append("[阶段]")
+        prev = 0.0
+        for phase, t in _phases:
+            lines.append(f"  {t*1000:8.1f} ms  (+{(t-prev)*1000:7.1f})  {phase}")
+            prev = t
+    if _import_records:
+        lines.append(f"[模块导入] 自身(us) | 累计(us) | 模块 (前 {STARTUP_REPORT_TOP} 项)")
+        top = sorted(_import_records, key=lambda r: r[2], reverse=True)[:STARTUP_REPORT_TOP]
+        for name, self_t, total, depth in top:
+            lines.append(f"  {self_t*1e6:10.0f} | {total*1e6:10.0f} | {'  '*depth}{name}")
+    elif not _lazy_records:
+        lines.append("(未记录模块导入，使用 --startup-report 启动以获得完整明细)")
+    if _lazy_records:
+        lines.append("[延迟导入] 首次使用时加载")
+        for name, dt, at in _lazy_records:
+            lines.append(f"  {dt*1000:8.1f} ms  @ {at:7.2f}s  {name}")
+    return "\n".join(lines)
@@ -0,0 +1,999 @@
+# -*- coding: utf-8 -*-
+# match_engine.py
+# 描述: 模板匹配加速内核 (跨帧增量匹配、颜色预过滤、像素级精确匹配、FFT 相关、特征点匹配、模板裁剪等)
+# 版本: 1.4.0
+
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from lazy_loader import LazyModule
+
+cv2 = LazyModule('cv2')
+np = LazyModule('numpy')
+
+# ======================================================================
+# 全局配置
+# ======================================================================
+TEMPLATE_CROP_SUFFIX = ".crop.json"  # 模板优化器写入的裁剪信息: <模板路径>.crop.json (见 template_optimizer)
+MATCH_TILE = 64                    # 变化检测与得分图分块大小 (像素)
+INCREMENTAL_MIN_PIXELS = 1_000_000 # 小于此像素数的画面直接全量匹配 (本身已足够快)
+INCREMENTAL_FULL_RATIO = 0.4       # 脏块比例超过此值时退化为全量匹配
+INCREMENTAL_BUDGET_MB = 1024       # 模板状态得分图总内存上限 (每个模板×缩放一份: 1080p 约 8MB，4K 约 33MB)
+PREFILTER_DOWNSAMPLE = 4           # 颜色签名在 1/4 分辨率上计算
+PREFILTER_GRID = 3                 # 模板签名划分为 GRID×GRID 个格子
+PREFILTER_TOLERANCE = 40           # 每格平均颜色允许的最大通道差 (0-255)
+PREFILTER_MIN_CELLS = 6            # 模板缩小后短边不足此格数时不做预过滤
+PREFILTER_MAX_COVER = 0.5          # 候选区域超过搜索面积此比例时直接全量匹配
+EXACT_PROMOTE_SCORE = 0.99         # scale 1.0 得分达到此值且逐像素核对通过的模板改走精确匹配
+EXACT_TOLERANCE = 0                # 精确匹配逐像素允许的最大灰度差 (0 = 字节完全一致)
+EXACT_MAX_CANDIDATES = 4096        # 候选位置过多 (锚点行在画面中大量出现) 时放弃，交回 matchTemplate
+EXACT_SAMPLE_POINTS = 12           # 带容差搜索时逐步筛选候选所用的采样点数
+FFT_SPECTRA_BUDGET_MB = 256        # 模板频谱缓存上限 (1080p 下每个约 8MB，4K 约 33MB)
+FFT_EPSILON = 1e-3                 # 窗口/模板能量低于此值视为平坦区域，得分记 0
+FEATURE_DETECTOR = 'orb'           # 特征点算法: 'orb' / 'akaze' (均为 OpenCV 自带的二进制描述子)
+FEATURE_CACHE_DIR = "feature_cache"  # 模板描述子磁盘缓存目录 (与 macro_settings.json 同目录)
+FEATURE_TEMPLATE_POINTS = 500      # 模板最多提取的特征点数
+FEATURE_SCREEN_POINTS = 10000      # 画面最多提取的特征点数 (过少时小目标的特征点会被挤掉)
+FEATURE_RATIO = 0.75               # Lowe 比值检验阈值
+FEATURE_MIN_MATCHES = 8            # 通过比值检验的匹配数 (及 RANSAC 内点数) 下限
+FEATURE_RANSAC_THRESHOLD = 5.0     # 单应性 RANSAC 重投影误差阈值 (像素)
+FEATURE_SCALE_RANGE = (0.25, 4.0)  # 单应性对应的缩放比例合理范围
+
+# ======================================================================
+# 模板读取 (裁剪)
+# ======================================================================
+@functools.lru_cache(maxsize=512)
+def template_crop(path):
+    """
+    模板优化器保存的裁剪信息 (x0, y0, x1, y1, 原宽, 原高)。
+    没有裁剪文件、文件损坏或模板在裁剪后被修改 (mtime/大小不符) 时返回 None。
+    """
+    try:
+        with open(path + TEMPLATE_CROP_SUFFIX, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        st = os.stat(path)
+        if meta.get('mtime_ns') != st.st_mtime_ns or meta.get('size') != st.st_size: return None
+        x0, y0, x1, y1 = (int(v) for v in meta['box'])
+        W, H = (int(v) for v in meta['template_size'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    if not (0 <= x0 < x1 <= W and 0 <= y0 < y1 <= H): return None
+    return x0, y0, x1, y1, W, H
+
+def read_template(path, flags=None, cropped=True):
+    """读取模板图像 (默认 IMREAD_COLOR)；有裁剪信息时只返回裁剪块"""
+    img = cv2.imread(path, cv2.IMREAD_COLOR if flags is None else flags)
+    if img is None or not cropped: return img
+    crop = template_crop(path)
+    if crop and img.shape[:2] == (crop[5], crop[4]):
+        img = img[crop[1]:crop[3], crop[0]:crop[2]].copy()
+    return img
+
+# ======================================================================
+# 跨帧增量匹配
+# ======================================================================
+class _MatchState:
+    """单个 (模板, 缩放, 画面几何) 的上一帧状态"""
+    __slots__ = ('frame', 'res', 'tile_max')
+
+    def __init__(self, frame, res, tile_max):
+        self.frame = frame        # 上一帧灰度图
+        self.res = res            # 上一帧完整得分图 (TM_CCOEFF_NORMED)
+        self.tile_max = tile_max  # 得分图每块的最大值
+
+def _tile_grid(h, w, tile):
+    return -(-h // tile), -(-w // tile)
+
+def _block_max(arr, tile, fill):
+    """按 tile 分块求最大值 (边缘不足一块的部分以 fill 补齐)"""
+    h, w = arr.shape
+    ny, nx = _tile_grid(h, w, tile)
+    if h != ny * tile or w != nx * tile:
+        arr = cv2.copyMakeBorder(arr, 0, ny * tile - h, 0, nx * tile - w, cv2.BORDER_CONSTANT, value=fill)
+    # 先沿连续的行方向归约，再沿列方向，避免跨步访问整张图
+    return arr.reshape(ny * tile, nx, tile).max(axis=2).reshape(ny, tile, nx).max(axis=1)
+
+def dirty_tile_mask(prev, cur, tile=MATCH_TILE):
+    """返回 (ny, nx) 布尔数组：块内任一像素变化即为脏块"""
+    return _block_max(cv2.absdiff(prev, cur), tile, 0) > 0
+
+class IncrementalMatcher:
+    """
+    跨帧增量模板匹配。
+
+    为每个模板保留上一帧的灰度图、完整得分图和分块最大值。新帧到来时:
+      1. 逐块比较两帧，得到脏块掩码
+      2. 把相连的脏块合并为矩形，按模板尺寸向左上扩展 (得分图中受影响的位置)
+      3. 只在这些矩形里重新 matchTemplate，写回得分图并刷新对应块的最大值
+      4. 最大值在分块最大值上查找，只对最优块做一次 minMaxLoc
+    未变化区域沿用上一帧得分；脏区域在子图上重算，与全量计算只差 float32 舍入误差
+    (基准测试按 1e-4 容差校验)，最佳位置与 cv2.matchTemplate 一致。
+
+    状态按得分图内存做 LRU 淘汰，而不是按个数：每个模板在 SCALES 的每个缩放下各占一份，
+    按个数限制时几个模板就会互相挤掉，增量匹配退化为全量。
+    """
+    def __init__(self, budget_mb=INCREMENTAL_BUDGET_MB, tile=MATCH_TILE):
+        self.tile = tile
+        self.budget = budget_mb * 1024 * 1024
+        self.states = OrderedDict()
+        self.nbytes = 0
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {'full': 0, 'incremental': 0, 'reused': 0, 'dirty_tiles': 0, 'total_tiles': 0}
+
+    def clear(self):
+        with self.lock:
+            self.states.clear()
+            self.nbytes = 0
+
+    def match(self, key, frame, tmpl):
+        """
+        key: 模板状态键 (如 (path, scale, offset))；frame/tmpl 为灰度 uint8 数组。
+        返回 (最大得分, (x, y))。
+        """
+        if frame.size < INCREMENTAL_MIN_PIXELS:
+            return self._full(frame, tmpl)[:2]
+        key = (key, frame.shape, tmpl.shape)
+        with self.lock:
+            state = self.states.get(key)
+            if state is not None:
+                self.states.move_to_end(key)
+                if state.frame is not frame:
+                    self._update(state, frame, tmpl)
+            else:
+                _v, _l, res = self._full(frame, tmpl)
+                state = _MatchState(frame, res, _block_max(res, self.tile, -2.0))
+                self.states[key] = state
+                self.nbytes += res.nbytes
+                # 画面帧为各状态共用，只计得分图
+                while self.nbytes > self.budget and len(self.states) > 1:
+                    _k, old = self.states.popitem(last=False)
+                    self.nbytes -= old.res.nbytes
+            return self._best(state)
+
+    def _full(self, frame, tmpl):
+        self.stats['full'] += 1
+        res = cv2.matchTemplate(frame, tmpl, cv2.TM_CCOEFF_NORMED)
+        _mn, max_v, _ml, max_l = cv2.minMaxLoc(res)
+        return max_v, max_l, res
+
+    def _update(self, state, frame, tmpl):
+        th, tw = tmpl.shape[:2]
+        T = self.tile
+        mask = dirty_tile_mask(state.frame, frame, T)
+        dirty = int(mask.sum())
+        self.stats['dirty_tiles'] += dirty; self.stats['total_tiles'] += mask.size
+        state.frame = frame
+        if dirty == 0:
+            self.stats['reused'] += 1
+            return
+        if dirty > mask.size * INCREMENTAL_FULL_RATIO:
+            _v, _l, state.res = self._full(frame, tmpl)
+            state.tile_max = _block_max(state.res, T, -2.0)
+            return
+        self.stats['incremental'] += 1
+        rh, rw = state.res.shape
+        n, _labels, boxes, _c = cv2.connectedComponentsWithStats(mask.astype(np.uint8), connectivity=8)
+        for bx, by, bw, bh, _area in boxes[1:n]:
+            # 脏像素范围 [x0, x1) × [y0, y1)
+            x0, y0 = bx * T, by * T
+            x1, y1 = min((bx + bw) * T, frame.shape[1]), min((by + bh) * T, frame.shape[0])
+            # 窗口与脏区域重叠的得分位置: u ∈ [x0 - tw + 1, x1)
+            u0, v0 = max(0, x0 - tw + 1), max(0, y0 - th + 1)
+            u1, v1 = min(rw, x1), min(rh, y1)
+            if u1 <= u0 or v1 <= v0: continue
+            sub = frame[v0:v1 + th - 1, u0:u1 + tw - 1]
+            state.res[v0:v1, u0:u1] = cv2.matchTemplate(sub, tmpl, cv2.TM_CCOEFF_NORMED)
+            # 刷新受影响得分块的最大值 (按块边界对齐)
+            ty0, tx0 = v0 // T, u0 // T
+            ty1, tx1 = -(-v1 // T), -(-u1 // T)
+            state.tile_max[ty0:ty1, tx0:tx1] = _block_max(
+                state.res[ty0 * T:ty1 * T, tx0 * T:tx1 * T], T, -2.0)
+
+    def _best(self, state):
+        T = self.tile
+        ty, tx = np.unravel_index(int(np.argmax(state.tile_max)), state.tile_max.shape)
+        block = state.res[ty * T:(ty + 1) * T, tx * T:(tx + 1) * T]
+        _mn, max_v, _ml, (bx, by) = cv2.minMaxLoc(block)
+        return max_v, (int(tx * T + bx), int(ty * T + by))
+
+    def get_stats(self):
+        s = self.stats
+        ratio = (s['dirty_tiles'] / s['total_tiles'] * 100) if s['total_tiles'] else 0
+        return f"全量{s['full']} | 增量{s['incremental']} | 复用{s['reused']} | 平均脏块{ratio:.1f}%"
+
+incremental_matcher = IncrementalMatcher()
+
+# ======================================================================
+# 颜色签名预过滤
+# ======================================================================
+# 灰度 TM_CCOEFF_NORMED 对亮度/对比度变化不敏感，而颜色均值不是，
+# 因此容差取得较宽，只用来排除颜色明显不符的区域 (误拒率见 benchmark_color_prefilter)。
+class _FrameColorStats:
+    """一帧的降采样颜色积分图；同一帧上的所有模板/缩放共用"""
+    __slots__ = ('integral', 'shape', 'd')
+
+    def __init__(self, rgb, d):
+        h, w = rgb.shape[:2]
+        small = cv2.resize(rgb, (max(1, w // d), max(1, h // d)), interpolation=cv2.INTER_AREA)
+        self.integral = cv2.integral(small, sdepth=cv2.CV_32F)   # (h+1, w+1, 3)
+        self.shape = small.shape[:2]
+        self.d = d
+
+    def box_means(self, y0, x0, bh, bw, ny, nx):
+        """以 (y0, x0) 为左上角、ny×nx 个起点的 bh×bw 窗口颜色均值，形状 (ny, nx, 3)"""
+        S = self.integral
+        total = (S[y0 + bh:y0 + bh + ny, x0 + bw:x0 + bw + nx] - S[y0:y0 + ny, x0 + bw:x0 + bw + nx]
+                 - S[y0 + bh:y0 + bh + ny, x0:x0 + nx] + S[y0:y0 + ny, x0:x0 + nx])
+        return total / float(bh * bw)
+
+@functools.lru_cache(maxsize=256)
+def _template_signature(path, scale, d, grid=PREFILTER_GRID):
+    """模板 (缩放后) 的 grid×grid 格平均颜色 (RGB)，以及降采样后每格的尺寸"""
+    img = read_template(path)
+    if img is None: return None
+    if scale != 1.0:
+        h, w = img.shape[:2]
+        img = cv2.resize(img, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    h, w = img.shape[:2]
+    if h // d < PREFILTER_MIN_CELLS or w // d < PREFILTER_MIN_CELLS: return None
+    ch, cw = (h // d) // grid, (w // d) // grid   # 降采样后每格的格数
+    cells = np.array([[img[gy * ch * d:(gy + 1) * ch * d, gx * cw * d:(gx + 1) * cw * d].reshape(-1, 3).mean(axis=0)
+                       for gx in range(grid)] for gy in range(grid)], dtype=np.float32)
+    return cells, ch, cw
+
+class ColorPrefilter:
+    """
+    匹配前的廉价拒绝阶段。
+
+    模板签名 = GRID×GRID 个格子的平均颜色。画面在 1/PREFILTER_DOWNSAMPLE 分辨率上做积分图，
+    任意位置的格均值都是 O(1) 查表，一次向量运算得到全部候选位置。
+    只有每个格子的每个通道都在容差内的位置才可能命中:
+      - 没有候选位置: 直接判定未找到，跳过 matchTemplate
+      - 候选集中在少数区域: 只在这些区域 (外扩一格) 内做 matchTemplate
+      - 候选过多: 返回 None，由调用方全量匹配
+    """
+    def __init__(self, d=PREFILTER_DOWNSAMPLE, tolerance=PREFILTER_TOLERANCE):
+        self.d = d
+        self.tolerance = tolerance
+        self._slot = (None, None)   # (截图对象, _FrameColorStats)
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {'checks': 0, 'rejected': 0, 'narrowed': 0, 'time': 0.0}
+
+    def frame_stats(self, screenshot_pil):
+        cached, fs = self._slot
+        if cached is screenshot_pil: return fs
+        if hasattr(screenshot_pil, 'shape'):
+            rgb = screenshot_pil   # 截图层直接产出的 RGB 数组 (见 capture_engine)
+        else:
+            rgb = np.asarray(screenshot_pil if screenshot_pil.mode == 'RGB' else screenshot_pil.convert('RGB'))
+        fs = _FrameColorStats(rgb, self.d)
+        self._slot = (screenshot_pil, fs)
+        return fs
+
+    def candidates(self, path, scale, screenshot_pil, tmpl_shape):
+        """
+        返回候选区域列表 [(x0, y0, x1, y1)] (原分辨率，已包含模板尺寸)，
+        [] 表示可直接判定未命中，None 表示无法过滤 (模板太小等)。
+        """
+        sig = _template_signature(path, scale, self.d)
+        if sig is None: return None
+        t0 = time.perf_counter()
+        cells, ch, cw = sig
+        grid = cells.shape[0]
+        fs = self.frame_stats(screenshot_pil)
+        H, W = fs.shape
+        ny, nx = H - grid * ch + 1, W - grid * cw + 1
+        if ny <= 0 or nx <= 0: return None
+        # 一次积分图查表得到每个位置起始的单格均值，各格只是它的平移切片
+        means = fs.box_means(0, 0, ch, cw, H - ch + 1, W - cw + 1)
+        # 拆成连续的单通道平面，逐格比较交给 cv2 (numpy 沿长度为 3 的轴归约很慢)
+        planes = cv2.split(means)
+        ok = None
+        for gy in range(grid):
+            for gx in range(grid):
+                worst = None
+                for c in range(3):
+                    diff = cv2.absdiff(planes[c][gy * ch:gy * ch + ny, gx * cw:gx * cw + nx], float(cells[gy, gx, c]))
+                    worst = diff if worst is None else cv2.max(worst, diff)
+                cell_ok = worst <= self.tolerance
+                ok = cell_ok if ok is None else (ok & cell_ok)
+            if not ok.any(): break
+        self.stats['checks'] += 1
+        self.stats['time'] += time.perf_counter() - t0
+        if not ok.any():
+            self.stats['rejected'] += 1
+            return []
+        if ok.mean() > PREFILTER_MAX_COVER: return None
+        # 候选格外扩一格 (抵消降采样的位置量化)，合并成矩形
+        ok = cv2.dilate(ok.astype(np.uint8), np.ones((3, 3), np.uint8))
+        n, _labels, boxes, _c = cv2.connectedComponentsWithStats(ok, connectivity=8)
+        th, tw = tmpl_shape[:2]
+        d = self.d
+        out = []
+        for bx, by, bw, bh, _area in boxes[1:n]:
+            out.append((bx * d, by * d, (bx + bw) * d + tw + d, (by + bh) * d + th + d))
+        self.stats['narrowed'] += 1
+        return out
+
+    def get_stats(self):
+        s = self.stats
+        if not s['checks']: return "(无记录)"
+        return f"(检查{s['checks']} | 直接拒绝{s['rejected']} | 缩小范围{s['narrowed']} | 耗时{s['time']*1000:.0f}ms)"
+
+color_prefilter = ColorPrefilter()
+
+def match_in_boxes(frame, tmpl, boxes):
+    """只在候选矩形内做 matchTemplate，返回 (最大得分, (x, y))；矩形会裁剪到画面内"""
+    th, tw = tmpl.shape[:2]
+    H, W = frame.shape[:2]
+    best_v, best_l = -1.0, None
+    for x0, y0, x1, y1 in boxes:
+        x0, y0 = max(0, x0), max(0, y0)
+        x1, y1 = min(W, x1), min(H, y1)
+        if x1 - x0 < tw or y1 - y0 < th: continue
+        res = cv2.matchTemplate(frame[y0:y1, x0:x1], tmpl, cv2.TM_CCOEFF_NORMED)
+        _mn, max_v, _ml, (lx, ly) = cv2.minMaxLoc(res)
+        if max_v > best_v: best_v, best_l = max_v, (int(x0 + lx), int(y0 + ly))
+    return best_v, best_l
+
+# ======================================================================
+# 像素级精确匹配
+# ======================================================================
+@functools.lru_cache(maxsize=256)
+def _template_gray(path, cropped=True):
+    """
+    与屏幕灰度一致的模板灰度图。必须经 cvtColor 转换: IMREAD_GRAYSCALE 的解码内转换
+    与 cvtColor 存在 ±1 的舍入差，会让逐字节比较全部落空。
+    """
+    img = read_template(path, cropped=cropped)
+    return None if img is None else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+@functools.lru_cache(maxsize=256)
+def _exact_template(path):
+    """精确匹配用的灰度模板、锚点行与采样点。纯色模板 (没有可区分的行) 返回 None"""
+    gray = _template_gray(path)
+    if gray is None: return None
+    # 锚点行: 相邻像素变化最多的一行，在画面中出现的次数最少
+    changes = (np.diff(gray.astype(np.int16), axis=1) != 0).sum(axis=1)
+    row = int(changes.argmax())
+    if changes[row] == 0: return None
+    # 采样点: 偏离模板中位灰度最远的像素，筛选候选最快
+    dev = np.abs(gray.astype(np.int16) - int(np.median(gray))).ravel()
+    order = np.argsort(-dev, kind='stable')[:EXACT_SAMPLE_POINTS]
+    points = [divmod(int(i), gray.shape[1]) for i in order]
+    return gray, row, gray[row].tobytes(), points
+
+class ExactMatcher:
+    """
+    同机 100% 缩放截取、在屏幕上逐像素一致的模板的快速路径。
+
+    模板在 scale 1.0 下以接近 1.0 的得分命中，且命中窗口逐像素核对一致后被"提升"，
+    之后的查找先走精确搜索，不再做五个缩放比例的归一化相关:
+      - 容差为 0: 在整帧灰度字节中查找锚点行 (bytes.find，近线性)，命中处整块比较
+      - 容差 > 0: 用采样点逐步筛选候选位置，最后整块核对最大差值
+    精确搜索未命中或候选过多时由调用方回退到 matchTemplate；
+    回退命中但不再逐像素一致 (缩放/主题变化) 时撤销提升。
+    """
+    def __init__(self, tolerance=EXACT_TOLERANCE):
+        self.tolerance = tolerance
+        self.promoted = set()         # 已提升的模板路径
+        self._slot = (None, None)     # (灰度帧, 帧字节)：同一帧上的多次查找只复制一次
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {'searches': 0, 'hits': 0, 'fallbacks': 0, 'promoted': 0, 'demoted': 0, 'time': 0.0}
+
+    def clear(self):
+        self.promoted.clear()
+        self._slot = (None, None)
+
+    def is_promoted(self, path):
+        return path in self.promoted
+
+    def _within(self, frame, tmpl, x, y):
+        th, tw = tmpl.shape
+        win = frame[y:y + th, x:x + tw]
+        if win.shape != tmpl.shape: return False
+        if self.tolerance <= 0: return np.array_equal(win, tmpl)
+        return int(cv2.absdiff(win, tmpl).max()) <= self.tolerance
+
+    def observe(self, path, frame, loc, scale, score):
+        """根据一次常规匹配的命中结果提升或撤销模板"""
+        info = _exact_template(path)
+        exact = (info is not None and scale == 1.0 and score >= EXACT_PROMOTE_SCORE
+                 and self._within(frame, info[0], loc[0], loc[1]))
+        if exact and path not in self.promoted:
+            self.promoted.add(path)
+            self.stats['promoted'] += 1
+        elif not exact and path in self.promoted:
+            self.promoted.discard(path)
+            self.stats['demoted'] += 1
+
+    def _frame_bytes(self, frame):
+        cached, buf = self._slot
+        if cached is frame: return buf
+        buf = np.ascontiguousarray(frame).tobytes()
+        self._slot = (frame, buf)
+        return buf
+
+    def _search_bytes(self, frame, tmpl, row, row_bytes):
+        H, W = frame.shape
+        th, tw = tmpl.shape
+        buf = self._frame_bytes(frame)
+        start, end = row * W, (H - th + row + 1) * W
+        n = 0
+        pos = buf.find(row_bytes, start, end)
+        while pos >= 0:
+            y, x = divmod(pos, W)
+            if x + tw <= W:   # 跨行拼接出来的假命中直接跳过
+                n += 1
+                if n > EXACT_MAX_CANDIDATES: return None
+                y -= row
+                if np.array_equal(frame[y:y + th, x:x + tw], tmpl): return (x, y)
+            pos = buf.find(row_bytes, pos + 1, end)
+        return None
+
+    def _search_tolerant(self, frame, tmpl, points):
+        H, W = frame.shape
+        th, tw = tmpl.shape
+        tol = self.tolerance
+        ny, nx = H - th + 1, W - tw + 1
+        py, px = points[0]
+        v = int(tmpl[py, px])
+        ys, xs = np.nonzero(cv2.inRange(frame[py:py + ny, px:px + nx], max(0, v - tol), min(255, v + tol)))
+        for py, px in points[1:]:
+            if not len(ys): return None
+            keep = np.abs(frame[ys + py, xs + px].astype(np.int16) - int(tmpl[py, px])) <= tol
+            ys, xs = ys[keep], xs[keep]
+        if len(ys) > EXACT_MAX_CANDIDATES: return None
+        for y, x in zip(ys.tolist(), xs.tolist()):
+            if self._within(frame, tmpl, x, y): return (x, y)
+        return None
+
+    def find(self, path, frame):
+        """
+        在灰度帧中精确查找已提升的模板。
+        返回 ((x, y), 得分, (w, h))；未找到或无法判定时返回 None，由调用方回退。
+        """
+        info = _exact_template(path)
+        if info is None: return None
+        tmpl, row, row_bytes, points = info
+        th, tw = tmpl.shape
+        if th > frame.shape[0] or tw > frame.shape[1]: return None
+        t0 = time.perf_counter()
+        if self.tolerance <= 0:
+            loc = self._search_bytes(frame, tmpl, row, row_bytes)
+        else:
+            loc = self._search_tolerant(frame, tmpl, points)
+        self.stats['searches'] += 1
+        self.stats['time'] += time.perf_counter() - t0
+        if loc is None:
+            self.stats['fallbacks'] += 1
+            return None
+        self.stats['hits'] += 1
+        if self.tolerance <= 0: return loc, 1.0, (tw, th)
+        x, y = loc
+        score = float(cv2.matchTemplate(frame[y:y + th, x:x + tw], tmpl, cv2.TM_CCOEFF_NORMED)[0, 0])
+        return loc, score, (tw, th)
+
+    def get_stats(self):
+        s = self.stats
+        if not s['searches'] and not s['promoted']: return "(无记录)"
+        return (f"(精确搜索{s['searches']} | 命中{s['hits']} | 回退{s['fallbacks']} | "
+                f"提升{s['promoted']} | 撤销{s['demoted']} | 耗时{s['time']*1000:.0f}ms)")
+
+exact_matcher = ExactMatcher()
+
+# ======================================================================
+# FFT 相关匹配
+# ======================================================================
+# TM_CCOEFF_NORMED:  R = Σ T'·I / sqrt(Σ T'² · Σ_win (I - mean_win)²)，T' = T - mean(T)。
+# 因 Σ T' = 0，分子就是画面与去均值模板的互相关，可在频域用一次乘法 + 逆变换得到；
+# 分母的窗口能量由整帧积分图 O(1) 查表。画面频谱与积分图每帧只算一次，
+# 所有模板/缩放共用；模板频谱按 (模板, 缩放, 频谱尺寸) 缓存。
+class _FrameSpectrum:
+    """一帧的频谱，以及计算窗口能量用的去均值画面"""
+    __slots__ = ('spec', 'dft_shape', 'centered', 'energy')
+
+    def __init__(self, gray):
+        h, w = gray.shape
+        self.dft_shape = (cv2.getOptimalDFTSize(h), cv2.getOptimalDFTSize(w))
+        # 先减去全局均值，降低 float32 频谱与窗口平方和的动态范围 (对去均值模板的相关结果无影响)
+        f = gray.astype(np.float32)
+        f -= float(f.mean())
+        self.centered = f
+        pad = cv2.copyMakeBorder(f, 0, self.dft_shape[0] - h, 0, self.dft_shape[1] - w, cv2.BORDER_CONSTANT, value=0)
+        self.spec = cv2.dft(pad, nonzeroRows=h)
+        self.energy = {}   # (th, tw) -> 窗口能量；同尺寸模板共用
+
+    def window_energy(self, th, tw):
+        """每个窗口位置的 Σ (I - mean_win)²，形状 (h - th + 1, w - tw + 1)"""
+        e = self.energy.get((th, tw))
+        if e is not None: return e
+        f = self.centered
+        ny, nx = f.shape[0] - th + 1, f.shape[1] - tw + 1
+        # 行列方向的滑动和 (内部以 double 累加)，锚点取左上角，只保留完整落在画面内的位置
+        s = cv2.boxFilter(f, cv2.CV_32F, (tw, th), anchor=(0, 0), normalize=False)[:ny, :nx]
+        q = cv2.sqrBoxFilter(f, cv2.CV_32F, (tw, th), anchor=(0, 0), normalize=False)[:ny, :nx]
+        e = q - s * s * (1.0 / (th * tw))
+        self.energy[(th, tw)] = e
+        return e
+
+class FFTMatcher:
+    """
+    频域归一化相关匹配，结果与 cv2.matchTemplate(TM_CCOEFF_NORMED) 一致 (float32 误差内)。
+    同一帧上查找多个模板/缩放时，画面侧的正变换与积分图只做一次；
+    每个模板只剩一次频谱乘法和一次逆变换，对大模板明显快于 matchTemplate。
+    """
+    def __init__(self, budget_mb=FFT_SPECTRA_BUDGET_MB):
+        self.budget = budget_mb * 1024 * 1024
+        self.spectra = OrderedDict()   # (key, 频谱尺寸, 模板尺寸) -> (模板频谱, 模板能量)
+        self.nbytes = 0
+        self._slot = (None, None)      # (灰度帧, _FrameSpectrum)
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {'frames': 0, 'matches': 0, 'spectra': 0, 'time': 0.0}
+
+    def clear(self):
+        """释放全部频谱 (模板文件变化时由 clear_template_caches 调用)"""
+        with self.lock:
+            self.spectra.clear()
+            self.nbytes = 0
+            self._slot = (None, None)
+
+    def release_frame(self):
+        """
+        只释放画面侧频谱与窗口能量 (运行结束时调用，4K 下为数十 MB)。
+        模板频谱由 FFT_SPECTRA_BUDGET_MB 限制内存，保留到下次运行复用。
+        """
+        with self.lock:
+            self._slot = (None, None)
+
+    def frame_spectrum(self, gray):
+        cached, fs = self._slot
+        if cached is gray: return fs
+        fs = _FrameSpectrum(gray)
+        self._slot = (gray, fs)
+        self.stats['frames'] += 1
+        return fs
+
+    def _template_spectrum(self, key, tmpl, dft_shape):
+        ck = (key, dft_shape, tmpl.shape)
+        hit = self.spectra.get(ck)
+        if hit is not None:
+            self.spectra.move_to_end(ck)
+            return hit
+        t = tmpl.astype(np.float32)
+        t -= float(t.mean())
+        energy = float(np.dot(t.ravel(), t.ravel()))
+        th, tw = t.shape
+        t = cv2.copyMakeBorder(t, 0, dft_shape[0] - th, 0, dft_shape[1] - tw, cv2.BORDER_CONSTANT, value=0)
+        hit = (cv2.dft(t, nonzeroRows=th), energy)
+        self.spectra[ck] = hit
+        self.nbytes += hit[0].nbytes
+        while self.nbytes > self.budget and len(self.spectra) > 1:
+            _k, (old, _e) = self.spectra.popitem(last=False)
+            self.nbytes -= old.nbytes
+        self.stats['spectra'] += 1
+        return hit
+
+    def match_map(self, key, gray, tmpl):
+        """返回与 cv2.matchTemplate(gray, tmpl, TM_CCOEFF_NORMED) 同形状的得分图"""
+        th, tw = tmpl.shape[:2]
+        h, w = gray.shape
+        ny, nx = h - th + 1, w - tw + 1
+        with self.lock:
+            fs = self.frame_spectrum(gray)
+            t_spec, t_energy = self._template_spectrum(key, tmpl, fs.dft_shape)
+        corr = cv2.idft(cv2.mulSpectrums(fs.spec, t_spec, 0, conjB=True),
+                        flags=cv2.DFT_REAL_OUTPUT | cv2.DFT_SCALE, nonzeroRows=ny)[:ny, :nx]
+        if t_energy <= FFT_EPSILON: return np.zeros((ny, nx), np.float32)
+        denom = np.sqrt(np.maximum(fs.window_energy(th, tw), 0) * np.float32(t_energy))
+        flat = denom <= FFT_EPSILON
+        denom[flat] = 1.0
+        res = corr / denom
+        res[flat] = 0
+        return np.clip(res, -1.0, 1.0, out=res)
+
+    def match(self, key, gray, tmpl):
+        """key: 模板标识 (如 (path, scale))。返回 (最大得分, (x, y))"""
+        t0 = time.perf_counter()
+        res = self.match_map(key, gray, tmpl)
+        _mn, max_v, _ml, max_l = cv2.minMaxLoc(res)
+        self.stats['matches'] += 1
+        self.stats['time'] += time.perf_counter() - t0
+        return max_v, max_l
+
+    def get_stats(self):
+        s = self.stats
+        if not s['matches']: return "(无记录)"
+        return f"(匹配{s['matches']} | 画面频谱{s['frames']} | 模板频谱{s['spectra']} | 耗时{s['time']*1000:.0f}ms)"
+
+fft_matcher = FFTMatcher()
+
+# ======================================================================
+# 特征点匹配 (缩放无关)
+# ======================================================================
+# 模板描述子按 (文件路径, 修改时间, 大小, 算法参数) 生成指纹后缓存到磁盘，
+# 画面描述子每帧只算一次；画面内容未变化时 (静态界面) 后续步骤的新截图直接复用。
+# 命中需通过单应性 RANSAC 验证，再把画面反投影回模板坐标系计算归一化相关得分，
+# 得分与模板匹配的置信度含义一致。
+def _create_detector(kind, n_points):
+    if kind == 'akaze': return cv2.AKAZE_create()
+    # ORB 默认会丢弃离边缘 31px 内的点；模板侧另做边缘填充
+    return cv2.ORB_create(nfeatures=n_points)
+
+class _Features:
+    __slots__ = ('pts', 'desc', 'shape')
+
+    def __init__(self, pts, desc, shape):
+        self.pts = pts        # (N, 2) float32 特征点坐标
+        self.desc = desc      # (N, D) uint8 二进制描述子
+        self.shape = shape    # 提取时的灰度图尺寸 (h, w)
+
+class FeatureMatcher:
+    """
+    基于特征点描述子的查找，一次匹配覆盖 FEATURE_SCALE_RANGE 内的任意缩放，
+    始终使用完整模板 (不受模板裁剪影响)，单应性直接给出原模板中心。
+    耗时不随缩放比例数增长。适合 DPI 变化或界面缩放后的目标；
+    纹理过少的模板 (纯色按钮、细小图标) 提不出足够特征点，调用方应回退到模板匹配。
+    """
+    def __init__(self, kind=FEATURE_DETECTOR, cache_dir=FEATURE_CACHE_DIR):
+        self.kind = kind
+        self.cache_dir = cache_dir
+        self.templates = {}            # 指纹 -> _Features
+        self._slot = (None, None)      # (灰度帧, _Features)
+        self.lock = threading.Lock()
+        self._matcher = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {'frames': 0, 'frame_reused': 0, 'disk_hits': 0, 'computed': 0,
+                      'searches': 0, 'hits': 0, 'time': 0.0}
+
+    def _fingerprint(self, path):
+        st = os.stat(path)
+        raw = f"{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}|{self.kind}|{FEATURE_TEMPLATE_POINTS}"
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def _extract(self, gray, n_points, pad=0):
+        if pad:
+            gray = cv2.copyMakeBorder(gray, pad, pad, pad, pad, cv2.BORDER_REPLICATE)
+        kps, desc = _create_detector(self.kind, n_points).detectAndCompute(gray, None)
+        if desc is None or not kps:
+            return np.zeros((0, 2), np.float32), np.zeros((0, 32), np.uint8)
+        pts = np.array([kp.pt for kp in kps], np.float32) - pad
+        return pts, desc
+
+    def template_features(self, path):
+        """模板描述子：内存 -> 磁盘缓存 -> 重新提取；读不到图像时返回 None"""
+        try:
+            fp = self._fingerprint(path)
+        except OSError:
+            return None
+        feats = self.templates.get(fp)
+        if feats is not None: return feats
+        cache_file = os.path.join(self.cache_dir, fp + '.npz')
+        try:
+            with np.load(cache_file) as data:
+                feats = _Features(data['pts'], data['desc'], tuple(int(v) for v in data['shape']))
+            self.stats['disk_hits'] += 1
+        except (OSError, KeyError, ValueError):
+            img = cv2.imread(path, cv2.IMREAD_COLOR)
+            if img is None: return None
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            pts, desc = self._extract(gray, FEATURE_TEMPLATE_POINTS, pad=32)
+            feats = _Features(pts, desc, gray.shape)
+            self.stats['computed'] += 1
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                np.savez(cache_file, pts=pts, desc=desc, shape=np.array(gray.shape))
+            except OSError as e:
+                print(f"[特征缓存] 写入失败: {e}")
+        self.templates[fp] = feats
+        return feats
+
+    def frame_features(self, gray):
+        """画面描述子 (单帧缓存)。新截图与上一帧内容完全相同时直接复用"""
+        with self.lock:
+            cached, feats = self._slot
+            if cached is not None and (cached is gray or (cached.shape == gray.shape and np.array_equal(cached, gray))):
+                if cached is not gray: self.stats['frame_reused'] += 1
+                return feats
+        pts, desc = self._extract(gray, FEATURE_SCREEN_POINTS)
+        feats = _Features(pts, desc, gray.shape)
+        with self.lock:
+            self._slot = (gray, feats)
+            self.stats['frames'] += 1
+        return feats
+
+    def clear(self):
+        with self.lock:
+            self.templates.clear()
+            self._slot = (None, None)
+
+    def find(self, path, gray):
+        """
+        在灰度帧中查找模板。返回 (中心 (x, y), 外接框 (w, h), 得分)；
+        未通过验证返回 None；模板特征点不足 (无法使用本模式) 返回 False。
+        """
+        tf = self.template_features(path)
+        if tf is None or len(tf.desc) < FEATURE_MIN_MATCHES: return False
+        t0 = time.perf_counter()
+        self.stats['searches'] += 1
+        try:
+            ff = self.frame_features(gray)
+            return self._locate(path, tf, ff, gray)
+        finally:
+            self.stats['time'] += time.perf_counter() - t0
+
+    def _locate(self, path, tf, ff, gray):
+        if len(ff.desc) < 2: return None
+        if self._matcher is None: self._matcher = cv2.BFMatcher(cv2.NORM_HAMMING)
+        pairs = self._matcher.knnMatch(tf.desc, ff.desc, k=2)
+        good = [m for m, n in (p for p in pairs if len(p) == 2) if m.distance < FEATURE_RATIO * n.distance]
+        if len(good) < FEATURE_MIN_MATCHES: return None
+        src = tf.pts[[m.queryIdx for m in good]].reshape(-1, 1, 2)
+        dst = ff.pts[[m.trainIdx for m in good]].reshape(-1, 1, 2)
+        H, mask = cv2.findHomography(src, dst, cv2.RANSAC, FEATURE_RANSAC_THRESHOLD)
+        if H is None or int(mask.sum()) < FEATURE_MIN_MATCHES: return None
+        th, tw = tf.shape
+        corners = cv2.perspectiveTransform(np.float32([[0, 0], [tw, 0], [tw, th], [0, th]]).reshape(-1, 1, 2), H)
+        if not cv2.isContourConvex(corners): return None
+        scale = (abs(cv2.contourArea(corners)) / float(tw * th)) ** 0.5
+        if not FEATURE_SCALE_RANGE[0] <= scale <= FEATURE_SCALE_RANGE[1]: return None
+        # 反投影回模板坐标系，与模板本身做归一化相关，得分与模板匹配的置信度可比
+        tmpl = _template_gray(path, cropped=False)
+        if tmpl is None: return None
+        warped = cv2.warpPerspective(gray, H, (tw, th), flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP)
+        score = float(cv2.matchTemplate(warped, tmpl, cv2.TM_CCOEFF_NORMED)[0, 0])
+        cx, cy = cv2.perspectiveTransform(np.float32([[[tw / 2, th / 2]]]), H)[0, 0]
+        x, y, w, h = cv2.boundingRect(corners)
+        self.stats['hits'] += 1
+        return (int(round(cx)), int(round(cy))), (w, h), score
+
+    def get_stats(self):
+        s = self.stats
+        if not s['searches']: return "(无记录)"
+        return (f"(查找{s['searches']} | 验证通过{s['hits']} | 画面提取{s['frames']} | 画面复用{s['frame_reused']} | "
+                f"模板提取{s['computed']} | 磁盘缓存{s['disk_hits']} | 耗时{s['time']*1000:.0f}ms)")
+
+feature_matcher = FeatureMatcher()
+
+# ======================================================================
+# 基准测试
+# ======================================================================
+def benchmark_incremental(width=3840, height=2160, frames=20, anim_size=96, tmpl_size=(64, 48), seed=0):
+    """
+    4K 静态画面中只有一小块区域在变化时，对比全量 matchTemplate 与增量匹配的单帧耗时，
+    并校验两者结果一致。返回 (全量平均秒数, 增量平均秒数)。
+    """
+    rng = np.random.default_rng(seed)
+    # 用随机色块模拟界面，避免纯噪声下匹配过于容易
+    base = cv2.resize(rng.integers(0, 255, (height // 16, width // 16), dtype=np.uint8),
+                      (width, height), interpolation=cv2.INTER_NEAREST)
+    base = cv2.GaussianBlur(base, (5, 5), 0)
+    tw, th = tmpl_size
+    tx, ty = width * 2 // 3, height // 3
+    tmpl = base[ty:ty + th, tx:tx + tw].copy()
+    matcher = IncrementalMatcher()
+    ax, ay = width // 4, height // 2
+    t_full = t_inc = 0.0
+    for i in range(frames + 1):
+        frame = base.copy()
+        frame[ay:ay + anim_size, ax:ax + anim_size] = rng.integers(0, 255, (anim_size, anim_size), dtype=np.uint8)
+        t0 = time.perf_counter()
+        res = cv2.matchTemplate(frame, tmpl, cv2.TM_CCOEFF_NORMED)
+        _mn, full_v, _ml, full_l = cv2.minMaxLoc(res)
+        t1 = time.perf_counter()
+        inc_v, inc_l = matcher.match('bench', frame, tmpl)
+        t2 = time.perf_counter()
+        if i == 0: continue  # 首帧两者都是全量计算
+        t_full += t1 - t0; t_inc += t2 - t1
+        if full_l != inc_l or abs(full_v - inc_v) > 1e-4:
+            print(f"[基准] ✗ 第 {i} 帧结果不一致: 全量 {full_l}/{full_v:.4f} 增量 {inc_l}/{inc_v:.4f}")
+    t_full /= frames; t_inc /= frames
+    print(f"[基准] {width}x{height} 变化区 {anim_size}px 模板 {tw}x{th}: "
+          f"全量 {t_full*1000:.1f}ms | 增量 {t_inc*1000:.1f}ms | 加速 {t_full/max(t_inc, 1e-9):.1f}x")
+    print(f"[基准] {matcher.get_stats()}")
+    return t_full, t_inc
+
+def benchmark_color_prefilter(trials=40, width=1920, height=1080, conf=0.8, seed=0):
+    """
+    颜色预过滤的误拒率与负样本加速比。
+    正样本: 从画面截取模板，再叠加亮度偏移与噪声模拟渲染差异；
+    负样本: 从另一张画面截取模板。只统计全量匹配能命中 (>= conf) 的正样本。
+    返回 (误拒率, 负样本加速比)。
+    """
+    import os, tempfile
+    from PIL import Image
+    rng = np.random.default_rng(seed)
+
+    def make_screen():
+        # 随机色块 + 模糊，近似界面中的色块与渐变
+        small = rng.integers(0, 255, (height // 24, width // 24, 3), dtype=np.uint8)
+        return cv2.GaussianBlur(cv2.resize(small, (width, height), interpolation=cv2.INTER_NEAREST), (7, 7), 0)
+
+    screen, other = make_screen(), make_screen()
+    screen_pil = Image.fromarray(screen)
+    gray = cv2.cvtColor(screen, cv2.COLOR_RGB2GRAY)
+    pf = ColorPrefilter()
+    tmpdir = tempfile.mkdtemp(prefix='prefilter_bench_')
+    hits = false_rejects = 0
+    t_full = t_pf = 0.0
+    for i in range(trials):
+        tw, th = int(rng.integers(40, 160)), int(rng.integers(24, 100))
+        x, y = int(rng.integers(0, width - tw)), int(rng.integers(0, height - th))
+        pos = screen[y:y + th, x:x + tw].astype(np.int16)
+        pos = np.clip(pos + int(rng.integers(-25, 26)) + rng.normal(0, 4, pos.shape), 0, 255).astype(np.uint8)
+        neg = other[y:y + th, x:x + tw]
+        for kind, rgb in (('pos', pos), ('neg', neg)):
+            path = os.path.join(tmpdir, f"{kind}_{i}.png")
+            cv2.imwrite(path, cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR))
+            tmpl = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+            t0 = time.perf_counter()
+            _mn, full_v, _ml, _l = cv2.minMaxLoc(cv2.matchTemplate(gray, tmpl, cv2.TM_CCOEFF_NORMED))
+            t1 = time.perf_counter()
+            pf._slot = (None, None)   # 每次都计入整帧统计的开销 (偏保守)
+            boxes = pf.candidates(path, 1.0, screen_pil, tmpl.shape)
+            if boxes is None: pf_v = full_v
+            elif boxes: pf_v = match_in_boxes(gray, tmpl, boxes)[0]
+            else: pf_v = -1.0
+            t2 = time.perf_counter()
+            if kind == 'pos' and full_v >= conf:
+                hits += 1
+                if pf_v < conf: false_rejects += 1
+            if kind == 'neg':
+                t_full += t1 - t0; t_pf += t2 - t1
+    rate = false_rejects / hits if hits else 0.0
+    speedup = t_full / max(t_pf, 1e-9)
+    print(f"[基准] 颜色预过滤: 正样本 {hits} 个, 误拒 {false_rejects} 个 ({rate*100:.1f}%)")
+    print(f"[基准] 负样本平均: 全量 {t_full/trials*1000:.1f}ms | 预过滤 {t_pf/trials*1000:.1f}ms | 加速 {speedup:.1f}x")
+    print(f"[基准] {pf.get_stats()}")
+    return rate, speedup
+
+def benchmark_exact(trials=30, width=1920, height=1080, seed=0):
+    """
+    同机截取的模板 (画面中逐字节一致) 在 1080p 画面上:
+    五个缩放比例的 matchTemplate 与精确匹配的单次耗时，并校验命中位置一致。
+    返回 (matchTemplate 平均秒数, 精确匹配平均秒数)。
+    """
+    import os, tempfile
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 255, (height // 24, width // 24, 3), dtype=np.uint8)
+    screen = cv2.GaussianBlur(cv2.resize(small, (width, height), interpolation=cv2.INTER_NEAREST), (7, 7), 0)
+    gray = cv2.cvtColor(screen, cv2.COLOR_RGB2GRAY)
+    tmpdir = tempfile.mkdtemp(prefix='exact_bench_')
+    em = ExactMatcher()
+    t_full = t_exact = 0.0
+    mismatches = 0
+    for i in range(trials):
+        tw, th = int(rng.integers(32, 160)), int(rng.integers(24, 100))
+        x, y = int(rng.integers(0, width - tw)), int(rng.integers(0, height - th))
+        path = os.path.join(tmpdir, f"t_{i}.png")
+        cv2.imwrite(path, cv2.cvtColor(screen[y:y + th, x:x + tw], cv2.COLOR_RGB2BGR))
+        t0 = time.perf_counter()
+        best = (-1.0, None)
+        for scale in (1.0, 0.9, 1.1, 0.8, 1.2):
+            img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+            if scale != 1.0:
+                img = cv2.resize(img, (int(tw * scale), int(th * scale)), interpolation=cv2.INTER_AREA)
+            _mn, v, _ml, loc = cv2.minMaxLoc(cv2.matchTemplate(gray, img, cv2.TM_CCOEFF_NORMED))
+            if v > best[0]: best = (v, loc)
+        t1 = time.perf_counter()
+        em.observe(path, gray, best[1], 1.0, best[0])
+        em._slot = (None, None)   # 计入整帧复制的开销 (偏保守)
+        t2 = time.perf_counter()
+        hit = em.find(path, gray)
+        t3 = time.perf_counter()
+        t_full += t1 - t0; t_exact += t3 - t2
+        if hit is None or hit[0] != best[1]: mismatches += 1
+    t_full /= trials; t_exact /= trials
+    print(f"[基准] 精确匹配: 全量(5缩放) {t_full*1000:.1f}ms | 精确 {t_exact*1000:.2f}ms | "
+          f"加速 {t_full/max(t_exact, 1e-9):.0f}x | 位置不一致 {mismatches}/{trials}")
+    print(f"[基准] {em.get_stats()}")
+    return t_full, t_exact
+
+def benchmark_fft(sizes=(32, 64, 128, 256, 512), templates=4, width=1920, height=1080, seed=0):
+    """
+    同一帧上查找 templates 个同尺寸模板: cv2.matchTemplate 与 FFTMatcher 的单模板平均耗时。
+    FFT 分两种: 冷启动 (含画面频谱与模板频谱) 和模板频谱已缓存 (循环中的常态)。
+    同时校验得分图最大误差与最优位置一致。返回 {尺寸: (cv2, fft冷, fft热)} (秒)。
+    """
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 255, (height // 24, width // 24), dtype=np.uint8)
+    gray = cv2.GaussianBlur(cv2.resize(small, (width, height), interpolation=cv2.INTER_NEAREST), (7, 7), 0)
+    out = {}
+    for size in sizes:
+        tmpls = []
+        for _ in range(templates):
+            x, y = int(rng.integers(0, width - size)), int(rng.integers(0, height - size))
+            tmpls.append(gray[y:y + size, x:x + size].copy())
+        t0 = time.perf_counter()
+        ref = [cv2.matchTemplate(gray, t, cv2.TM_CCOEFF_NORMED) for t in tmpls]
+        t1 = time.perf_counter()
+        fm = FFTMatcher()
+        got = [fm.match_map(i, gray, t) for i, t in enumerate(tmpls)]
+        t2 = time.perf_counter()
+        frame2 = gray.copy()   # 新的一帧：画面频谱重算，模板频谱命中缓存
+        for i, t in enumerate(tmpls): fm.match_map(i, frame2, t)
+        t3 = time.perf_counter()
+        err = max(float(np.abs(r - g).max()) for r, g in zip(ref, got))
+        same = all(cv2.minMaxLoc(r)[3] == cv2.minMaxLoc(g)[3] for r, g in zip(ref, got))
+        c, f_cold, f_warm = (t1 - t0) / templates, (t2 - t1) / templates, (t3 - t2) / templates
+        out[size] = (c, f_cold, f_warm)
+        print(f"[基准] FFT {size:>3}px ×{templates}: cv2 {c*1000:.1f}ms | FFT冷 {f_cold*1000:.1f}ms | "
+              f"FFT热 {f_warm*1000:.1f}ms | 加速 {c/max(f_warm, 1e-9):.1f}x | 最大误差 {err:.1e} | 位置一致 {same}")
+    return out
+
+def benchmark_feature(scales=(0.6, 0.75, 1.0, 1.3, 1.6), width=1920, height=1080, seed=0):
+    """
+    合成界面 (色块 + 文字) 中放入按不同比例缩放的目标:
+    对比五缩放 matchTemplate 扫描与特征点单次匹配的耗时和命中情况，并检查不含目标时不误报。
+    返回 [(缩放, 扫描得分, 扫描耗时, 特征得分或 None, 特征耗时)]。
+    """
+    import tempfile
+    rng = np.random.default_rng(seed)
+    ui = np.full((height, width, 3), 235, np.uint8)
+    for _ in range(150):
+        x, y = int(rng.integers(0, width - 240)), int(rng.integers(0, height - 70))
+        color = tuple(int(v) for v in rng.integers(60, 230, 3))
+        cv2.rectangle(ui, (x, y), (x + int(rng.integers(60, 240)), y + int(rng.integers(24, 70))), color, -1)
+    words = ['OK', 'Cancel', 'File', 'Edit', 'Save As', 'Settings', 'Help', 'Run', 'Stop', 'Open', 'Close']
+    for _ in range(400):
+        cv2.putText(ui, str(rng.choice(words)), (int(rng.integers(0, width - 100)), int(rng.integers(20, height))),
+                    cv2.FONT_HERSHEY_SIMPLEX, float(rng.uniform(0.4, 0.9)), (20, 20, 20), 1, cv2.LINE_AA)
+    tmpl = np.full((70, 200, 3), 250, np.uint8)
+    cv2.rectangle(tmpl, (3, 3), (196, 66), (40, 120, 200), 2)
+    cv2.putText(tmpl, 'Submit #42', (15, 45), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (10, 10, 10), 2, cv2.LINE_AA)
+    cv2.circle(tmpl, (175, 35), 12, (0, 160, 0), -1)
+    tmpdir = tempfile.mkdtemp(prefix='feature_bench_')
+    path = os.path.join(tmpdir, 'target.png')
+    cv2.imwrite(path, tmpl)
+    tmpl_gray = cv2.cvtColor(tmpl, cv2.COLOR_BGR2GRAY)
+    fm = FeatureMatcher(cache_dir=os.path.join(tmpdir, 'cache'))
+    fm.template_features(path)   # 模板描述子只在首次提取
+    out = []
+    for s in scales:
+        t = cv2.resize(tmpl, None, fx=s, fy=s, interpolation=cv2.INTER_AREA)
+        screen = ui.copy()
+        x, y = 700, 400
+        screen[y:y + t.shape[0], x:x + t.shape[1]] = t
+        gray = cv2.cvtColor(screen, cv2.COLOR_BGR2GRAY)
+        t0 = time.perf_counter()
+        sweep = -1.0
+        for k in (1.0, 0.9, 1.1, 0.8, 1.2):
+            tk = cv2.resize(tmpl_gray, None, fx=k, fy=k, interpolation=cv2.INTER_AREA) if k != 1.0 else tmpl_gray
+            sweep = max(sweep, cv2.minMaxLoc(cv2.matchTemplate(gray, tk, cv2.TM_CCOEFF_NORMED))[1])
+        t1 = time.perf_counter()
+        hit = fm.find(path, gray)
+        t2 = time.perf_counter()
+        expect = (x + t.shape[1] // 2, y + t.shape[0] // 2)
+        ok = bool(hit) and abs(hit[0][0] - expect[0]) <= 3 and abs(hit[0][1] - expect[1]) <= 3
+        f_score = hit[2] if ok else None
+        out.append((s, sweep, t1 - t0, f_score, t2 - t1))
+        print(f"[基准] 缩放 {s:.2f}: 五缩放扫描 得分 {sweep:.3f} {(t1-t0)*1000:.0f}ms | "
+              f"特征点 {'得分 %.3f' % f_score if ok else '未命中'} {(t2-t1)*1000:.0f}ms")
+    neg = fm.find(path, cv2.cvtColor(ui, cv2.COLOR_BGR2GRAY))
+    print(f"[基准] 不含目标的画面: 特征点结果 {'误报' if neg else '未命中 (正确)'}")
+    print(f"[基准] {fm.get_stats()}")
+    return out
+
+if __name__ == "__main__":
+    benchmark_incremental()
+    benchmark_color_prefilter()
+    benchmark_exact()
+    benchmark_fft()
+    benchmark_feature()
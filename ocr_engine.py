@@ -4,7 +4,6 @@
 # 版本:1.55.0
 # 变更:(终极修复) 返回完整识别文本,支持剪贴板功能
 
-from PIL import Image, ImageGrab
 import re
 import os
 import subprocess
@@ -12,21 +11,20 @@ import io
 import time
 import sys
 import threading
+from lazy_loader import LazyModule, is_available, probe_cache
 
 # ======================================================================
-# 依赖库预加载
+# 依赖库探测 (只查找模块，不导入；真正导入推迟到首次识别)
 # ======================================================================
-RAPIDOCR_CLASS = None
-NUMPY_CV2_AVAILABLE = False
-
-try:
-    import numpy as np
-    import cv2
-    NUMPY_CV2_AVAILABLE = True
-    from rapidocr import RapidOCR
-    RAPIDOCR_CLASS = RapidOCR 
-except Exception as e:
-    pass 
+Image = LazyModule('PIL.Image')
+ImageGrab = LazyModule('PIL.ImageGrab')
+
+NUMPY_CV2_AVAILABLE = is_available('numpy') and is_available('cv2')
+if NUMPY_CV2_AVAILABLE:
+    np = LazyModule('numpy')
+    cv2 = LazyModule('cv2')
+RAPIDOCR_AVAILABLE = NUMPY_CV2_AVAILABLE and is_available('rapidocr')
+WINOCR_AVAILABLE = is_available('winocr')
 
 # ======================================================================
 # 全局状态缓存
@@ -40,6 +38,21 @@ _TESSERACT_TESSDATA = None
 _TESSERACT_CHECKED = False
 _TESSERACT_LOCK = threading.Lock()
 
+# ======================================================================
+# 截图格式
+# ======================================================================
+# 截图可能是 PIL 图像，也可能是截图层按步骤需要直接产出的 RGB / 灰度数组 (见 capture_engine)
+def _as_pil(frame):
+    return Image.fromarray(frame) if hasattr(frame, 'shape') else frame
+
+def _as_bgr(frame):
+    arr = np.asarray(frame)
+    return cv2.cvtColor(arr, cv2.COLOR_GRAY2BGR if arr.ndim == 2 else cv2.COLOR_RGB2BGR)
+
+def _as_gray(frame):
+    arr = np.asarray(frame)
+    return arr if arr.ndim == 2 else cv2.cvtColor(arr, cv2.COLOR_RGB2GRAY)
+
 # ======================================================================
 # 懒加载与预热实现
 # ======================================================================
@@ -49,17 +62,29 @@ def preload_engines():
         get_rapid_ocr_engine()
     get_tesseract_cmd()
 
+def warm_up(engine='auto'):
+    """为即将执行的 OCR 步骤预热指定引擎 (加载模型/定位可执行文件)，可在后台线程调用"""
+    if engine in ('auto', 'winocr') and WINOCR_AVAILABLE:
+        import winocr
+    # auto 模式下 WinOCR 可用时通常不会走到 RapidOCR，不必加载模型
+    if engine == 'rapidocr' or (engine == 'auto' and not WINOCR_AVAILABLE):
+        get_rapid_ocr_engine()
+    if engine in ('auto', 'tesseract'):
+        get_tesseract_cmd()
+
 def get_rapid_ocr_engine():
     global _RAPID_OCR_INSTANCE, _RAPID_OCR_INIT_FAILED
     if _RAPID_OCR_INSTANCE: return _RAPID_OCR_INSTANCE
-    if _RAPID_OCR_INIT_FAILED or not RAPIDOCR_CLASS: return None
+    if _RAPID_OCR_INIT_FAILED or not RAPIDOCR_AVAILABLE: return None
     
     with _RAPID_OCR_LOCK: 
         if _RAPID_OCR_INSTANCE: return _RAPID_OCR_INSTANCE
+        if _RAPID_OCR_INIT_FAILED: return None
         try:
             print("[OCR] 正在加载 RapidOCR 模型...")
             t0 = time.time()
-            _RAPID_OCR_INSTANCE = RAPIDOCR_CLASS()
+            from rapidocr import RapidOCR
+            _RAPID_OCR_INSTANCE = RapidOCR()
             print(f"[OCR] RapidOCR 就绪 ({time.time()-t0:.2f}s)")
             return _RAPID_OCR_INSTANCE
         except Exception as e:
@@ -92,21 +117,44 @@ def get_tesseract_cmd():
                 break
         
         if not _TESSERACT_CMD:
-            try:
-                cflags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
-                find_cmd = 'where' if os.name == 'nt' else 'which'
-                res = subprocess.run([find_cmd, 'tesseract'], capture_output=True, text=True, encoding='utf-8', errors='ignore', creationflags=cflags)
-                if res.returncode == 0: _TESSERACT_CMD = res.stdout.strip().split('\n')[0]
-            except: pass
-
-        if _TESSERACT_CMD:
-            try:
-                import pytesseract
-                pytesseract.pytesseract.tesseract_cmd = _TESSERACT_CMD
-            except: _TESSERACT_CMD = None
+            _TESSERACT_CMD = _probe_tesseract_on_path()
+
+        # pytesseract 在首次识别时才导入 (见 _find_text_tesseract)
+        if _TESSERACT_CMD and not is_available('pytesseract'):
+            _TESSERACT_CMD = None
             
         return _TESSERACT_CMD
 
+def _exe_stamp(path):
+    """可执行文件的 [修改时间, 大小]，用于发现原地更新；文件不存在返回 None"""
+    try:
+        st = os.stat(path)
+        return [st.st_mtime_ns, st.st_size]
+    except OSError:
+        return None
+
+def _probe_tesseract_on_path():
+    """
+    在 PATH 中查找 tesseract。'where/which' 子进程的结果缓存在磁盘上，
+    PATH 变化或缓存的可执行文件被删除/更新 (修改时间或大小变化) 时自动失效。
+    """
+    fingerprint = os.environ.get('PATH', '')
+    hit, cached = probe_cache.get('tesseract_cmd', fingerprint)
+    if hit and isinstance(cached, dict):
+        cmd = cached.get('cmd')
+        if cmd is None or _exe_stamp(cmd) == cached.get('stamp'):
+            return cmd
+    
+    cmd = None
+    try:
+        cflags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+        find_cmd = 'where' if os.name == 'nt' else 'which'
+        res = subprocess.run([find_cmd, 'tesseract'], capture_output=True, text=True, encoding='utf-8', errors='ignore', creationflags=cflags)
+        if res.returncode == 0: cmd = res.stdout.strip().split('\n')[0].strip() or None
+    except: pass
+    probe_cache.set('tesseract_cmd', fingerprint, {'cmd': cmd, 'stamp': _exe_stamp(cmd) if cmd else None})
+    return cmd
+
 # ======================================================================
 # 引擎状态
 # ======================================================================
@@ -157,12 +205,13 @@ def find_text_location(target_text, lang='eng', debug=False, screenshot_pil=None
     def get_img_bgr():
         nonlocal img_bgr_cache
         if img_bgr_cache is None: 
-            img_bgr_cache = cv2.cvtColor(np.array(screenshot_pil), cv2.COLOR_RGB2BGR)
+            img_bgr_cache = _as_bgr(screenshot_pil)
         return img_bgr_cache
 
     if engine == 'auto':
         # 尝试 WinOCR
         try:
+            if not WINOCR_AVAILABLE: raise ImportError
             import winocr
             if lang in LANG_MAP['winocr']:
                 t0 = time.time()
@@ -218,7 +267,7 @@ def find_text_location(target_text, lang='eng', debug=False, screenshot_pil=None
 # --- 具体实现函数 (修改为返回完整文本) ---
 def _find_text_winocr(winocr_module, target_norm, lang_code, debug, screenshot_pil, offset):
     try:
-        res = winocr_module.recognize_pil_sync(screenshot_pil, lang=lang_code)
+        res = winocr_module.recognize_pil_sync(_as_pil(screenshot_pil), lang=lang_code)
         if not isinstance(res, dict): return None
         
         words = []
@@ -335,7 +384,7 @@ def _find_text_tesseract(target_norm, lang, debug, screenshot_pil, offset):
         
         s = 2 
         if NUMPY_CV2_AVAILABLE:
-            gray = cv2.cvtColor(np.array(screenshot_pil), cv2.COLOR_RGB2GRAY)
+            gray = _as_gray(screenshot_pil)
             h, w = gray.shape[:2]
             scaled = cv2.resize(gray, (w*s, h*s), interpolation=cv2.INTER_CUBIC)
             bw = cv2.adaptiveThreshold(scaled, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
@@ -394,16 +443,16 @@ def _find_text_tesseract(target_norm, lang, debug, screenshot_pil, offset):
         return None
 
 def get_available_engines():
+    """
+    返回可用引擎列表。只做轻量探测 (查找模块/缓存的 tesseract 路径)，
+    不导入 winocr、不加载 RapidOCR 模型，启动时填充下拉框无需等待。
+    """
     engines = []
     
-    try:
-        import winocr
-        if 'eng' in LANG_MAP['winocr']:
-            engines.append(('winocr', 'Windows 10/11 OCR'))
-    except ImportError:
-        pass
+    if WINOCR_AVAILABLE and 'eng' in LANG_MAP['winocr']:
+        engines.append(('winocr', 'Windows 10/11 OCR'))
 
-    if get_rapid_ocr_engine() and 'eng' in LANG_MAP['rapidocr']:
+    if RAPIDOCR_AVAILABLE and not _RAPID_OCR_INIT_FAILED and 'eng' in LANG_MAP['rapidocr']:
         engines.append(('rapidocr', 'RapidOCR (推荐)'))
 
     if get_tesseract_cmd() and 'eng' in LANG_MAP['tesseract']:
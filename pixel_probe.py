@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+# pixel_probe.py
+# 描述: 像素探测：从一张截图批量读取多个坐标的颜色并按容差判断
+# 版本: 1.0.0
+
+import re
+
+# ======================================================================
+# 全局配置
+# ======================================================================
+PIXEL_DEFAULT_TOLERANCE = 10    # 每个通道允许的最大差值 (0-255)
+PIXEL_FRAME_MAX_AGE = 0.05      # 共享帧在此时间 (秒) 内截取且覆盖全部探测点时直接复用，不再截图
+PIXEL_MATCH_MODES = ('all', 'any')
+
+_HEX_COLOR = re.compile(r'^#?([0-9a-fA-F]{6})$')
+
+# ======================================================================
+# 解析与格式化
+# ======================================================================
+def parse_color(text):
+    """'#RRGGBB' / 'RRGGBB' -> (r, g, b)"""
+    m = _HEX_COLOR.match(str(text).strip())
+    if not m: raise ValueError(f"颜色格式错误: '{text}' (应为 #RRGGBB)")
+    v = int(m.group(1), 16)
+    return (v >> 16) & 0xFF, (v >> 8) & 0xFF, v & 0xFF
+
+def format_color(rgb):
+    return '#%02X%02X%02X' % tuple(rgb[:3])
+
+def parse_pixel_spec(spec, need_color=True):
+    """
+    解析探测点列表，返回 [(x, y, (r, g, b) 或 None)]。
+    spec 可以是字符串 'x,y,#RRGGBB; x,y,#RRGGBB' (分号或换行分隔)，
+    也可以是列表 [[x, y, '#RRGGBB'], ...]。need_color=False 时颜色可省略 (GET_PIXELS)。
+    格式错误抛出 ValueError。
+    """
+    if isinstance(spec, str):
+        items = [[f.strip() for f in part.split(',')] for part in re.split(r'[;\n]+', spec) if part.strip()]
+    else:
+        items = [list(item) for item in (spec or [])]
+    points = []
+    for item in items:
+        if len(item) not in (2, 3) or (need_color and len(item) != 3):
+            raise ValueError(f"探测点格式错误: {item} (应为 x,y{',#RRGGBB' if need_color else ''})")
+        try:
+            x, y = int(item[0]), int(item[1])
+        except (TypeError, ValueError):
+            raise ValueError(f"探测点坐标必须是整数: {item}")
+        color = parse_color(item[2]) if len(item) == 3 and str(item[2]).strip() else None
+        if need_color and color is None: raise ValueError(f"探测点缺少颜色: {item}")
+        points.append((x, y, color))
+    if not points: raise ValueError("至少需要一个探测点")
+    return points
+
+# ======================================================================
+# 采样与判断
+# ======================================================================
+def bounding_box(points):
+    """覆盖全部探测点的截图框 (left, top, right, bottom)，right/bottom 不含"""
+    xs = [p[0] for p in points]; ys = [p[1] for p in points]
+    return min(xs), min(ys), max(xs) + 1, max(ys) + 1
+
+def covers(image, origin, points):
+    """image 为 PIL 图像或 RGB 数组 (见 capture_engine)；灰度帧没有颜色，视为不覆盖"""
+    if hasattr(image, 'shape'):
+        if image.ndim != 3: return False
+        h, w = image.shape[:2]
+    else:
+        if image.mode not in ('RGB', 'RGBA'): return False
+        w, h = image.size
+    return all(0 <= x - origin[0] < w and 0 <= y - origin[1] < h for x, y, _c in points)
+
+def sample(image, origin, points):
+    """从 image (左上角位于屏幕坐标 origin) 读取各探测点的 (r, g, b)"""
+    ox, oy = origin
+    if hasattr(image, 'shape'):
+        return [tuple(int(v) for v in image[y - oy, x - ox][:3]) for x, y, _c in points]
+    if image.mode != 'RGB': image = image.convert('RGB')
+    px = image.load()
+    return [px[x - ox, y - oy][:3] for x, y, _c in points]
+
+def color_matches(actual, expected, tolerance):
+    return max(abs(a - e) for a, e in zip(actual, expected)) <= tolerance
+
+def evaluate(points, colors, tolerance=PIXEL_DEFAULT_TOLERANCE, mode='all'):
+    """返回 (条件是否满足, 匹配的点数)；mode: 'all' 全部匹配 / 'any' 任一匹配"""
+    matched = sum(1 for (_x, _y, exp), act in zip(points, colors) if color_matches(act, exp, tolerance))
+    ok = matched > 0 if mode == 'any' else matched == len(points)
+    return ok, matched
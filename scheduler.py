@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+# scheduler.py
+# 描述: 基于单调时钟与事件停止信号的等待/定频调度
+# 版本: 1.0.0
+
+import sys
+import threading
+import time
+
+# ======================================================================
+# 全局配置
+# ======================================================================
+SPIN_THRESHOLD = 0.002    # 距截止时间小于此值时改为让出 CPU 的短轮询 (秒)，弥补系统定时器粒度
+OVERRUN_REPORT_LIMIT = 5  # 定频循环逐次打印超时的次数上限，之后只在结束时汇总
+
+# ======================================================================
+# 停止信号
+# ======================================================================
+def ensure_stop_event(ctx):
+    """为运行上下文准备停止事件；兼容旧的 stop_requested 标志"""
+    ev = ctx.get('stop_event')
+    if ev is None:
+        ev = ctx['stop_event'] = threading.Event()
+    if ctx.get('stop_requested'): ev.set()
+    return ev
+
+def request_stop(ctx):
+    """从任意线程请求停止：正在进行的等待会立即返回"""
+    ctx['stop_requested'] = True
+    ev = ctx.get('stop_event')
+    if ev is not None: ev.set()
+
+def is_stopped(ctx):
+    ev = ctx.get('stop_event')
+    return bool(ctx.get('stop_requested')) or (ev is not None and ev.is_set())
+
+# ======================================================================
+# 精确等待
+# ======================================================================
+def wait_until(deadline, stop_event=None):
+    """
+    等待到单调时钟 deadline。返回 True 表示按时到达，False 表示被停止。
+    大段时间交给 Event.wait (可被 set 立即唤醒)，最后 SPIN_THRESHOLD 内短轮询。
+    """
+    while True:
+        remain = deadline - time.monotonic()
+        if remain <= 0:
+            return not (stop_event is not None and stop_event.is_set())
+        if stop_event is not None and stop_event.is_set(): return False
+        if remain > SPIN_THRESHOLD:
+            if stop_event is not None:
+                if stop_event.wait(remain - SPIN_THRESHOLD): return False
+            else:
+                time.sleep(remain - SPIN_THRESHOLD)
+        else:
+            time.sleep(0)
+
+def wait_for(seconds, stop_event=None):
+    """等待 seconds 秒；被停止时提前返回 False"""
+    return wait_until(time.monotonic() + max(0.0, seconds), stop_event)
+
+class HighResolutionTimer:
+    """
+    Windows 下执行期间把系统定时器精度提到 1ms (timeBeginPeriod)，
+    否则 Event.wait/sleep 的粒度约为 15.6ms。其他平台为空操作。
+    """
+    def __init__(self, period_ms=1):
+        self.period_ms = period_ms
+        self._winmm = None
+
+    def __enter__(self):
+        self.begin()
+        return self
+
+    def __exit__(self, *exc):
+        self.end()
+        return False
+
+    def begin(self):
+        if sys.platform == 'win32':
+            try:
+                import ctypes
+                self._winmm = ctypes.windll.winmm
+                self._winmm.timeBeginPeriod(self.period_ms)
+            except Exception:
+                self._winmm = None
+
+    def end(self):
+        if self._winmm is not None:
+            self._winmm.timeEndPeriod(self.period_ms)
+            self._winmm = None
+
+# ======================================================================
+# 定频节拍
+# ======================================================================
+class FixedRateTimer:
+    """
+    定频节拍器：第 k 拍的截止时间固定为 start + k * period，
+    单次延迟不会累积成漂移。某一拍开始时已错过截止时间即记为超时 (overrun)，
+    并跳过所有已错过的拍，直接对齐到下一个未来节拍，不做补偿性连发。
+    """
+    def __init__(self, period):
+        if period <= 0: raise ValueError("period 必须大于 0")
+        self.period = float(period)
+        self.start = time.monotonic()
+        self.tick = 0
+        self.overruns = 0       # 超时次数
+        self.skipped = 0        # 因超时被跳过的节拍数
+        self.max_late = 0.0     # 最大超时量 (秒)
+
+    def wait_next(self, stop_event=None):
+        """
+        等待下一拍。返回 (是否继续, 本次超时秒数)；超时为 0 表示准时。
+        """
+        self.tick += 1
+        deadline = self.start + self.tick * self.period
+        late = time.monotonic() - deadline
+        if late > 0:
+            self.overruns += 1
+            self.max_late = max(self.max_late, late)
+            missed = int(late // self.period)
+            self.skipped += missed + 1
+            self.tick += missed + 1
+            deadline = self.start + self.tick * self.period
+        else:
+            late = 0.0
+        return wait_until(deadline, stop_event), late
+
+    def summary(self):
+        return f"{self.tick} 拍 | 超时 {self.overruns} 次 | 跳过 {self.skipped} 拍 | 最大超时 {self.max_late*1000:.1f}ms"
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+# template_optimizer.py
+# 描述: 模板自动裁剪：在若干张截图上寻找仍然唯一 (带余量) 的最小模板子块
+# 版本: 1.0.0
+#
+# 用法:
+#   python template_optimizer.py 模板.png 截图1.png [截图2.png ...]
+#   python template_optimizer.py 模板.png --capture 3     (每隔 1 秒截取一次全屏)
+#   python template_optimizer.py 模板.png --reset         (删除裁剪信息，恢复使用完整模板)
+
+import json
+import os
+import sys
+import time
+from core_engine import SCALES
+from lazy_loader import LazyModule
+from match_engine import TEMPLATE_CROP_SUFFIX, template_crop
+
+cv2 = LazyModule('cv2')
+np = LazyModule('numpy')
+ImageGrab = LazyModule('PIL.ImageGrab')
+
+# ======================================================================
+# 全局配置
+# ======================================================================
+OPT_FIND_CONF = 0.8                 # 完整模板在截图中视为命中的得分
+OPT_SHRINK_STEPS = (0.15, 0.2, 0.3, 0.4, 0.5, 0.65, 0.8)  # 候选裁剪块边长相对原模板的比例 (由小到大)
+OPT_MIN_SIDE = 12                   # 裁剪块最短边 (像素)
+OPT_CANDIDATES_PER_SIZE = 6         # 每种尺寸最多验证的位置数 (按纹理丰富程度挑选)
+OPT_STABLE_DIFF = 24                # 截图中目标区域与模板灰度差超过此值的像素视为会变化的背景
+OPT_MAX_UNSTABLE = 0.02             # 裁剪块内允许的变化像素比例
+OPT_MIN_STD = 12.0                  # 裁剪块灰度标准差下限 (过于平坦的块无法区分)
+OPT_MIN_SCORE = 0.95                # 裁剪块在真实位置的最低得分
+OPT_MARGIN = 0.15                   # 真实位置得分需高出其他任何位置的幅度
+OPT_CAPTURE_FRAMES = 3              # GUI/命令行自动截图的张数
+OPT_CAPTURE_INTERVAL = 1.0          # 自动截图间隔 (秒)，让会变化的背景有机会变化
+
+# ======================================================================
+# 读取与保存
+# ======================================================================
+def _to_gray(screen):
+    """截图 (PIL 图像 / RGB 数组 / 文件路径) 转灰度数组，与运行时的屏幕灰度一致"""
+    if isinstance(screen, str):
+        img = cv2.imread(screen, cv2.IMREAD_COLOR)
+        if img is None: raise ValueError(f"无法读取截图: {screen}")
+        return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    arr = np.asarray(screen.convert('RGB') if hasattr(screen, 'convert') else screen)
+    return arr if arr.ndim == 2 else cv2.cvtColor(arr, cv2.COLOR_RGB2GRAY)
+
+def capture_screens(count=OPT_CAPTURE_FRAMES, interval=OPT_CAPTURE_INTERVAL):
+    shots = []
+    for i in range(count):
+        if i: time.sleep(interval)
+        shots.append(ImageGrab.grab())
+    return shots
+
+def save_crop(path, result):
+    st = os.stat(path)
+    meta = dict(result, mtime_ns=st.st_mtime_ns, size=st.st_size)
+    with open(path + TEMPLATE_CROP_SUFFIX, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+    template_crop.cache_clear()
+
+def remove_crop(path):
+    """删除裁剪信息；返回是否存在过"""
+    try:
+        os.remove(path + TEMPLATE_CROP_SUFFIX)
+    except FileNotFoundError:
+        return False
+    finally:
+        template_crop.cache_clear()
+    return True
+
+# ======================================================================
+# 裁剪搜索
+# ======================================================================
+def _box_sums(integral, bh, bw):
+    """积分图上所有 bh×bw 窗口的和，形状 (H - bh + 1, W - bw + 1)"""
+    S = integral
+    return S[bh:, bw:] - S[:-bh, bw:] - S[bh:, :-bw] + S[:-bh, :-bw]
+
+def _uniqueness(patch, screens, true_locs):
+    """
+    裁剪块在各截图中的最低真实得分与最高干扰得分。
+    true_locs[i] 为裁剪块在第 i 张截图中的真实位置，None 表示该截图中没有目标。
+    干扰得分按运行时的全部 SCALES 计算 (缩放方式与 core_engine._get_template 相同)，
+    否则只在某个缩放下才出现的相似区域会被漏掉。
+    """
+    ph, pw = patch.shape
+    true_min, rival_max = 1.0, -1.0
+    for scale in SCALES:
+        sp = patch if scale == 1.0 else cv2.resize(
+            patch, (int(pw * scale), int(ph * scale)), interpolation=cv2.INTER_AREA)
+        sh, sw = sp.shape
+        if not sh or not sw: continue
+        for gray, loc in zip(screens, true_locs):
+            if sh > gray.shape[0] or sw > gray.shape[1]: continue
+            res = cv2.matchTemplate(gray, sp, cv2.TM_CCOEFF_NORMED)
+            if loc is not None:
+                x, y = loc
+                if scale == 1.0: true_min = min(true_min, float(res[y, x]))
+                # 抹掉真实位置附近 (中心对齐后半个裁剪块内) 的得分后再取最大值
+                cx, cy = int(x + (pw - sw) / 2), int(y + (ph - sh) / 2)
+                rx, ry = max(pw, sw) // 2, max(ph, sh) // 2
+                res[max(0, cy - ry):cy + ry + 1, max(0, cx - rx):cx + rx + 1] = -1.0
+            rival_max = max(rival_max, float(res.max()))
+    return true_min, rival_max
+
+def _candidates(tmpl, unstable, cw, ch):
+    """按纹理 (灰度标准差) 从高到低返回满足稳定性要求的裁剪块左上角，最多 OPT_CANDIDATES_PER_SIZE 个"""
+    H, W = tmpl.shape
+    f = tmpl.astype(np.float64)
+    n = float(cw * ch)
+    s = _box_sums(cv2.integral(f), ch, cw)
+    q = _box_sums(cv2.integral(f * f), ch, cw)
+    bad = _box_sums(cv2.integral(unstable.astype(np.uint8)), ch, cw)
+    std = np.sqrt(np.maximum(q / n - (s / n) ** 2, 0))
+    ok = (bad <= OPT_MAX_UNSTABLE * n) & (std >= OPT_MIN_STD)
+    # 按裁剪块尺寸的 1/4 步进取位置，避免挑出几乎重叠的候选
+    stride = max(2, min(cw, ch) // 4)
+    ys, xs = np.nonzero(ok[::stride, ::stride])
+    if not len(ys): return []
+    ys, xs = ys * stride, xs * stride
+    order = np.argsort(-std[ys, xs], kind='stable')[:OPT_CANDIDATES_PER_SIZE]
+    return [(int(xs[i]), int(ys[i])) for i in order]
+
+def optimize_template(path, screens, save=True, verbose=True):
+    """
+    在截图 screens 上为模板 path 寻找最小的唯一子块。
+
+    1. 用完整模板在每张截图中定位目标 (得分 >= OPT_FIND_CONF 视为命中)，至少一张命中
+    2. 比较各截图中目标区域与模板，标记会变化的背景像素
+    3. 按 OPT_SHRINK_STEPS 由小到大尝试裁剪块尺寸；每种尺寸只验证背景稳定、纹理最丰富的几个位置
+    4. 裁剪块需在所有截图的真实位置得分 >= OPT_MIN_SCORE，且比其他任何位置高出 OPT_MARGIN
+
+    返回结果字典 (box / template_size / offset / score / rival / area_ratio)，找不到更小的子块时返回 None。
+    save=True 时写入 <模板>.crop.json，find_image_cv2 随后在裁剪块上匹配并报告原模板中心。
+    """
+    img = cv2.imread(path, cv2.IMREAD_COLOR)
+    if img is None: raise ValueError(f"无法读取模板: {path}")
+    tmpl = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    H, W = tmpl.shape
+    grays = [_to_gray(s) for s in screens]
+    log = print if verbose else (lambda *a, **k: None)
+
+    locs = []
+    unstable = np.zeros((H, W), bool)
+    for gray in grays:
+        if gray.shape[0] < H or gray.shape[1] < W:
+            locs.append(None); continue
+        _mn, v, _ml, (x, y) = cv2.minMaxLoc(cv2.matchTemplate(gray, tmpl, cv2.TM_CCOEFF_NORMED))
+        if v < OPT_FIND_CONF:
+            locs.append(None); continue
+        locs.append((x, y))
+        unstable |= cv2.absdiff(gray[y:y + H, x:x + W], tmpl) > OPT_STABLE_DIFF
+    found = sum(l is not None for l in locs)
+    if not found:
+        log(f"[模板优化] 完整模板在 {len(grays)} 张截图中均未命中 (得分 < {OPT_FIND_CONF})，无法优化")
+        return None
+    log(f"[模板优化] {os.path.basename(path)} {W}x{H}: {found}/{len(grays)} 张截图命中，"
+        f"变化背景像素 {unstable.mean()*100:.1f}%")
+
+    for k in OPT_SHRINK_STEPS:
+        cw, ch = max(OPT_MIN_SIDE, int(W * k)), max(OPT_MIN_SIDE, int(H * k))
+        if cw >= W and ch >= H: break
+        cw, ch = min(cw, W), min(ch, H)
+        for px, py in _candidates(tmpl, unstable, cw, ch):
+            patch = tmpl[py:py + ch, px:px + cw]
+            true_locs = [None if l is None else (l[0] + px, l[1] + py) for l in locs]
+            score, rival = _uniqueness(patch, grays, true_locs)
+            if score >= OPT_MIN_SCORE and score - rival >= OPT_MARGIN:
+                result = {
+                    'box': [px, py, px + cw, py + ch],
+                    'template_size': [W, H],
+                    # 原模板中心相对裁剪块中心的偏移 (100% 缩放下)
+                    'offset': [W / 2 - (px + cw / 2), H / 2 - (py + ch / 2)],
+                    'score': round(score, 4),
+                    'rival': round(rival, 4),
+                    'area_ratio': round(cw * ch / float(W * H), 4),
+                }
+                log(f"[模板优化] 裁剪为 {cw}x{ch} @ ({px},{py})，面积 {result['area_ratio']*100:.0f}%，"
+                    f"真实得分 {score:.3f} / 最高干扰 {rival:.3f}")
+                if save: save_crop(path, result)
+                return result
+    log("[模板优化] 没有满足唯一性余量的更小子块，保持使用完整模板")
+    return None
+
+# ======================================================================
+# 命令行
+# ======================================================================
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args:
+        print("用法: python template_optimizer.py 模板.png 截图1.png [截图2.png ...] | --capture N | --reset")
+        sys.exit(1)
+    template = args[0]
+    if '--reset' in args:
+        print("[模板优化] 已删除裁剪信息" if remove_crop(template) else "[模板优化] 没有裁剪信息")
+        sys.exit(0)
+    if '--capture' in args:
+        i = args.index('--capture')
+        n = int(args[i + 1]) if i + 1 < len(args) else OPT_CAPTURE_FRAMES
+        print(f"[模板优化] {n} 秒内截取 {n} 张全屏截图...")
+        shots = capture_screens(n)
+    else:
+        shots = args[1:]
+    sys.exit(0 if optimize_template(template, shots) else 2)
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+# 帧总线: 工作进程找图、崩溃后自动重启、关闭后的调用与子进程回收 (假屏幕驱动，无需桌面)
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from lazy_loader import is_available
+
+HAS_CV = is_available('cv2') and is_available('numpy')
+
+if HAS_CV:
+    import cv2
+    import capture_engine
+    from frame_bus import FrameBus
+
+W, H, SEED = 640, 480, 7
+
+
+@unittest.skipUnless(HAS_CV, "需要 OpenCV 与 numpy")
+class FrameBusTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        screen = capture_engine.FakeCaptureBackend(W, H, seed=SEED).screen
+        x, y, tw, th = W // 3, H // 2, 64, 48
+        cls.tmp = tempfile.mkdtemp()
+        cls.path = os.path.join(cls.tmp, 'template.png')
+        cv2.imwrite(cls.path, cv2.cvtColor(screen[y:y + th, x:x + tw], cv2.COLOR_RGB2BGR))
+        cls.expect = (x + tw // 2, y + th // 2)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+
+    def make_bus(self, workers=1):
+        bus = FrameBus(workers=workers, backend=('fake', W, H, SEED))
+        self.addCleanup(bus.close)
+        bus.start()
+        return bus
+
+    def test_worker_finds_image(self):
+        bus = self.make_bus()
+        res = bus.find_image(self.path, 0.9, not_before=time.monotonic())
+        self.assertIsNotNone(res)
+        self.assertEqual(tuple(res[0][:2]), self.expect)
+
+    def test_crashed_worker_is_restarted(self):
+        bus = self.make_bus()
+        bus._workers[0].proc.kill()
+        self.assertIsNone(bus.find_image(self.path, 0.9))
+        self.assertEqual(bus.stats['crashed'], 1)
+        res = bus.find_image(self.path, 0.9)
+        self.assertIsNotNone(res)
+        self.assertEqual(tuple(res[0][:2]), self.expect)
+
+    def test_call_after_close_returns_none(self):
+        bus = self.make_bus()
+        bus.close()
+        t0 = time.monotonic()
+        self.assertIsNone(bus.find_image(self.path, 0.9))
+        self.assertLess(time.monotonic() - t0, 0.5)
+
+    def test_close_reaps_busy_worker(self):
+        bus = self.make_bus(workers=2)
+        busy = bus._idle.get()  # 相当于正在执行任务的工作进程
+        bus.close()
+        busy.proc.join(2.0)
+        self.assertFalse(busy.proc.is_alive())
+
+
+class FrameBusClosedTest(unittest.TestCase):
+    def test_never_started_returns_none(self):
+        from frame_bus import FrameBus
+        self.assertIsNone(FrameBus().find_image('template.png', 0.9))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+# 键鼠后端: 用 RecordingBackend 空跑宏，核对步骤产生的输入事件序列与节奏
+
+import time
+import unittest
+from unittest import mock
+
+import core_engine
+import input_backend
+from input_backend import RecordingBackend, get_input_backend, inject_text, resolve_timing_profile
+
+
+def _run(steps, profile):
+    inp = RecordingBackend()
+    core_engine.execute_steps(steps, run_context={'timing_profile': profile, 'input_backend': inp,
+                                                  'prefetch': False})
+    return inp
+
+
+class TurboProfileTest(unittest.TestCase):
+    STEPS = [
+        {'action': 'MOVE_TO', 'params': {'x': 100, 'y': 200}},
+        {'action': 'CLICK', 'params': {'button': 'right'}},
+        {'action': 'MOVE_OFFSET', 'params': {'x_offset': 5, 'y_offset': -5}},
+        {'action': 'SCROLL', 'params': {'amount': -3}},
+        {'action': 'PRESS_KEY', 'params': {'key': 'Ctrl + A'}},
+        {'action': 'TYPE_TEXT', 'params': {'text': '你好 hello', 'input_method': 'unicode'}},
+    ]
+
+    def test_event_sequence(self):
+        inp = _run(self.STEPS, 'turbo')
+        self.assertEqual(inp.events, [
+            ('move_to', 100, 200, 0.0),
+            ('click', 100, 200, 'right', 1),
+            ('move_rel', 5, -5, 0.0),
+            ('scroll', -3, 105, 195),
+            ('hotkey', 'ctrl', 'a'),
+            ('type_unicode', '你好 hello'),
+        ])
+
+    def test_no_implicit_pauses(self):
+        # turbo 的 action_delay 与 move_duration 都为 0，六个动作不应有任何停顿
+        t0 = time.perf_counter()
+        _run(self.STEPS * 5, 'turbo')
+        self.assertLess(time.perf_counter() - t0, 0.5)
+
+    def test_text_chunking_follows_profile(self):
+        profile = {'base': 'turbo', 'text_chunk': 4}
+        inp = _run([{'action': 'TYPE_TEXT', 'params': {'text': 'abcdefghij', 'input_method': 'unicode'}}], profile)
+        self.assertEqual(inp.events, [('type_unicode', 'abcd'), ('type_unicode', 'efgh'), ('type_unicode', 'ij')])
+
+
+class _LockedClipboard:
+    """始终被其他程序占用的剪贴板"""
+    def paste(self): return ''
+    def copy(self, text): raise RuntimeError("剪贴板被占用")
+
+
+class ClipboardFailureTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.multiple(input_backend, pyperclip=_LockedClipboard(), CLIPBOARD_RETRY_DELAY=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_locked_clipboard_reports_failure(self):
+        inp = RecordingBackend()
+        self.assertIsNone(inject_text(inp, 'hello', method='clipboard'))
+        self.assertEqual(inp.events, [])
+
+    def test_type_text_step_sends_nothing(self):
+        inp = _run([{'action': 'TYPE_TEXT', 'params': {'text': 'hello', 'input_method': 'clipboard'}}], 'turbo')
+        self.assertEqual(inp.events, [])
+
+
+class FactoryTest(unittest.TestCase):
+    def test_recording_backend_is_not_shared(self):
+        self.assertIsNot(get_input_backend('recording'), get_input_backend('recording'))
+
+    def test_profile_override_keeps_other_fields(self):
+        t = resolve_timing_profile({'base': 'turbo', 'action_delay': 0.5})
+        self.assertEqual(t['action_delay'], 0.5)
+        self.assertEqual(t['backend'], 'turbo')
+
+
+if __name__ == '__main__':
+    unittest.main()
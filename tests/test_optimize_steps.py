@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+# 步骤融合 (optimize_steps): 融合规则、原始编号、流程控制边界，以及融合前后的输入事件一致
+
+import unittest
+
+import core_engine
+from core_engine import optimize_steps
+from input_backend import RecordingBackend
+
+
+def S(action, **params):
+    return {'action': action, 'params': params}
+
+
+def actions(steps):
+    return [s['action'] for s in steps]
+
+
+class FusionTest(unittest.TestCase):
+    def test_find_click(self):
+        steps = [S('FIND_IMAGE', path='a.png', confidence=0.8), S('CLICK', button='left')]
+        out = optimize_steps(steps)
+        self.assertEqual(len(out), 1)
+        self.assertEqual(out[0]['action'], 'FUSED_FIND_CLICK')
+        self.assertEqual(out[0]['params']['find_action'], 'FIND_IMAGE')
+        # params 按引用复用，执行期间的缓存更新会回写到原宏
+        self.assertIs(out[0]['params']['find_params'], steps[0]['params'])
+        self.assertEqual(out[0]['_line'], '1-2')
+
+    def test_click_with_coordinates_is_not_fused(self):
+        out = optimize_steps([S('FIND_TEXT', text='确定'), S('CLICK', x=5, y=5)])
+        self.assertEqual(actions(out), ['FIND_TEXT', 'CLICK'])
+
+    def test_move_click(self):
+        out = optimize_steps([S('WAIT', ms=10), S('MOVE_TO', x=1, y=2), S('CLICK')])
+        self.assertEqual(actions(out), ['WAIT', 'FUSED_MOVE_CLICK'])
+        self.assertEqual([s['_line'] for s in out], [1, '2-3'])
+
+    def test_move_with_duration_is_not_fused(self):
+        out = optimize_steps([S('MOVE_TO', x=1, y=2, duration=0.5), S('CLICK')])
+        self.assertEqual(actions(out), ['MOVE_TO', 'CLICK'])
+        self.assertEqual([s['_line'] for s in out], [1, 2])
+
+    def test_wait_run(self):
+        out = optimize_steps([S('PRESS_KEY', key='a'), S('WAIT', ms=100), S('WAIT', ms=50), S('WAIT', ms=25)])
+        self.assertEqual(actions(out), ['PRESS_KEY', 'WAIT'])
+        self.assertEqual(out[1]['params'], {'ms': 175})
+        self.assertEqual(out[1]['_line'], '2-4')
+
+    def test_key_run(self):
+        out = optimize_steps([S('PRESS_KEY', key='ctrl+a'), S('PRESS_KEY', key='ctrl+c'), S('WAIT', ms=10)])
+        self.assertEqual(actions(out), ['FUSED_KEYS', 'WAIT'])
+        self.assertEqual(out[0]['params'], {'keys': ['ctrl+a', 'ctrl+c']})
+        self.assertEqual(out[0]['_line'], '1-2')
+
+    def test_input_list_is_not_modified(self):
+        steps = [S('WAIT', ms=1), S('WAIT', ms=2)]
+        optimize_steps(steps)
+        self.assertEqual(steps, [S('WAIT', ms=1), S('WAIT', ms=2)])
+
+
+class ControlFlowBoundaryTest(unittest.TestCase):
+    def test_no_fusion_across_if_else(self):
+        steps = [S('IF_IMAGE_FOUND', path='a.png'), S('PRESS_KEY', key='a'), S('ELSE'),
+                 S('PRESS_KEY', key='b'), S('END_IF'), S('PRESS_KEY', key='c')]
+        out = optimize_steps(steps)
+        self.assertEqual(actions(out), actions(steps))
+        self.assertEqual([s['_line'] for s in out], [1, 2, 3, 4, 5, 6])
+
+    def test_if_followed_by_click_is_not_fused(self):
+        out = optimize_steps([S('IF_TEXT_FOUND', text='确定'), S('CLICK'), S('END_IF')])
+        self.assertEqual(actions(out), ['IF_TEXT_FOUND', 'CLICK', 'END_IF'])
+
+    def test_no_fusion_across_loop(self):
+        steps = [S('WAIT', ms=10), S('LOOP_START', times=2), S('WAIT', ms=10), S('END_LOOP'), S('WAIT', ms=10)]
+        self.assertEqual(actions(optimize_steps(steps)), actions(steps))
+
+    def test_jump_targets_survive_fusion(self):
+        steps = [S('IF_IMAGE_FOUND', path='a.png'), S('WAIT', ms=1), S('WAIT', ms=2), S('ELSE'),
+                 S('MOVE_TO', x=1, y=1), S('CLICK'), S('END_IF')]
+        out = optimize_steps(steps)
+        self.assertEqual(actions(out), ['IF_IMAGE_FOUND', 'WAIT', 'ELSE', 'FUSED_MOVE_CLICK', 'END_IF'])
+        self.assertEqual(core_engine._find_jump(out, 0, 'IF_', 'END_IF', ['ELSE', 'END_IF']), 3)
+        self.assertEqual(core_engine._find_jump(out, 2, 'IF_', 'END_IF', ['END_IF']), 5)
+
+
+class EquivalenceTest(unittest.TestCase):
+    STEPS = [
+        S('MOVE_TO', x=100, y=200), S('CLICK'),
+        S('WAIT', ms=5), S('WAIT', ms=5),
+        S('PRESS_KEY', key='ctrl+a'), S('PRESS_KEY', key='ctrl+c'),
+        S('LOOP_START', times=2),
+        S('MOVE_TO', x=10, y=20), S('CLICK', button='right', clicks=2),
+        S('PRESS_KEY', key='tab'),
+        S('END_LOOP'),
+        S('MOVE_TO', x=50, y=60, duration=0.01), S('CLICK'),
+        S('MOVE_OFFSET', x_offset=5, y_offset=-5),
+    ]
+
+    def _run(self, optimize):
+        inp = RecordingBackend()
+        ctx = {'timing_profile': 'turbo', 'input_backend': inp, 'prefetch': False, 'optimize': optimize}
+        core_engine.execute_steps(self.STEPS, run_context=ctx)
+        return inp.events, ctx['last_pos']
+
+    def test_same_events_and_last_pos(self):
+        plain_events, plain_pos = self._run(False)
+        fused_events, fused_pos = self._run(True)
+        self.assertEqual(fused_events, plain_events)
+        self.assertEqual(fused_pos, plain_pos)
+        self.assertEqual(fused_pos, (55, 55))
+
+
+if __name__ == '__main__':
+    unittest.main()
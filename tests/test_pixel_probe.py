@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+# 像素探测: 探测点解析、容差与 all/any 判断、共享帧覆盖检查
+
+import unittest
+
+from lazy_loader import is_available
+from pixel_probe import bounding_box, covers, evaluate, parse_color, parse_pixel_spec
+
+
+class _ArrayFrame:
+    """只有 shape/ndim 的数组替身 (RGB 为 (h, w, 3)，灰度为 (h, w))"""
+    def __init__(self, shape):
+        self.shape, self.ndim = shape, len(shape)
+
+
+class _PILFrame:
+    """只有 size/mode 的 PIL 图像替身"""
+    def __init__(self, size, mode='RGB'):
+        self.size, self.mode = size, mode
+
+
+class ParseTest(unittest.TestCase):
+    EXPECT = [(10, 20, (255, 0, 0)), (30, 40, (0, 255, 0))]
+
+    def test_semicolon_separated(self):
+        self.assertEqual(parse_pixel_spec('10,20,#FF0000; 30,40,#00ff00'), self.EXPECT)
+
+    def test_newline_separated(self):
+        self.assertEqual(parse_pixel_spec('10, 20, FF0000\n\n30,40,#00FF00\n'), self.EXPECT)
+
+    def test_list_spec(self):
+        self.assertEqual(parse_pixel_spec([[10, 20, '#FF0000'], ('30', '40', '00FF00')]), self.EXPECT)
+
+    def test_color_optional_for_get_pixels(self):
+        self.assertEqual(parse_pixel_spec('1,2; 3,4,#000000', need_color=False),
+                         [(1, 2, None), (3, 4, (0, 0, 0))])
+
+    def test_malformed(self):
+        for spec in ('10', '10,20,#FF0000,5', 'a,20,#FF0000', '10,20,#GG0000', '10,20,#FFF', '', [[1]]):
+            with self.subTest(spec=spec), self.assertRaises(ValueError):
+                parse_pixel_spec(spec)
+
+    def test_missing_color(self):
+        for spec in ('10,20', '10,20,', [[10, 20, ' ']]):
+            with self.subTest(spec=spec), self.assertRaises(ValueError):
+                parse_pixel_spec(spec)
+
+    def test_parse_color(self):
+        self.assertEqual(parse_color(' #1a2B3c '), (0x1A, 0x2B, 0x3C))
+
+
+class EvaluateTest(unittest.TestCase):
+    POINTS = [(0, 0, (100, 100, 100)), (1, 0, (200, 50, 0))]
+
+    def test_tolerance_boundary(self):
+        pts = self.POINTS[:1]
+        self.assertEqual(evaluate(pts, [(110, 90, 100)], tolerance=10), (True, 1))
+        self.assertEqual(evaluate(pts, [(111, 100, 100)], tolerance=10), (False, 0))
+        self.assertEqual(evaluate(pts, [(100, 100, 100)], tolerance=0), (True, 1))
+        self.assertEqual(evaluate(pts, [(100, 100, 101)], tolerance=0), (False, 0))
+
+    def test_all_mode(self):
+        self.assertEqual(evaluate(self.POINTS, [(100, 100, 100), (200, 50, 0)], 0, 'all'), (True, 2))
+        self.assertEqual(evaluate(self.POINTS, [(100, 100, 100), (0, 0, 0)], 0, 'all'), (False, 1))
+
+    def test_any_mode(self):
+        self.assertEqual(evaluate(self.POINTS, [(0, 0, 0), (200, 50, 0)], 0, 'any'), (True, 1))
+        self.assertEqual(evaluate(self.POINTS, [(0, 0, 0), (0, 0, 0)], 0, 'any'), (False, 0))
+
+
+class CoverageTest(unittest.TestCase):
+    POINTS = [(105, 205, None), (140, 230, None)]
+
+    def test_bounding_box(self):
+        self.assertEqual(bounding_box(self.POINTS), (105, 205, 141, 231))
+
+    def test_rgb_frame_covers(self):
+        self.assertTrue(covers(_ArrayFrame((50, 50, 3)), (100, 200), self.POINTS))
+        self.assertTrue(covers(_PILFrame((50, 50)), (100, 200), self.POINTS))
+
+    def test_point_outside_frame(self):
+        self.assertFalse(covers(_ArrayFrame((30, 40, 3)), (100, 200), self.POINTS))
+        self.assertFalse(covers(_PILFrame((50, 50)), (110, 200), self.POINTS))
+
+    def test_gray_frame_rejected(self):
+        self.assertFalse(covers(_ArrayFrame((50, 50)), (100, 200), self.POINTS))
+        self.assertFalse(covers(_PILFrame((50, 50), 'L'), (100, 200), self.POINTS))
+
+    @unittest.skipUnless(is_available('PIL'), "需要 Pillow")
+    def test_pil_image(self):
+        from PIL import Image
+        from pixel_probe import sample
+        img = Image.new('RGB', (50, 50), (1, 2, 3))
+        self.assertTrue(covers(img, (100, 200), self.POINTS))
+        self.assertEqual(sample(img, (100, 200), self.POINTS), [(1, 2, 3), (1, 2, 3)])
+        self.assertFalse(covers(img.convert('L'), (100, 200), self.POINTS))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# 等待与定频节拍: 停止事件唤醒、截止时间不漂移、超时跳拍不连发
+
+import threading
+import time
+import unittest
+
+from scheduler import FixedRateTimer, wait_until
+
+# 允许的调度误差 (秒)；CI 机器负载下的定时器抖动
+SLACK = 0.02
+
+
+class WaitUntilTest(unittest.TestCase):
+    def test_deadline_reached(self):
+        deadline = time.monotonic() + 0.03
+        self.assertTrue(wait_until(deadline, threading.Event()))
+        self.assertGreaterEqual(time.monotonic(), deadline)
+
+    def test_stop_event_wakes_immediately(self):
+        ev = threading.Event()
+        setter = threading.Timer(0.05, ev.set)
+        setter.start()
+        self.addCleanup(setter.cancel)
+        t0 = time.monotonic()
+        self.assertFalse(wait_until(t0 + 5.0, ev))
+        elapsed = time.monotonic() - t0
+        self.assertGreaterEqual(elapsed, 0.05)
+        self.assertLess(elapsed, 0.05 + SLACK)
+
+    def test_already_stopped(self):
+        ev = threading.Event()
+        ev.set()
+        self.assertFalse(wait_until(time.monotonic() + 5.0, ev))
+
+
+class FixedRateTimerTest(unittest.TestCase):
+    PERIOD = 0.05
+
+    def test_deadlines_do_not_drift(self):
+        timer = FixedRateTimer(self.PERIOD)
+        for k in range(1, 7):
+            # 循环体耗时在周期内波动，截止时间仍固定为 start + k*period
+            time.sleep(self.PERIOD * (0.1 if k % 2 else 0.6))
+            ok, late = timer.wait_next()
+            now = time.monotonic() - timer.start
+            self.assertTrue(ok)
+            self.assertEqual(late, 0.0)
+            self.assertEqual(timer.tick, k)
+            self.assertGreaterEqual(now, k * self.PERIOD)
+            self.assertLess(now, k * self.PERIOD + SLACK)
+        self.assertEqual((timer.overruns, timer.skipped), (0, 0))
+
+    def test_overrun_skips_to_next_future_tick(self):
+        timer = FixedRateTimer(self.PERIOD)
+        time.sleep(self.PERIOD * 2.5)       # 第 1 拍截止后又过了 1.5 个周期
+        ok, late = timer.wait_next()
+        self.assertTrue(ok)
+        self.assertGreater(late, 0)
+        self.assertEqual(timer.overruns, 1)
+        self.assertEqual(timer.skipped, 2)   # 第 1、2 拍
+        self.assertEqual(timer.tick, 3)
+        t3 = time.monotonic() - timer.start
+        self.assertGreaterEqual(t3, 3 * self.PERIOD)
+        self.assertLess(t3, 3 * self.PERIOD + SLACK)
+        # 不补发错过的节拍：下一拍仍要等满一个周期
+        ok, late = timer.wait_next()
+        self.assertEqual((ok, late, timer.tick, timer.overruns), (True, 0.0, 4, 1))
+        self.assertGreaterEqual(time.monotonic() - timer.start, 4 * self.PERIOD)
+
+    def test_stop_event_ends_wait(self):
+        timer = FixedRateTimer(5.0)
+        ev = threading.Event()
+        ev.set()
+        self.assertEqual(timer.wait_next(ev), (False, 0.0))
+
+    def test_invalid_period(self):
+        with self.assertRaises(ValueError):
+            FixedRateTimer(0)
+
+
+if __name__ == '__main__':
+    unittest.main()
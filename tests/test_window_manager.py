@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+# 窗口句柄缓存、失效复核与激活截止时间 (FakeWindowManager 驱动，无需桌面)
+
+import time
+import unittest
+
+from window_manager import FakeWindowManager, WindowRegistry
+
+
+class RegistryCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.wm = FakeWindowManager(['记事本 - a.txt', '计算器'])
+        self.reg = WindowRegistry(self.wm)
+
+    def test_second_lookup_hits_cache(self):
+        h1, cached1 = self.reg.lookup('记事本')
+        h2, cached2 = self.reg.lookup('记事本')
+        self.assertEqual((h1, cached1, cached2), (h2, False, True))
+        self.assertEqual(self.wm.find_calls, 1)
+
+    def test_closed_window_is_enumerated_again(self):
+        h1, _ = self.reg.lookup('记事本')
+        self.wm.close(h1)
+        h2 = self.wm.open('记事本 - b.txt')
+        self.assertEqual(self.reg.lookup('记事本'), (h2, False))
+        self.assertEqual(self.wm.find_calls, 2)
+
+    def test_renamed_window_is_revalidated(self):
+        h, _ = self.reg.lookup('记事本')
+        self.wm.windows[h]['title'] = '画图'
+        self.assertEqual(self.reg.lookup('记事本'), (None, False))
+        self.assertNotIn('记事本', self.reg.handles)
+
+    def test_not_found(self):
+        self.assertEqual(self.reg.activate('浏览器'), (None, 'not_found'))
+
+
+class ActivationTest(unittest.TestCase):
+    def test_already_foreground_skips_activate(self):
+        wm = FakeWindowManager(['记事本'])
+        reg = WindowRegistry(wm)
+        h, _ = reg.lookup('记事本')
+        wm.foreground = h
+        self.assertEqual(reg.activate('记事本'), (h, 'foreground'))
+        self.assertEqual(wm.activate_calls, 0)
+
+    def test_returns_as_soon_as_foreground(self):
+        wm = FakeWindowManager(activation_delay=0.05)
+        h = wm.open('记事本', minimized=True)
+        t0 = time.monotonic()
+        self.assertEqual(WindowRegistry(wm).activate('记事本', timeout=1.0), (h, 'activated'))
+        elapsed = time.monotonic() - t0
+        self.assertGreaterEqual(elapsed, 0.05)
+        self.assertLess(elapsed, 0.5)
+        self.assertFalse(wm.is_minimized(h))
+
+    def test_deadline(self):
+        wm = FakeWindowManager(['记事本'], activation_delay=5.0)
+        t0 = time.monotonic()
+        _h, state = WindowRegistry(wm).activate('记事本', timeout=0.1)
+        elapsed = time.monotonic() - t0
+        self.assertEqual(state, 'timeout')
+        self.assertGreaterEqual(elapsed, 0.1)
+        self.assertLess(elapsed, 0.5)
+
+    def test_stop_request_ends_wait(self):
+        wm = FakeWindowManager(['记事本'], activation_delay=5.0)
+        _h, state = WindowRegistry(wm).activate('记事本', timeout=5.0, should_stop=lambda: True)
+        self.assertEqual(state, 'stopped')
+
+
+if __name__ == '__main__':
+    unittest.main()
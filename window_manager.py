@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+# window_manager.py
+# 描述: 窗口查找/激活的可替换接口、句柄缓存与就绪检测
+# 版本: 1.0.0
+
+import sys
+import time
+from lazy_loader import LazyModule, is_available
+
+PYGETWINDOW_AVAILABLE = is_available('pygetwindow')
+gw = LazyModule('pygetwindow')
+
+# ======================================================================
+# 全局配置
+# ======================================================================
+WINDOW_ACTIVATE_TIMEOUT = 1.0   # 等待窗口真正切到前台的最长时间 (秒)
+WINDOW_POLL_INTERVAL = 0.01     # 前台状态轮询间隔 (秒)
+
+# ======================================================================
+# 窗口系统接口
+# ======================================================================
+class WindowManager:
+    """
+    窗口系统接口。handle 的具体类型由实现决定，调用方只透传。
+    所有方法都不应包含隐式等待。
+    """
+    name = 'base'
+
+    def find(self, title): raise NotImplementedError          # 标题包含 title 的窗口列表 (枚举全部顶层窗口)
+    def is_valid(self, handle): raise NotImplementedError     # 窗口是否仍然存在
+    def title_of(self, handle): raise NotImplementedError
+    def is_minimized(self, handle): raise NotImplementedError
+    def restore(self, handle): raise NotImplementedError
+    def activate(self, handle): raise NotImplementedError
+    def is_foreground(self, handle): raise NotImplementedError
+    def rect_of(self, handle): raise NotImplementedError      # 窗口矩形 (left, top, right, bottom)，屏幕坐标
+
+class PyGetWindowManager(WindowManager):
+    """pygetwindow 实现；Windows 下用 IsWindow 做廉价的句柄有效性检查"""
+    name = 'pygetwindow'
+
+    def __init__(self):
+        self._user32 = None
+        if sys.platform == 'win32':
+            import ctypes
+            self._user32 = ctypes.windll.user32
+
+    def find(self, title):
+        return gw.getWindowsWithTitle(title)
+
+    def is_valid(self, handle):
+        hwnd = getattr(handle, '_hWnd', None)
+        if self._user32 is not None and hwnd is not None:
+            return bool(self._user32.IsWindow(hwnd))
+        try:
+            handle.title
+            return True
+        except Exception:
+            return False
+
+    def title_of(self, handle):
+        return handle.title
+
+    def is_minimized(self, handle):
+        return handle.isMinimized
+
+    def restore(self, handle):
+        handle.restore()
+
+    def activate(self, handle):
+        handle.activate()
+
+    def is_foreground(self, handle):
+        hwnd = getattr(handle, '_hWnd', None)
+        if self._user32 is not None and hwnd is not None:
+            return self._user32.GetForegroundWindow() == hwnd
+        return bool(handle.isActive)
+
+    def rect_of(self, handle):
+        return handle.left, handle.top, handle.left + handle.width, handle.top + handle.height
+
+class FakeWindowManager(WindowManager):
+    """
+    内存中的假窗口系统，用于在无桌面环境 (如 Linux CI) 下驱动测试。
+    activation_delay 模拟窗口切到前台所需的时间；find_calls 统计全量枚举次数。
+    """
+    name = 'fake'
+
+    def __init__(self, titles=(), activation_delay=0.0):
+        self.windows = {}          # handle(int) -> {'title', 'minimized', 'rect'}
+        self.foreground = None
+        self.activation_delay = activation_delay
+        self._pending = None       # (handle, 生效时间)
+        self._next = 1
+        self.find_calls = 0
+        self.activate_calls = 0
+        for t in titles: self.open(t)
+
+    def open(self, title, minimized=False, rect=(0, 0, 800, 600)):
+        handle = self._next; self._next += 1
+        self.windows[handle] = {'title': title, 'minimized': minimized, 'rect': tuple(rect)}
+        return handle
+
+    def move(self, handle, left, top):
+        l, t, r, b = self.windows[handle]['rect']
+        self.windows[handle]['rect'] = (left, top, left + r - l, top + b - t)
+
+    def close(self, handle):
+        self.windows.pop(handle, None)
+        if self.foreground == handle: self.foreground = None
+
+    def _settle(self):
+        if self._pending and time.monotonic() >= self._pending[1]:
+            self.foreground = self._pending[0]
+            self._pending = None
+
+    def find(self, title):
+        self.find_calls += 1
+        return [h for h, w in self.windows.items() if title in w['title']]
+
+    def is_valid(self, handle):
+        return handle in self.windows
+
+    def title_of(self, handle):
+        return self.windows[handle]['title']
+
+    def is_minimized(self, handle):
+        return self.windows[handle]['minimized']
+
+    def restore(self, handle):
+        self.windows[handle]['minimized'] = False
+
+    def activate(self, handle):
+        self.activate_calls += 1
+        self._pending = (handle, time.monotonic() + self.activation_delay)
+        self._settle()
+
+    def is_foreground(self, handle):
+        self._settle()
+        return self.foreground == handle
+
+    def rect_of(self, handle):
+        return self.windows[handle]['rect']
+
+# ======================================================================
+# 句柄缓存
+# ======================================================================
+class WindowRegistry:
+    """
+    按标题片段缓存窗口句柄。命中时只做 is_valid + 标题复核，
+    窗口被关闭或改名后才重新枚举。
+    """
+    def __init__(self, manager=None):
+        self._manager = manager
+        self.handles = {}   # title -> handle
+
+    @property
+    def manager(self):
+        if self._manager is None: self._manager = PyGetWindowManager()
+        return self._manager
+
+    def clear(self):
+        self.handles.clear()
+
+    def lookup(self, title):
+        """返回 (handle, 是否命中缓存)；找不到时 handle 为 None"""
+        m = self.manager
+        handle = self.handles.get(title)
+        if handle is not None:
+            try:
+                if m.is_valid(handle) and title in m.title_of(handle):
+                    return handle, True
+            except Exception:
+                pass
+            del self.handles[title]
+        wins = m.find(title)
+        if not wins: return None, False
+        self.handles[title] = wins[0]
+        return wins[0], False
+
+    def activate(self, title, timeout=WINDOW_ACTIVATE_TIMEOUT, poll=WINDOW_POLL_INTERVAL, should_stop=None):
+        """
+        激活窗口并等待其真正切到前台。
+        返回 (handle, 状态)，状态: 'foreground'(本就在前台) / 'activated' / 'timeout' / 'stopped' / 'not_found'
+        """
+        handle, _cached = self.lookup(title)
+        if handle is None: return None, 'not_found'
+        m = self.manager
+        if m.is_foreground(handle): return handle, 'foreground'
+        if m.is_minimized(handle): m.restore(handle)
+        m.activate(handle)
+        deadline = time.monotonic() + timeout
+        while True:
+            if m.is_foreground(handle): return handle, 'activated'
+            if should_stop and should_stop(): return handle, 'stopped'
+            if time.monotonic() >= deadline: return handle, 'timeout'
+            time.sleep(poll)
+
+window_registry = WindowRegistry()